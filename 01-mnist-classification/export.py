@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+MNIST模型导出
+把训练好的fp32模型导出成CPU推理用的几种版本，并在测试集上对比
+
+- fp32:            原始eager模型（state_dict）
+- int8:            quantize_dynamic动态量化，Linear层权重int8，激活运行时量化（load_int8加载）
+- fp32_torchscript / int8_torchscript: TorchScript版本，可以不依赖Net代码直接加载
+- fp32_compiled / int8_compiled: torch.compile（--compile，只测速度，没有导出文件）
+
+每个版本报告文件大小、单样本延迟（p50/p99）、批量吞吐和测试集准确率相对fp32的变化。
+
+运行方式：python export.py [--model mnist_model.pt] [--output exports] [--compile]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import torch
+import torch.nn as nn
+
+from train_config import DATA_DIR, MODEL_FILE, TEST_BATCH_SIZE
+from training import Net, load_tensor_dataset
+from serve import load_model
+
+EXPORT_DIR = './exports'
+LATENCY_ITERATIONS = 1000
+WARMUP_ITERATIONS = 50
+THROUGHPUT_RUNS = 3
+
+
+def quantize(model):
+    """Linear层动态量化成int8"""
+    # 新版本torch提示迁移到torchao，torch.ao.quantization本身仍然可用
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        warnings.simplefilter('ignore', UserWarning)
+        return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def load_int8(path):
+    """加载int8版本（量化模型的state_dict）
+
+    量化后的Linear层参数名和形状都变了，Net().load_state_dict会失败；
+    要先对一个新的Net做同样的动态量化，再加载参数。
+    """
+    model = quantize(Net().eval())
+    with warnings.catch_warnings():
+        # 读取量化权重时torch内部会提示TypedStorage已废弃
+        warnings.simplefilter('ignore', UserWarning)
+        model.load_state_dict(torch.load(path, map_location='cpu', weights_only=True))
+    return model
+
+
+def script(model):
+    # TorchScript在新版本torch里标记为deprecated，但仍是不依赖Python代码的导出格式
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        return torch.jit.script(model)
+
+
+def save_state_dict(model, path):
+    torch.save(model.state_dict(), path)
+
+
+def save_script(model, path):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        torch.jit.save(model, path)
+
+
+def build_variants(model, compile_models=False):
+    """[(名称, 模型, 保存函数或None)]"""
+    quantized = quantize(model)
+    variants = [
+        ('fp32', model, save_state_dict),
+        ('int8', quantized, save_state_dict),
+        ('fp32_torchscript', script(model), save_script),
+        ('int8_torchscript', script(quantized), save_script),
+    ]
+    if compile_models:
+        variants += [
+            ('fp32_compiled', torch.compile(model), None),
+            ('int8_compiled', torch.compile(quantized), None),
+        ]
+    return variants
+
+
+def measure_latency(model, image):
+    """单样本延迟（毫秒）"""
+    timings = []
+    with torch.inference_mode():
+        for _ in range(WARMUP_ITERATIONS):
+            model(image)
+        for _ in range(LATENCY_ITERATIONS):
+            start = time.perf_counter()
+            model(image)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    pick = lambda q: round(timings[min(len(timings) - 1, int(q * len(timings)))] * 1000, 4)
+    return pick(0.50), pick(0.99)
+
+
+def evaluate(model, images, targets, batch_size=TEST_BATCH_SIZE):
+    """测试集预测结果和批量吞吐（samples/sec，取THROUGHPUT_RUNS次里最快的）"""
+    best = None
+    with torch.inference_mode():
+        for _ in range(THROUGHPUT_RUNS):
+            start = time.perf_counter()
+            predictions = torch.cat([
+                model(images[i:i + batch_size]).argmax(dim=1)
+                for i in range(0, len(images), batch_size)
+            ])
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return predictions, len(images) / best
+
+
+def export(model, images, targets, output_dir, compile_models=False):
+    """导出所有版本并返回对比报告"""
+    os.makedirs(output_dir, exist_ok=True)
+    report = {}
+    baseline = None
+    for name, variant, save in build_variants(model, compile_models):
+        path = None
+        if save is not None:
+            path = os.path.join(output_dir, f'mnist_{name}.pt')
+            save(variant, path)
+        try:
+            p50, p99 = measure_latency(variant, images[:1])
+            predictions, throughput = evaluate(variant, images, targets)
+        except Exception as e:
+            # torch.compile需要可用的C++编译器
+            report[name] = {"error": str(e).splitlines()[0]}
+            print(f"⚠️  {name}: {report[name]['error']}", file=sys.stderr)
+            continue
+        accuracy = 100. * (predictions == targets).float().mean().item()
+        if baseline is None:
+            baseline = (accuracy, predictions)
+        report[name] = {
+            "file": path,
+            "size_kb": round(os.path.getsize(path) / 1024, 1) if path else None,
+            "latency_p50_ms": p50,
+            "latency_p99_ms": p99,
+            "throughput": round(throughput),
+            "accuracy": round(accuracy, 2),
+            "accuracy_delta": round(accuracy - baseline[0], 2),
+            # 和fp32预测一致的比例，比准确率变化更敏感
+            "agreement": round(100. * (predictions == baseline[1]).float().mean().item(), 2),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\n{'版本':<18}{'大小KB':>9}{'p50 ms':>10}{'p99 ms':>10}{'samples/s':>12}{'准确率':>9}{'变化':>8}{'一致率':>9}")
+    for name, row in report.items():
+        if 'error' in row:
+            print(f"{name:<18}  ❌ {row['error']}")
+            continue
+        size = f"{row['size_kb']:.1f}" if row['size_kb'] is not None else '-'
+        print(f"{name:<18}{size:>9}{row['latency_p50_ms']:>10.4f}{row['latency_p99_ms']:>10.4f}"
+              f"{row['throughput']:>12,}{row['accuracy']:>9.2f}{row['accuracy_delta']:>+8.2f}{row['agreement']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出int8量化和TorchScript/torch.compile版本并对比')
+    parser.add_argument('--model', default=MODEL_FILE, help='train.py保存的模型参数文件')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='数据集和张量缓存目录')
+    parser.add_argument('--output', default=EXPORT_DIR, help='导出目录')
+    parser.add_argument('--compile', action='store_true', help='同时测试torch.compile版本（编译较慢）')
+    parser.add_argument('--threads', type=int, default=0, help='torch计算线程数（0表示默认）')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if not os.path.exists(args.model):
+        print(f"❌ 找不到模型文件 {args.model}，请先运行 python train.py", file=sys.stderr)
+        sys.exit(1)
+
+    print("📥 加载模型和测试集...")
+    model = load_model(args.model)
+    images, targets = load_tensor_dataset(args.data_dir, False, torch.device('cpu')).tensors
+
+    print("📦 导出并测试各版本...")
+    report = export(model, images, targets, args.output, args.compile)
+    print_report(report)
+
+    report_path = os.path.join(args.output, 'export_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({"threads": torch.get_num_threads(), "variants": report}, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 报告已保存到 {report_path}")
+
+
+if __name__ == '__main__':
+    main()
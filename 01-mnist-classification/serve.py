@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+MNIST推理服务
+加载一次训练好的模型，用动态微批处理（micro-batching）提供低延迟预测
+
+请求先进入队列，后台线程从第一个请求到达开始最多等待 --max-wait-ms 毫秒
+或攒够 --max-batch 张图片，然后做一次前向传播，把结果分发回各个请求。
+
+运行方式：python serve.py [--model mnist_model.pt] [--port 8500 | --unix PATH]
+
+接口：
+  POST /predict  {"pixels": [784个0-255灰度值]} 或 {"instances": [[...], ...]}
+  GET  /stats    p50/p99延迟、吞吐量、平均批大小
+  GET  /health
+"""
+
+import argparse
+import collections
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import torch
+
+from train_config import MNIST_MEAN, MNIST_STD, MODEL_FILE
+from training import Net
+
+# 服务配置
+HOST = '127.0.0.1'
+PORT = 8500
+MAX_BATCH = 64       # 一次前向传播最多多少张图片
+MAX_WAIT_MS = 2.0    # 第一个请求最多等多久再开始前向传播
+REQUEST_TIMEOUT = 10
+STATS_WINDOW = 10000  # 统计延迟用的最近请求数
+
+
+def load_model(path=MODEL_FILE):
+    """加载train.py保存的最佳模型参数（state_dict）到CPU"""
+    model = Net()
+    model.load_state_dict(torch.load(path, map_location='cpu', weights_only=True))
+    model.eval()
+    return model
+
+
+def to_tensor(instances):
+    """[[784个0-255灰度值], ...] -> 归一化后的 [N, 1, 28, 28] 张量"""
+    # 先转numpy数组比torch.tensor直接处理嵌套list快几倍
+    images = torch.from_numpy(np.asarray(instances, dtype=np.float32))
+    if images.dim() == 3:  # [N, 28, 28]
+        images = images.flatten(1)
+    if images.dim() != 2 or images.shape[1] != 28 * 28:
+        raise ValueError(f"每张图片需要 {28 * 28} 个像素值，收到形状 {list(images.shape)}")
+    return images.div_(255).sub_(MNIST_MEAN).div_(MNIST_STD).view(-1, 1, 28, 28)
+
+
+class MicroBatcher:
+    """把并发请求攒成批次做一次前向传播
+
+    submit()把图片放进队列，返回Future；后台线程取到第一个请求后，
+    一直收集到max_batch张图片或等满max_wait_ms，再在inference_mode下
+    做一次前向传播。
+    """
+
+    def __init__(self, model, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.latencies = collections.deque(maxlen=STATS_WINDOW)
+        self.started = time.perf_counter()
+        self.images = 0
+        self.batches = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, images):
+        future = Future()
+        self.queue.put((images, future, time.perf_counter()))
+        return future
+
+    def collect(self):
+        """阻塞到第一个请求，然后在截止时间前尽量凑满一批"""
+        pending = [self.queue.get()]
+        count = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while count < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            pending.append(item)
+            count += len(item[0])
+        return pending
+
+    def run(self):
+        while True:
+            pending = self.collect()
+            try:
+                with torch.inference_mode():
+                    batch = torch.cat([images for images, _, _ in pending])
+                    probabilities = torch.softmax(self.model(batch), dim=1)
+                    confidence, digits = probabilities.max(dim=1)
+            except Exception as e:
+                for _, future, _ in pending:
+                    future.set_exception(e)
+                continue
+
+            done = time.perf_counter()
+            offset = 0
+            for images, future, queued in pending:
+                end = offset + len(images)
+                future.set_result([
+                    {"digit": int(digit), "confidence": round(float(score), 4)}
+                    for digit, score in zip(digits[offset:end], confidence[offset:end])
+                ])
+                offset = end
+            with self.lock:
+                self.latencies.extend(done - queued for _, _, queued in pending)
+                self.images += len(batch)
+                self.batches += 1
+
+    def stats(self):
+        with self.lock:
+            ordered = sorted(self.latencies)
+            images, batches = self.images, self.batches
+        elapsed = time.perf_counter() - self.started
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3) if ordered else None
+        return {
+            "requests": len(ordered),
+            "images": images,
+            "batches": batches,
+            "avg_batch_size": round(images / batches, 2) if batches else None,
+            "p50_ms": pick(0.50),
+            "p99_ms": pick(0.99),
+            "images_per_sec": round(images / elapsed, 1),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+class PredictHandler(BaseHTTPRequestHandler):
+    # keep-alive，压测客户端可以复用连接
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.reply(200, {"success": True, **self.server.batcher.stats()})
+        elif self.path == '/health':
+            self.reply(200, {"success": True})
+        else:
+            self.reply(404, {"success": False, "error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self.reply(404, {"success": False, "error": f"Unknown path: {self.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            instances = body['instances'] if 'instances' in body else [body['pixels']]
+            images = to_tensor(instances)
+        except (ValueError, KeyError, TypeError) as e:
+            self.reply(400, {"success": False, "error": f"Invalid request: {e}"})
+            return
+        try:
+            predictions = self.server.batcher.submit(images).result(timeout=REQUEST_TIMEOUT)
+        except Exception as e:
+            self.reply(500, {"success": False, "error": str(e)})
+            return
+        self.reply(200, {"success": True, "predictions": predictions})
+
+    def reply(self, status, result):
+        data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # Unix socket的client_address是空字符串
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixPredictHandler(PredictHandler):
+    # TCP_NODELAY不适用于Unix socket
+    disable_nagle_algorithm = False
+
+
+class PredictServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认的listen队列只有5，并发客户端同时连接时会被拒绝
+    request_queue_size = 128
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def make_server(batcher, host=HOST, port=PORT, unix_path=None):
+    """HTTP服务（TCP或Unix socket），server.batcher指向微批处理器"""
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+        server = ThreadingUnixHTTPServer(unix_path, UnixPredictHandler)
+    else:
+        server = PredictServer((host, port), PredictHandler)
+    server.batcher = batcher
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MNIST推理服务（动态微批处理）')
+    parser.add_argument('--model', default=MODEL_FILE, help='train.py保存的模型参数文件')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--unix', help='监听Unix socket而不是TCP端口')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='一批最多多少张图片')
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS, help='凑批最多等待多少毫秒')
+    parser.add_argument('--threads', type=int, default=0, help='torch计算线程数（0表示默认）')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if not os.path.exists(args.model):
+        print(f"❌ 找不到模型文件 {args.model}，请先运行 python train.py", file=sys.stderr)
+        sys.exit(1)
+
+    model = load_model(args.model)
+    batcher = MicroBatcher(model, args.max_batch, args.max_wait_ms)
+    server = make_server(batcher, args.host, args.port, args.unix)
+    where = args.unix or f"http://{args.host}:{server.server_address[1]}"
+    print(f"🚀 推理服务已启动: {where} (max_batch={args.max_batch}, max_wait={args.max_wait_ms}ms)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+        print(f"\n📊 {json.dumps(batcher.stats(), ensure_ascii=False)}")
+
+
+if __name__ == '__main__':
+    main()
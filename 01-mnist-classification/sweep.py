@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+MNIST超参数搜索
+多个trial在进程池里并发训练（每个进程限制计算线程数），所有trial读同一份
+放在共享内存里的归一化数据集；用successive halving提前淘汰表现差的trial，
+结果写进一个JSONL排行榜。
+
+搜索空间（--spec JSON文件，不指定时用DEFAULT_SPEC）：
+  {"method": "grid" 或 "random", "trials": 16, "seed": 0,
+   "parameters": {"learning_rate": [0.01, 0.05, 0.1],
+                  "momentum": {"min": 0.0, "max": 0.95},
+                  "batch_size": [32, 64, 128]}}
+  列表表示从中选取；{"min", "max"}表示范围（只用于random，加 "log": true 按对数均匀采样）。
+  grid取所有列表的笛卡尔积，random采样trials组。可搜索的参数是TrainConfig的字段。
+
+Successive halving：所有trial先训练 --min-epochs 轮，按测试准确率只保留前 1/eta，
+保留的trial从自己的checkpoint继续训练到 eta 倍的轮数，直到 --epochs 轮。
+
+运行方式：python sweep.py [--spec sweep.json] [--workers 4] [--threads 1] [--epochs 9] [--min-epochs 1] [--eta 3]
+"""
+
+import argparse
+import concurrent.futures
+import dataclasses
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import torch
+import torch.optim as optim
+
+from train_config import DATA_DIR, MNIST_MEAN, MNIST_STD, TrainConfig
+from training import Net, TensorLoader, load_tensor_cache, load_training_state, test, train, training_state
+
+SWEEP_DIR = './sweep'
+LEADERBOARD_FILE = 'leaderboard.jsonl'
+DEFAULT_SPEC = {
+    "method": "random",
+    "trials": 9,
+    "seed": 0,
+    "parameters": {
+        "learning_rate": {"min": 0.001, "max": 0.3, "log": True},
+        "momentum": {"min": 0.0, "max": 0.95},
+        "batch_size": [32, 64, 128],
+    },
+}
+# trial只能改这些字段；epochs由successive halving决定，日志在worker里关掉
+SEARCHABLE = {field.name: field.type for field in dataclasses.fields(TrainConfig)
+              if field.name not in ('epochs', 'log_interval')}
+
+
+def expand_spec(spec):
+    """搜索空间 -> [参数dict]"""
+    parameters = spec.get("parameters") or {}
+    unknown = [name for name in parameters if name not in SEARCHABLE]
+    if unknown:
+        raise ValueError(f"不能搜索的参数: {', '.join(unknown)}（可选 {', '.join(SEARCHABLE)}）")
+    cast = {name: int if SEARCHABLE[name] in (int, 'int') else float for name in parameters}
+    method = spec.get("method", "grid")
+
+    if method == "grid":
+        ranges = [name for name, values in parameters.items() if not isinstance(values, list)]
+        if ranges:
+            raise ValueError(f"grid搜索的参数必须是列表: {', '.join(ranges)}")
+        names = list(parameters)
+        return [{name: cast[name](value) for name, value in zip(names, values)}
+                for values in itertools.product(*parameters.values())]
+
+    if method == "random":
+        rng = random.Random(spec.get("seed", 0))
+
+        def sample(name, values):
+            if isinstance(values, list):
+                return cast[name](rng.choice(values))
+            low, high = values["min"], values["max"]
+            if values.get("log"):
+                value = math.exp(rng.uniform(math.log(low), math.log(high)))
+            else:
+                value = rng.uniform(low, high)
+            return round(value) if cast[name] is int else value
+
+        return [{name: sample(name, values) for name, values in parameters.items()}
+                for _ in range(int(spec.get("trials", 10)))]
+
+    raise ValueError(f"未知的搜索方法: {method}（可选 grid, random）")
+
+
+def rungs(min_epochs, max_epochs, eta):
+    """每一轮淘汰前训练到的epoch数，例如 1, 3, 9"""
+    epochs = [min_epochs]
+    while epochs[-1] < max_epochs:
+        epochs.append(min(epochs[-1] * eta, max_epochs))
+    return epochs
+
+
+def share_dataset(data_dir, train_size=None):
+    """把归一化后的训练集和测试集复制进共享内存
+
+    返回 (blocks, layout)：blocks是要在搜索结束时释放的SharedMemory，
+    layout是 {名字: (共享内存名, 形状, dtype)}，worker按它映射同一块内存。
+    """
+    blocks, layout = [], {}
+    for split, train_split in (('train', True), ('test', False)):
+        images, labels = load_tensor_cache(data_dir, train_split)
+        if train_split and train_size:
+            images, labels = images[:train_size], labels[:train_size]
+        for name, shape, dtype in ((f'{split}_images', (len(images), 1, 28, 28), np.float32),
+                                   (f'{split}_labels', (len(labels),), np.int64)):
+            block = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+            blocks.append(block)
+            layout[name] = (block.name, shape, np.dtype(dtype).str)
+            array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            if name.endswith('images'):
+                # 直接在共享内存里归一化，不产生额外的float副本
+                array[:] = images.reshape(shape)
+                array /= 255
+                array -= MNIST_MEAN
+                array /= MNIST_STD
+            else:
+                array[:] = labels
+    return blocks, layout
+
+
+# worker进程里的共享数据集（init_worker设置）
+WORKER = {}
+
+
+def init_worker(layout, threads):
+    """进程池初始化：限制计算线程数，映射共享内存里的数据集"""
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    # trial的训练日志没人看，只保留stderr
+    sys.stdout = open(os.devnull, 'w')
+    arrays = {}
+    for name, (block_name, shape, dtype) in layout.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        # 引用要一直保留，SharedMemory被回收时映射就失效了
+        WORKER.setdefault('blocks', []).append(block)
+        arrays[name] = torch.from_numpy(np.ndarray(shape, dtype=dtype, buffer=block.buf))
+    WORKER['train'] = torch.utils.data.TensorDataset(arrays['train_images'], arrays['train_labels'])
+    WORKER['test'] = torch.utils.data.TensorDataset(arrays['test_images'], arrays['test_labels'])
+
+
+def run_trial(task):
+    """把一个trial训练到task["epochs"]轮（有checkpoint时从上次停下的地方继续），然后测试"""
+    config = TrainConfig(**task["params"], epochs=task["epochs"], log_interval=0)
+    device = torch.device('cpu')
+    torch.manual_seed(config.seed)
+    train_loader = TensorLoader(WORKER['train'], config.batch_size, shuffle=True)
+    test_loader = TensorLoader(WORKER['test'], config.test_batch_size)
+    model = Net()
+    optimizer = optim.SGD(model.parameters(), lr=config.learning_rate, momentum=config.momentum)
+    start_epoch = 1
+    if os.path.exists(task["checkpoint"]):
+        start_epoch = load_training_state(task["checkpoint"], model, optimizer)['epoch']
+
+    start = time.perf_counter()
+    throughput = [train(model, device, train_loader, optimizer, epoch, config=config)
+                  for epoch in range(start_epoch, config.epochs + 1)]
+    seconds = time.perf_counter() - start
+    accuracy, loss = test(model, device, test_loader, config=config, return_loss=True)
+
+    tmp_path = f'{task["checkpoint"]}.tmp'
+    torch.save(training_state(model, optimizer, config.epochs + 1, 0, 0, accuracy), tmp_path)
+    os.replace(tmp_path, task["checkpoint"])
+    return {
+        "trial": task["trial"],
+        "epochs": config.epochs,
+        "accuracy": round(accuracy, 4),
+        "loss": round(loss, 6),
+        "seconds": round(seconds, 3),
+        "samples_per_sec": round(sum(throughput) / len(throughput), 1) if throughput else None,
+    }
+
+
+def write_leaderboard(path, trials):
+    """按(训练到的轮数, 准确率, 损失)排序重写整个排行榜，每个trial一行"""
+    ranked = sorted(trials, key=lambda t: (-t["epochs"], -(t["accuracy"] or 0), t["loss"] or math.inf, t["trial"]))
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for rank, trial in enumerate(ranked, 1):
+            f.write(json.dumps({"rank": rank, **trial}, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, path)
+    return ranked
+
+
+def sweep(params_list, layout, output_dir, workers, threads, min_epochs, max_epochs, eta, seed):
+    """successive halving：每一轮并发训练存活的trial，保留前1/eta进入下一轮"""
+    os.makedirs(output_dir, exist_ok=True)
+    leaderboard = os.path.join(output_dir, LEADERBOARD_FILE)
+    trials = [{"trial": i, "params": dict({"seed": seed}, **params), "status": "pending", "epochs": 0,
+               "accuracy": None, "loss": None, "seconds": 0.0, "samples_per_sec": None, "history": []}
+              for i, params in enumerate(params_list)]
+    for trial in trials:
+        # 上一次搜索留下的checkpoint不能当成这一次的起点
+        path = os.path.join(output_dir, f'trial_{trial["trial"]:03d}.pt')
+        if os.path.exists(path):
+            os.remove(path)
+    write_leaderboard(leaderboard, trials)
+
+    # spawn：fork一个已经用过OpenMP线程池的进程可能死锁
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                                                initargs=(layout, threads)) as pool:
+        alive = trials
+        schedule = rungs(min_epochs, max_epochs, eta)
+        for rung, epochs in enumerate(schedule):
+            print(f"🏃 第{rung + 1}/{len(schedule)}轮: {len(alive)} 个trial训练到 {epochs} 个epoch")
+            futures = {
+                pool.submit(run_trial, {
+                    "trial": trial["trial"],
+                    "params": trial["params"],
+                    "epochs": epochs,
+                    "checkpoint": os.path.join(output_dir, f'trial_{trial["trial"]:03d}.pt'),
+                }): trial
+                for trial in alive
+            }
+            for trial in alive:
+                trial["status"] = "running"
+            for future in concurrent.futures.as_completed(futures):
+                trial = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    trial.update(status="failed", error=str(e))
+                    print(f"❌ trial {trial['trial']}: {e}", file=sys.stderr)
+                else:
+                    trial["seconds"] = round(trial["seconds"] + result["seconds"], 3)
+                    trial.update(epochs=result["epochs"], accuracy=result["accuracy"], loss=result["loss"],
+                                 samples_per_sec=result["samples_per_sec"], status="evaluated")
+                    trial["history"].append({"epochs": result["epochs"], "accuracy": result["accuracy"]})
+                    print(f"   trial {trial['trial']:>3} {json.dumps(trial['params'])} "
+                          f"epoch {result['epochs']}: {result['accuracy']:.2f}%")
+                write_leaderboard(leaderboard, trials)
+
+            # 准确率相同时看测试损失
+            finished = sorted((t for t in alive if t["status"] == "evaluated"), key=lambda t: (-t["accuracy"], t["loss"]))
+            if rung == len(schedule) - 1:
+                for trial in finished:
+                    trial["status"] = "finished"
+                alive = []
+            else:
+                alive = finished[:max(1, math.ceil(len(finished) / eta))]
+                for trial in finished[len(alive):]:
+                    trial["status"] = "stopped"
+            write_leaderboard(leaderboard, trials)
+    return write_leaderboard(leaderboard, trials), leaderboard
+
+
+def print_leaderboard(ranked, top=10):
+    print(f"\n{'排名':<6}{'trial':>6}{'epochs':>8}{'准确率':>9}{'状态':>10}  参数")
+    for rank, trial in enumerate(ranked[:top], 1):
+        accuracy = f"{trial['accuracy']:.2f}" if trial['accuracy'] is not None else '-'
+        params = {k: round(v, 5) if isinstance(v, float) else v for k, v in trial["params"].items() if k != 'seed'}
+        print(f"{rank:<6}{trial['trial']:>6}{trial['epochs']:>8}{accuracy:>9}{trial['status']:>10}  {json.dumps(params)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MNIST超参数搜索（进程池 + 共享内存数据集 + successive halving）')
+    parser.add_argument('--spec', help='搜索空间JSON文件（不指定时用DEFAULT_SPEC）')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='数据集和张量缓存目录')
+    parser.add_argument('--output', default=SWEEP_DIR, help='排行榜和trial checkpoint目录')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并发trial数（进程数）')
+    parser.add_argument('--threads', type=int, default=0, help='每个进程的torch计算线程数（0表示 核数/进程数）')
+    parser.add_argument('--epochs', type=int, default=9, help='存活到最后的trial训练的轮数')
+    parser.add_argument('--min-epochs', type=int, default=1, help='第一轮淘汰前训练的轮数')
+    parser.add_argument('--eta', type=int, default=3, help='每轮保留前1/eta，训练轮数乘以eta')
+    parser.add_argument('--train-size', type=int, default=0, help='只用训练集前N个样本（0表示全部）')
+    parser.add_argument('--seed', type=int, default=TrainConfig.seed, help='每个trial的随机种子')
+    args = parser.parse_args()
+
+    spec = DEFAULT_SPEC
+    if args.spec:
+        with open(args.spec, encoding='utf-8') as f:
+            spec = json.load(f)
+    try:
+        params_list = expand_spec(spec)
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"❌ 搜索空间无效: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not params_list or args.eta < 2 or not 1 <= args.min_epochs <= args.epochs:
+        print("❌ 需要至少一个trial、--eta >= 2 和 1 <= --min-epochs <= --epochs", file=sys.stderr)
+        sys.exit(1)
+
+    workers = max(1, min(args.workers, len(params_list)))
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+    # spawn出来的worker在导入torch之前就读到这个线程数
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+
+    print("📥 把归一化后的数据集放进共享内存...")
+    blocks, layout = share_dataset(args.data_dir, args.train_size)
+    size_mb = sum(block.size for block in blocks) / 2 ** 20
+    print(f"🔍 {len(params_list)} 个trial ({spec.get('method', 'grid')})，{workers} 个进程 x {threads} 线程，"
+          f"共享数据集 {size_mb:.0f} MB，轮次 {rungs(args.min_epochs, args.epochs, args.eta)}")
+    start = time.perf_counter()
+    try:
+        ranked, path = sweep(params_list, layout, args.output, workers, threads,
+                             args.min_epochs, args.epochs, args.eta, args.seed)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    print_leaderboard(ranked)
+    print(f"\n🎉 搜索完成，用时 {time.perf_counter() - start:.1f}s，排行榜已保存到 {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,136 +3,150 @@
 MNIST手写数字识别训练脚本
 基于PyTorch官方示例简化版本
 
-运行方式：python train.py
+运行方式：python train.py [--data-mode tensor|torchvision] [--resume [CHECKPOINT]]
+                     [--metrics metrics.jsonl] [--profile-steps 10:20]
+多进程数据并行：torchrun --standalone --nproc_per_node 4 train.py --ddp
 """
 
-import torch
-import torch.nn as nn
-import torch.optim as optim
-from torchvision import datasets, transforms
 import argparse
-import os
+import contextlib
 
-# 超参数配置
-BATCH_SIZE = 64
-TEST_BATCH_SIZE = 1000
-LEARNING_RATE = 0.01
-MOMENTUM = 0.5
-EPOCHS = 3
-SEED = 1
-LOG_INTERVAL = 10
-
-# 设备配置
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-print(f"🚀 使用设备: {device}")
-
-
-# 简单的神经网络模型
-class Net(nn.Module):
-    def __init__(self):
-        super(Net, self).__init__()
-        # MNIST图像是 28x28 单通道灰度图
-        self.fc1 = nn.Linear(28 * 28, 128)  # 输入层：784 -> 128
-        self.fc2 = nn.Linear(128, 64)      # 隐藏层：128 -> 64
-        self.fc3 = nn.Linear(64, 10)       # 输出层：64 -> 10 (0-9 十个数字)
-
-    def forward(self, x):
-        # 展平图像 [batch, 1, 28, 28] -> [batch, 784]
-        x = x.view(-1, 28 * 28)
-
-        # 激活函数 ReLU
-        x = torch.relu(self.fc1(x))
-        x = torch.relu(self.fc2(x))
-
-        # 输出层（不需要softmax，CrossEntropyLoss会自动处理）
-        x = self.fc3(x)
-        return x
-
-
-def train(model, device, train_loader, optimizer, epoch):
-    """训练一个epoch"""
-    model.train()
-    criterion = nn.CrossEntropyLoss()
-
-    for batch_idx, (data, target) in enumerate(train_loader):
-        data, target = data.to(device), target.to(device)
-
-        # 前向传播
-        optimizer.zero_grad()
-        output = model(data)
-        loss = criterion(output, target)
-
-        # 反向传播
-        loss.backward()
-        optimizer.step()
-
-        if batch_idx % LOG_INTERVAL == 0:
-            print(f'Train Epoch: {epoch} [{batch_idx * len(data)}/{len(train_loader.dataset)} '
-                  f'({100. * batch_idx / len(train_loader):.0f}%)]\tLoss: {loss.item():.6f}')
-
-
-def test(model, device, test_loader):
-    """测试模型"""
-    model.eval()
-    test_loss = 0
-    correct = 0
-    criterion = nn.CrossEntropyLoss(reduction='sum')
-
-    with torch.no_grad():
-        for data, target in test_loader:
-            data, target = data.to(device), target.to(device)
-            output = model(data)
-            test_loss += criterion(output, target).item()
-            pred = output.argmax(dim=1, keepdim=True)
-            correct += pred.eq(target.view_as(pred)).sum().item()
-
-    test_loss /= len(test_loader.dataset)
-
-    print(f'\n🧪 测试集: 平均损失: {test_loss:.4f}, '
-          f'准确率: {correct}/{len(test_loader.dataset)} '
-          f'({100. * correct / len(test_loader.dataset):.2f}%)\n')
-
-    return 100. * correct / len(test_loader.dataset)
+from train_config import (BATCH_SIZE, CHECKPOINT_DIR, CHECKPOINT_EVERY, CHECKPOINT_KEEP, DATA_DIR, EPOCHS,
+                          LEARNING_RATE, MODEL_FILE, MOMENTUM, PROFILE_DIR, TrainConfig)
 
 
 def main():
-    # 设置随机种子
-    torch.manual_seed(SEED)
+    parser = argparse.ArgumentParser(description='MNIST手写数字识别训练')
+    parser.add_argument('--data-mode', choices=('tensor', 'torchvision'), default='tensor',
+                        help='tensor: 预解码的整块张量缓存（默认）；torchvision: 原来的逐样本transform')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='数据集和张量缓存目录')
+    parser.add_argument('--workers', type=int, default=0, help='torchvision模式下DataLoader的worker进程数')
+    parser.add_argument('--resume', nargs='?', const='latest', default=None,
+                        help='从checkpoint继续训练（不指定文件时用checkpoint目录里最新的）')
+    parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR, help='checkpoint目录')
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY,
+                        help='每多少个step保存一次checkpoint（0表示只在epoch结束时保存）')
+    parser.add_argument('--keep', type=int, default=CHECKPOINT_KEEP, help='保留最近几个checkpoint')
+    parser.add_argument('--metrics', help='把每个step各阶段耗时和吞吐写到这个JSONL文件')
+    parser.add_argument('--profile-steps', metavar='START:END',
+                        help='用torch.profiler采集这段step并导出Chrome trace，例如 10:20')
+    parser.add_argument('--profile-dir', default=PROFILE_DIR, help='profiler trace目录')
+    parser.add_argument('--ddp', action='store_true',
+                        help='多进程数据并行（gloo），用torchrun启动：torchrun --nproc_per_node 4 train.py --ddp')
+    parser.add_argument('--epochs', type=int, default=EPOCHS, help='训练轮数')
+    parser.add_argument('--lr', type=float, default=LEARNING_RATE, help='学习率（多进程时按进程数放大）')
+    parser.add_argument('--momentum', type=float, default=MOMENTUM, help='SGD动量')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='每个进程每步的样本数')
+    args = parser.parse_args()
+
+    # 导入torch要好几秒，所以放在解析完命令行之后，--help和参数错误马上返回
+    import torch
+    import torch.optim as optim
+    import torch.distributed as dist
+    from torch.nn.parallel import DistributedDataParallel
+    from training import (CheckpointWriter, Metrics, Net, checkpoint_path, get_device, list_checkpoints,
+                          load_training_state, make_loaders, make_profiler, setup_distributed, test, train,
+                          training_state)
+
+    config = TrainConfig(batch_size=args.batch_size, learning_rate=args.lr, momentum=args.momentum,
+                         epochs=args.epochs)
+
+    rank, world_size = setup_distributed() if args.ddp else (0, 1)
+    device = get_device()
+    is_main = rank == 0
 
-    # 数据预处理
-    transform = transforms.Compose([
-        transforms.ToTensor(),
-        transforms.Normalize((0.1307,), (0.3081,))  # MNIST均值和标准差
-    ])
-
-    print("📥 下载MNIST数据集...")
-    train_dataset = datasets.MNIST('./data', train=True, download=True, transform=transform)
-    test_dataset = datasets.MNIST('./data', train=False, download=True, transform=transform)
+    # 设置随机种子
+    torch.manual_seed(config.seed)
 
-    train_loader = torch.utils.data.DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=True)
-    test_loader = torch.utils.data.DataLoader(test_dataset, batch_size=TEST_BATCH_SIZE, shuffle=False)
+    print(f"📥 加载MNIST数据集 ({args.data_mode})...")
+    train_loader, test_loader = make_loaders(args.data_mode, args.data_dir, args.workers, rank, world_size, config)
 
     print("🏗️  创建模型...")
     model = Net().to(device)
 
+    # 总batch是 batch_size * world_size，学习率按线性缩放规则同比放大
+    learning_rate = config.learning_rate * world_size
+    if world_size > 1:
+        print(f"🌐 数据并行: {world_size} 个进程 (gloo)，学习率 {config.learning_rate} x {world_size} = {learning_rate}")
     print("🎯 开始训练...")
-    optimizer = optim.SGD(model.parameters(), lr=LEARNING_RATE, momentum=MOMENTUM)
+    optimizer = optim.SGD(model.parameters(), lr=learning_rate, momentum=config.momentum)
 
     best_accuracy = 0
-    for epoch in range(1, EPOCHS + 1):
-        print(f"\n{'='*50}")
-        print(f"Epoch {epoch}/{EPOCHS}")
-        print(f"{'='*50}")
-        train(model, device, train_loader, optimizer, epoch)
-        accuracy = test(model, device, test_loader)
-
-        # 保存最佳模型
-        if accuracy > best_accuracy:
-            best_accuracy = accuracy
-            torch.save(model.state_dict(), 'mnist_model.pt')
-            print(f"💾 保存最佳模型 (准确率: {accuracy:.2f}%)")
+    start_epoch, start_batch, step = 1, 0, 0
+    if args.resume:
+        path = args.resume
+        if path == 'latest':
+            checkpoints = list_checkpoints(args.checkpoint_dir)
+            path = checkpoints[-1] if checkpoints else None
+        if path is None:
+            print(f"⚠️  {args.checkpoint_dir} 里没有checkpoint，从头开始训练")
+        else:
+            checkpoint = load_training_state(path, model, optimizer)
+            start_epoch, start_batch = checkpoint['epoch'], checkpoint['batch']
+            step, best_accuracy = checkpoint['step'], checkpoint['best_accuracy']
+            print(f"♻️  从 {path} 继续训练 (epoch {start_epoch}, batch {start_batch}, step {step})")
+
+    # DDP在构造时从0号进程广播参数，之后每次backward对梯度做all-reduce
+    train_model = DistributedDataParallel(model) if world_size > 1 else model
+
+    # checkpoint、指标和profiler只在0号进程
+    writer = CheckpointWriter(args.checkpoint_dir, args.keep) if is_main else None
+    metrics = Metrics(args.metrics, device) if args.metrics and is_main else None
+    profiler = make_profiler(args.profile_steps, args.profile_dir) if args.profile_steps and is_main else None
+
+    def on_step(batch_idx):
+        nonlocal step
+        step += 1
+        if writer and args.checkpoint_every and step % args.checkpoint_every == 0:
+            writer.save(checkpoint_path(args.checkpoint_dir, step),
+                        training_state(model, optimizer, epoch, batch_idx + 1, step, best_accuracy))
+        if profiler:
+            profiler.step()
+
+    throughput = []
+    try:
+        with profiler or contextlib.nullcontext():
+            for epoch in range(start_epoch, config.epochs + 1):
+                print(f"\n{'='*50}")
+                print(f"Epoch {epoch}/{config.epochs}")
+                print(f"{'='*50}")
+                batch = start_batch if epoch == start_epoch else 0
+                samples_per_sec = train(train_model, device, train_loader, optimizer, epoch, batch, on_step, metrics,
+                                        config)
+                if world_size > 1:
+                    # 各进程吞吐相加得到总吞吐
+                    total = torch.tensor(samples_per_sec)
+                    dist.all_reduce(total)
+                    samples_per_sec = total.item()
+                    print(f'⚡ 总训练吞吐 ({world_size} 个进程): {samples_per_sec:,.0f} samples/sec')
+                if metrics:
+                    metrics.write({"type": "throughput", "epoch": epoch, "world_size": world_size,
+                                   "samples_per_sec": round(samples_per_sec, 1)})
+                throughput.append(samples_per_sec)
+                accuracy = test(model, device, test_loader, metrics, config)
+
+                # 保存最佳模型
+                if accuracy > best_accuracy:
+                    best_accuracy = accuracy
+                    if writer:
+                        writer.save(MODEL_FILE, model.state_dict(), rotate=False)
+                    print(f"💾 保存最佳模型 (准确率: {accuracy:.2f}%)")
+
+                # epoch结束的checkpoint从下一个epoch的第0批继续
+                if writer:
+                    writer.save(checkpoint_path(args.checkpoint_dir, step),
+                                training_state(model, optimizer, epoch + 1, 0, step, best_accuracy))
+    finally:
+        if writer:
+            writer.close()
+        if metrics:
+            metrics.close()
+        if world_size > 1:
+            dist.destroy_process_group()
 
     print(f"\n🎉 训练完成！最佳准确率: {best_accuracy:.2f}%")
+    if throughput:
+        print(f"⚡ 平均训练吞吐 ({args.data_mode}): {sum(throughput) / len(throughput):,.0f} samples/sec")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+MNIST训练的超参数和路径配置
+不依赖torch：train.py先用它解析命令行，--help和参数错误不用等torch导入完
+"""
+
+import dataclasses
+
+# 超参数配置
+BATCH_SIZE = 64
+TEST_BATCH_SIZE = 1000
+LEARNING_RATE = 0.01
+MOMENTUM = 0.5
+EPOCHS = 3
+SEED = 1
+LOG_INTERVAL = 10
+
+# 数据配置
+DATA_DIR = './data'
+MNIST_MEAN = 0.1307
+MNIST_STD = 0.3081
+
+# Checkpoint配置
+CHECKPOINT_DIR = './checkpoints'
+CHECKPOINT_EVERY = 200   # 每多少个训练step保存一次（0表示只在epoch结束时保存）
+CHECKPOINT_KEEP = 3      # 保留最近几个checkpoint
+MODEL_FILE = 'mnist_model.pt'
+
+# 性能分析配置
+PROFILE_DIR = './profiles'
+
+
+@dataclasses.dataclass
+class TrainConfig:
+    """一次训练的超参数，默认值就是上面的模块常量
+
+    train()/test()/make_loaders()从这里读超参数而不是模块常量，
+    sweep.py在同一个进程里用不同的配置跑多个trial。
+    """
+    batch_size: int = BATCH_SIZE
+    test_batch_size: int = TEST_BATCH_SIZE
+    learning_rate: float = LEARNING_RATE
+    momentum: float = MOMENTUM
+    epochs: int = EPOCHS
+    seed: int = SEED
+    log_interval: int = LOG_INTERVAL  # 0表示不打印训练和测试日志
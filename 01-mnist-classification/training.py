@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+MNIST训练用的模型、数据加载、训练/测试循环、checkpoint和数据并行
+train.py（命令行）、sweep.py、serve.py和export.py都从这里导入
+"""
+
+import torch
+import torch.nn as nn
+import torch.distributed as dist
+from torch.utils.data.distributed import DistributedSampler
+import numpy as np
+import builtins
+import glob
+import itertools
+import json
+import math
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+from train_config import CHECKPOINT_DIR, CHECKPOINT_KEEP, DATA_DIR, MNIST_MEAN, MNIST_STD, PROFILE_DIR, SEED, TrainConfig
+
+# 设备配置：第一次调用get_device()时才探测CUDA，serve.py/export.py导入Net时不用等
+device = None
+
+
+def get_device():
+    """训练用的设备"""
+    global device
+    if device is None:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        print(f"🚀 使用设备: {device}")
+    return device
+
+
+# 简单的神经网络模型
+class Net(nn.Module):
+    def __init__(self):
+        super(Net, self).__init__()
+        # MNIST图像是 28x28 单通道灰度图
+        self.fc1 = nn.Linear(28 * 28, 128)  # 输入层：784 -> 128
+        self.fc2 = nn.Linear(128, 64)      # 隐藏层：128 -> 64
+        self.fc3 = nn.Linear(64, 10)       # 输出层：64 -> 10 (0-9 十个数字)
+
+    def forward(self, x):
+        # 展平图像 [batch, 1, 28, 28] -> [batch, 784]
+        x = x.view(-1, 28 * 28)
+
+        # 激活函数 ReLU
+        x = torch.relu(self.fc1(x))
+        x = torch.relu(self.fc2(x))
+
+        # 输出层（不需要softmax，CrossEntropyLoss会自动处理）
+        x = self.fc3(x)
+        return x
+
+
+def load_tensor_cache(data_dir, train):
+    """整个数据集的uint8图像和标签缓存（.npy，内存映射读取）
+
+    第一次调用时用torchvision下载并解码一次MNIST，之后直接读缓存文件，
+    不再经过PIL和逐样本transform。
+    """
+    split = 'train' if train else 'test'
+    images_path = os.path.join(data_dir, f'mnist_{split}_images.npy')
+    labels_path = os.path.join(data_dir, f'mnist_{split}_labels.npy')
+    if not (os.path.exists(images_path) and os.path.exists(labels_path)):
+        from torchvision import datasets
+        dataset = datasets.MNIST(data_dir, train=train, download=True)
+        os.makedirs(data_dir, exist_ok=True)
+        # 先写临时文件再改名，中断时不会留下半个缓存；多进程训练时各进程的临时文件不冲突
+        for path, array in ((images_path, dataset.data.numpy()), (labels_path, dataset.targets.numpy())):
+            tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+            np.save(tmp_path, np.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+    return np.load(images_path, mmap_mode='r'), np.load(labels_path, mmap_mode='r')
+
+
+def load_tensor_dataset(data_dir, train, device):
+    """归一化后的整块float32图像张量 [N, 1, 28, 28] 和int64标签，放在device上"""
+    images, labels = load_tensor_cache(data_dir, train)
+    images = torch.from_numpy(np.asarray(images, dtype=np.float32)).div_(255).sub_(MNIST_MEAN).div_(MNIST_STD)
+    labels = torch.from_numpy(np.array(labels, dtype=np.int64))
+    return torch.utils.data.TensorDataset(images.unsqueeze(1).to(device), labels.to(device))
+
+
+class TensorLoader:
+    """按批切片的内存数据加载器
+
+    每个epoch打乱一次下标，然后每批用一次向量化索引取出，
+    代替DataLoader逐样本调用__getitem__再collate。
+    给了sampler（多进程训练时的DistributedSampler或下标列表）时，
+    只取sampler给出的那部分下标。
+    """
+
+    def __init__(self, dataset, batch_size, shuffle=False, sampler=None):
+        self.dataset = dataset
+        self.images, self.targets = dataset.tensors
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.sampler = sampler
+        # 和DataLoader一样用独立的generator打乱，见epoch_batches()
+        self.generator = torch.Generator()
+
+    def __len__(self):
+        return math.ceil(loader_size(self) / self.batch_size)
+
+    def __iter__(self):
+        return self.batches()
+
+    def batches(self, start_batch=0):
+        """从第start_batch批开始迭代；跳过的批次不会被取出"""
+        count = loader_size(self)
+        order = None
+        if self.sampler is not None:
+            order = torch.tensor(list(self.sampler), dtype=torch.int64).to(self.images.device)
+        elif self.shuffle:
+            order = torch.randperm(count, generator=self.generator).to(self.images.device)
+        for start in range(start_batch * self.batch_size, count, self.batch_size):
+            if order is None:
+                yield self.images[start:start + self.batch_size], self.targets[start:start + self.batch_size]
+            else:
+                index = order[start:start + self.batch_size]
+                yield self.images[index], self.targets[index]
+
+
+def loader_size(loader):
+    """这个进程每个epoch取到的样本数"""
+    if loader.sampler is not None:
+        return len(loader.sampler)
+    return len(loader.dataset)
+
+
+def make_loaders(data_mode, data_dir=DATA_DIR, workers=0, rank=0, world_size=1, config=None):
+    """训练集和测试集的加载器
+
+    tensor: 预解码的整块张量 + TensorLoader（默认）
+    torchvision: 原来的datasets.MNIST + ToTensor/Normalize + DataLoader
+    world_size > 1 时训练集用DistributedSampler分片；测试集按 rank::world_size
+    分片，不像DistributedSampler那样补齐重复样本，汇总后正好是整个测试集。
+    """
+    config = config or TrainConfig()
+    device = get_device()
+    train_sampler = test_sampler = None
+    if world_size > 1:
+        train_sampler = lambda dataset: DistributedSampler(dataset, world_size, rank, shuffle=True, seed=config.seed)
+        test_sampler = lambda dataset: list(range(rank, len(dataset), world_size))
+
+    if data_mode == 'tensor':
+        train_dataset = load_tensor_dataset(data_dir, True, device)
+        test_dataset = load_tensor_dataset(data_dir, False, device)
+        return (TensorLoader(train_dataset, config.batch_size, shuffle=True,
+                             sampler=train_sampler and train_sampler(train_dataset)),
+                TensorLoader(test_dataset, config.test_batch_size, shuffle=False,
+                             sampler=test_sampler and test_sampler(test_dataset)))
+
+    # torchvision只有这条路径和第一次生成张量缓存时才需要，导入较慢
+    from torchvision import datasets, transforms
+
+    # 数据预处理
+    transform = transforms.Compose([
+        transforms.ToTensor(),
+        transforms.Normalize((MNIST_MEAN,), (MNIST_STD,))  # MNIST均值和标准差
+    ])
+
+    train_dataset = datasets.MNIST(data_dir, train=True, download=True, transform=transform)
+    test_dataset = datasets.MNIST(data_dir, train=False, download=True, transform=transform)
+
+    loader_options = {
+        'num_workers': workers,
+        'pin_memory': device.type == 'cuda',
+        'persistent_workers': workers > 0,
+    }
+    if world_size > 1:
+        train_loader = torch.utils.data.DataLoader(train_dataset, batch_size=config.batch_size,
+                                                   sampler=train_sampler(train_dataset), **loader_options)
+        test_loader = torch.utils.data.DataLoader(test_dataset, batch_size=config.test_batch_size,
+                                                  sampler=test_sampler(test_dataset), **loader_options)
+        return train_loader, test_loader
+    train_loader = torch.utils.data.DataLoader(train_dataset, batch_size=config.batch_size, shuffle=True,
+                                               generator=torch.Generator(), **loader_options)
+    test_loader = torch.utils.data.DataLoader(test_dataset, batch_size=config.test_batch_size, shuffle=False,
+                                              **loader_options)
+    return train_loader, test_loader
+
+
+def epoch_batches(loader, epoch, start_batch=0, seed=SEED):
+    """第epoch轮的训练批次，从start_batch开始
+
+    打乱顺序只由seed和epoch决定，所以从epoch中间恢复时能得到同样的批次。
+    """
+    if isinstance(loader.sampler, DistributedSampler):
+        # DistributedSampler同样用 seed + epoch 打乱
+        loader.sampler.set_epoch(epoch)
+    else:
+        loader.generator.manual_seed(seed + epoch)
+    if isinstance(loader, TensorLoader):
+        return loader.batches(start_batch)
+    # DataLoader只能按顺序取出再丢掉前面的批次
+    return itertools.islice(loader, start_batch, None)
+
+
+class Metrics:
+    """按阶段计时的训练指标，写成JSONL
+
+    每个step一行：data（等数据和拷贝到device）、forward、backward、optimizer
+    各阶段毫秒数和samples/sec；每个epoch和每次测试再各写一行汇总。
+    data占比高说明是输入瓶颈，forward/backward占比高说明是计算瓶颈。
+    在CUDA上每个阶段结束时要synchronize才能计时准确，所以只在
+    开启--metrics时才计时；不开启时train()里没有任何额外开销。
+    """
+    PHASES = ('data', 'forward', 'backward', 'optimizer')
+
+    def __init__(self, path, device):
+        self.file = open(path, 'a', encoding='utf-8')
+        self.sync = device.type == 'cuda'
+        self.totals = dict.fromkeys(self.PHASES, 0.0)
+        self.current = {}
+        self.last = time.perf_counter()
+
+    def start(self):
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        """结束当前阶段"""
+        if self.sync:
+            torch.cuda.synchronize()
+        now = time.perf_counter()
+        self.current[phase] = now - self.last
+        self.totals[phase] += now - self.last
+        self.last = now
+
+    def step(self, **fields):
+        step_time = sum(self.current.values())
+        record = {"type": "step", **fields, **{f"{phase}_ms": round(self.current.get(phase, 0) * 1000, 4)
+                                              for phase in self.PHASES}}
+        record["step_ms"] = round(step_time * 1000, 4)
+        record["samples_per_sec"] = round(fields.get("samples", 0) / step_time, 1) if step_time else None
+        self.write(record)
+        self.current = {}
+
+    def epoch(self, **fields):
+        total = sum(self.totals.values())
+        record = {"type": "epoch", **fields}
+        for phase in self.PHASES:
+            record[f"{phase}_s"] = round(self.totals[phase], 4)
+            record[f"{phase}_fraction"] = round(self.totals[phase] / total, 4) if total else None
+        self.write(record)
+        self.file.flush()
+        self.totals = dict.fromkeys(self.PHASES, 0.0)
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+def make_profiler(steps, directory=PROFILE_DIR):
+    """在 START:END 这段step（从本次运行的第一个step算起，不含END）采集torch.profiler
+
+    第START-1个step用作预热，结束后导出Chrome trace（chrome://tracing或Perfetto打开）。
+    """
+    start, end = (int(value) for value in steps.split(':'))
+    if start < 1 or end <= start:
+        raise ValueError(f"--profile-steps 需要 1 <= START < END，收到 {steps}")
+    os.makedirs(directory, exist_ok=True)
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+    def export_trace(profiler):
+        path = os.path.join(directory, f'trace_steps_{start}_{end}.json')
+        profiler.export_chrome_trace(path)
+        print(f"🔬 profiler trace已保存到 {path}")
+
+    return torch.profiler.profile(
+        activities=activities,
+        schedule=torch.profiler.schedule(skip_first=start - 1, wait=0, warmup=1, active=end - start, repeat=1),
+        on_trace_ready=export_trace,
+        record_shapes=True,
+    )
+
+
+def train(model, device, train_loader, optimizer, epoch, start_batch=0, on_step=None, metrics=None, config=None):
+    """训练一个epoch，返回吞吐量（samples/sec）
+
+    start_batch: 从这一批开始（恢复训练时跳过已经训练过的批次）
+    on_step: 每个优化step之后调用 on_step(batch_idx)，用于保存checkpoint和profiler
+    metrics: Metrics，记录每个step各阶段耗时（None表示不记录）
+    config: TrainConfig（打乱用的seed和日志间隔），None表示默认值
+    """
+    config = config or TrainConfig()
+    model.train()
+    criterion = nn.CrossEntropyLoss()
+    samples = 0
+    start = time.perf_counter()
+    # loss.item()会等GPU算完，所以日志打印的是上一个日志点的loss，那时早已算完
+    pending_log = None
+    loss_sum = torch.zeros((), device=device)
+
+    batches = epoch_batches(train_loader, epoch, start_batch, config.seed)
+    if metrics:
+        metrics.start()
+    for batch_idx, (data, target) in enumerate(batches, start=start_batch):
+        data, target = data.to(device, non_blocking=True), target.to(device, non_blocking=True)
+        samples += len(data)
+        if metrics:
+            metrics.mark('data')
+
+        # 前向传播
+        optimizer.zero_grad()
+        output = model(data)
+        loss = criterion(output, target)
+        if metrics:
+            metrics.mark('forward')
+
+        # 反向传播
+        loss.backward()
+        if metrics:
+            metrics.mark('backward')
+        optimizer.step()
+        if metrics:
+            metrics.mark('optimizer')
+            metrics.step(epoch=epoch, batch=batch_idx, samples=len(data))
+
+        loss_sum += loss.detach()
+        if config.log_interval and batch_idx % config.log_interval == 0:
+            if pending_log:
+                print_loss(*pending_log)
+            pending_log = (epoch, batch_idx * len(data), loader_size(train_loader),
+                           100. * batch_idx / len(train_loader), loss.detach())
+
+        if on_step is not None:
+            on_step(batch_idx)
+        if metrics:
+            # 日志和checkpoint快照不算进下一个step的data阶段
+            metrics.start()
+
+    if pending_log:
+        print_loss(*pending_log)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    elapsed = time.perf_counter() - start
+    samples_per_sec = samples / max(elapsed, 1e-9)
+    if config.log_interval:
+        print(f'⚡ 训练吞吐: {samples_per_sec:,.0f} samples/sec')
+    if metrics:
+        batch_count = len(train_loader) - start_batch
+        metrics.epoch(epoch=epoch, samples=samples, seconds=round(elapsed, 4),
+                      samples_per_sec=round(samples_per_sec, 1),
+                      mean_loss=round(loss_sum.item() / max(batch_count, 1), 6))
+    return samples_per_sec
+
+
+def print_loss(epoch, seen, total, percent, loss):
+    print(f'Train Epoch: {epoch} [{seen}/{total} ({percent:.0f}%)]\tLoss: {loss.item():.6f}')
+
+
+def test(model, device, test_loader, metrics=None, config=None, return_loss=False):
+    """测试模型；多进程训练时各进程测一部分，汇总成整个测试集的结果
+
+    返回准确率（%）；return_loss=True时返回 (准确率, 平均损失)。
+    config.log_interval为0时不打印结果。
+    """
+    config = config or TrainConfig()
+    model.eval()
+    criterion = nn.CrossEntropyLoss(reduction='sum')
+    start = time.perf_counter()
+    # 在device上累加，最后只同步一次
+    test_loss = torch.zeros((), device=device)
+    correct = torch.zeros((), dtype=torch.int64, device=device)
+
+    with torch.no_grad():
+        for data, target in test_loader:
+            data, target = data.to(device), target.to(device)
+            output = model(data)
+            test_loss += criterion(output, target)
+            pred = output.argmax(dim=1, keepdim=True)
+            correct += pred.eq(target.view_as(pred)).sum()
+
+    total = loader_size(test_loader)
+    if dist.is_initialized():
+        totals = torch.stack([test_loss, correct.to(test_loss.dtype), torch.tensor(float(total), device=device)])
+        dist.all_reduce(totals)
+        test_loss, correct, total = totals[0], totals[1].long(), int(totals[2].item())
+    test_loss = test_loss.item() / total
+    correct = correct.item()
+    samples_per_sec = total / (time.perf_counter() - start)
+    accuracy = 100. * correct / total
+
+    if config.log_interval:
+        print(f'\n🧪 测试集: 平均损失: {test_loss:.4f}, '
+              f'准确率: {correct}/{total} '
+              f'({accuracy:.2f}%), '
+              f'{samples_per_sec:,.0f} samples/sec\n')
+    if metrics:
+        metrics.write({"type": "test", "loss": round(test_loss, 6), "accuracy": round(accuracy, 4),
+                       "samples_per_sec": round(samples_per_sec, 1)})
+
+    return (accuracy, test_loss) if return_loss else accuracy
+
+
+def cpu_snapshot(obj):
+    """把state里的所有张量复制到CPU，之后训练继续修改参数也不影响这份快照"""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {key: cpu_snapshot(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(cpu_snapshot(value) for value in obj)
+    return obj
+
+
+class CheckpointWriter:
+    """后台线程写checkpoint
+
+    save()在训练线程里只做一次CPU快照，序列化和写盘在后台线程完成。
+    先写临时文件再os.replace，中断时不会留下半个文件；
+    checkpoint_*.pt只保留最近keep个。队列长度为1，写盘跟不上时
+    save()会等上一个写完，内存里最多只有两份快照。
+    """
+
+    def __init__(self, directory=CHECKPOINT_DIR, keep=CHECKPOINT_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self.queue = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def save(self, path, state, rotate=True):
+        self.queue.put((path, cpu_snapshot(state), rotate))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            path, state, rotate = item
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f'{path}.tmp'
+                torch.save(state, tmp_path)
+                os.replace(tmp_path, path)
+                if rotate:
+                    for old in list_checkpoints(self.directory)[:-self.keep]:
+                        os.remove(old)
+            except OSError as e:
+                print(f"⚠️  保存checkpoint失败 {path}: {e}", file=sys.stderr)
+
+    def close(self):
+        """等待所有checkpoint写完"""
+        self.queue.put(None)
+        self.thread.join()
+
+
+def checkpoint_path(directory, step):
+    return os.path.join(directory, f'checkpoint_{step:08d}.pt')
+
+
+def list_checkpoints(directory):
+    """按step从旧到新排列的checkpoint文件"""
+    return sorted(glob.glob(os.path.join(directory, 'checkpoint_*.pt')))
+
+
+def training_state(model, optimizer, epoch, batch, step, best_accuracy):
+    """完整的训练状态：从(epoch, batch)继续训练所需的一切"""
+    return {
+        'model': model.state_dict(),
+        'optimizer': optimizer.state_dict(),
+        'epoch': epoch,
+        'batch': batch,
+        'step': step,
+        'best_accuracy': best_accuracy,
+        'rng': {
+            'torch': torch.get_rng_state(),
+            'cuda': torch.cuda.get_rng_state_all() if torch.cuda.is_available() else [],
+            'numpy': np.random.get_state(),
+            'python': random.getstate(),
+        },
+    }
+
+
+def load_training_state(path, model, optimizer):
+    """加载checkpoint到model和optimizer，恢复随机数状态，返回checkpoint"""
+    # 自己写的checkpoint里有numpy随机数状态，不能用weights_only
+    checkpoint = torch.load(path, map_location=get_device(), weights_only=False)
+    model.load_state_dict(checkpoint['model'])
+    optimizer.load_state_dict(checkpoint['optimizer'])
+    rng = checkpoint['rng']
+    torch.set_rng_state(rng['torch'])
+    if rng['cuda'] and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(rng['cuda'])
+    np.random.set_state(rng['numpy'])
+    random.setstate(rng['python'])
+    return checkpoint
+
+
+def setup_distributed():
+    """按torchrun设置的环境变量加入进程组（gloo），返回 (rank, world_size)
+
+    CUDA可用时每个进程用LOCAL_RANK对应的GPU；非0号进程的print不输出，
+    需要所有进程都输出时用 print(..., force=True)。
+    """
+    global device
+    dist.init_process_group('gloo')
+    rank, world_size = dist.get_rank(), dist.get_world_size()
+
+    builtin_print = builtins.print
+
+    def print_main(*args, force=False, **kwargs):
+        if rank == 0 or force:
+            builtin_print(*args, **kwargs)
+
+    builtins.print = print_main
+    if get_device().type == 'cuda':
+        device = torch.device('cuda', int(os.environ.get('LOCAL_RANK', 0)))
+        torch.cuda.set_device(device)
+    return rank, world_size
+
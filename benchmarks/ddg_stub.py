@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Stub DuckDuckGo HTML endpoint for offline testing of the search skills
+
+Serves deterministic result pages in DuckDuckGo's html markup for any
+`?q=` query (and in Bing's markup under /search), or one saved page
+(--fixture, e.g. benchmarks/fixtures/ddg_en.html) for every query,
+optionally after a delay, and counts the requests and connections it
+gets (GET /stats).
+Point the search scripts at it with DUCKDUCKGO_URL and BING_URL:
+
+    python benchmarks/ddg_stub.py --port 8765 &
+    DUCKDUCKGO_URL=http://127.0.0.1:8765/html/ python web-search/web_search.py kimi
+
+Usage: python benchmarks/ddg_stub.py [--port 8765] [--delay 0.2] [--results 10] [--fixture PAGE]
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+RESULT_TEMPLATE = """
+<div class="result results_links results_links_deep web-result ">
+  <div class="links_main links_deep result__body">
+    <h2 class="result__title">
+      <a rel="nofollow" class="result__a" href="{url}">{title}</a>
+    </h2>
+    <a class="result__snippet" href="{url}">Result {rank} for <b>{query}</b>: {snippet}</a>
+    <div class="result__extras"><a class="result__url" href="{url}">{display_url}</a></div>
+  </div>
+</div>
+"""
+
+
+BING_TEMPLATE = """
+<li class="b_algo" data-id="">
+  <div class="b_tpcn"><a class="tilk" href="{url}"><div class="tptxt"><cite>{display_url}</cite></div></a></div>
+  <h2><a href="{url}" h="ID=SERP,{rank}">{title}</a></h2>
+  <div class="b_caption"><p class="b_lineclamp2">Result {rank} for <strong>{query}</strong>: {snippet}</p></div>
+</li>
+"""
+
+
+def bing_page(query, count):
+    """A Bing results page with the same links as result_page()"""
+    digest = hashlib.sha1(f"{query}|".encode("utf-8")).hexdigest()[:8]
+    escaped = html.escape(query)
+    results = []
+    for rank in range(1, count + 1):
+        display_url = f"example-{digest}.com/page/{rank}"
+        results.append(BING_TEMPLATE.format(
+            url=f"https://{display_url}",
+            title=f"{escaped} - page {rank}",
+            rank=rank,
+            query=escaped,
+            snippet="lorem ipsum dolor sit amet " * 4,
+            display_url=display_url,
+        ))
+    return (
+        "<!DOCTYPE html><html><head><title>" + escaped + " - Search</title></head>"
+        "<body><ol id=\"b_results\">" + "".join(results) + "</ol></body></html>"
+    )
+
+
+def result_page(query, count, language=""):
+    """A results page whose links depend only on the query"""
+    digest = hashlib.sha1(f"{query}|{language}".encode("utf-8")).hexdigest()[:8]
+    escaped = html.escape(query)
+    results = []
+    for rank in range(1, count + 1):
+        display_url = f"example-{digest}.com/page/{rank}"
+        results.append(RESULT_TEMPLATE.format(
+            url=f"https://{display_url}",
+            title=f"{escaped} - page {rank}",
+            rank=rank,
+            query=escaped,
+            snippet="lorem ipsum dolor sit amet " * 4,
+            display_url=display_url,
+        ))
+    return (
+        "<!DOCTYPE html><html><head><title>" + escaped + " at DuckDuckGo</title></head>"
+        "<body><div id=\"links\" class=\"results\">" + "".join(results) + "</div></body></html>"
+    )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients that pool connections can reuse them
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle plus
+    # delayed ACKs adds ~40ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def handle(self):
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            # Streaming clients hang up once they have enough results
+            pass
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path == "/stats":
+            stats = {"requests": self.server.requests, "connections": self.server.connections}
+            self.reply(200, "application/json", json.dumps(stats))
+            return
+        params = urllib.parse.parse_qs(parsed.query)
+        with self.server.lock:
+            self.server.requests += 1
+        delay = self.server.path_delays.get(parsed.path, self.server.delay)
+        if delay:
+            time.sleep(delay)
+        query = params.get("q", [""])[0]
+        if parsed.path == "/search":
+            page = bing_page(query, self.server.results)
+        elif self.server.fixture is not None:
+            page = self.server.fixture
+        else:
+            page = result_page(query, self.server.results, params.get("kl", [""])[0])
+        self.reply(200, "text/html; charset=utf-8", page)
+
+    do_POST = do_GET
+
+    def reply(self, status, content_type, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port=0, delay=0.0, results=10, fixture=None):
+    """Run the stub in a background thread; returns the server (see .url)
+
+    `fixture` is a saved DuckDuckGo page (path) served for every query.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    # Per-path overrides, e.g. {"/search": 2.0} to make Bing slow
+    server.path_delays = {}
+    server.results = results
+    server.fixture = Path(fixture).read_text(encoding="utf-8") if fixture else None
+    server.requests = 0
+    server.connections = 0
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/html/"
+    server.bing_url = f"http://127.0.0.1:{server.server_address[1]}/search"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each response")
+    parser.add_argument("--results", type=int, default=10, help="results per page")
+    parser.add_argument("--fixture", help="saved DuckDuckGo page to serve for every query")
+    args = parser.parse_args()
+
+    server = start(args.port, args.delay, args.results, args.fixture)
+    print(f"Stub DuckDuckGo listening on {server.url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
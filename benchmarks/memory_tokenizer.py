@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+memory-simple tokenizer benchmark - indexed search vs the substring scan
+
+Builds a seeded synthetic corpus of mixed Chinese/English memories and
+compares, per query, the original full substring scan against
+memory.search_memories with each tokenizer: latency percentiles, build
+time and recall of the scan's match set (the index must never lose a
+match). For each tokenizer the corpus goes into a temporary store
+(MEMORY_SIMPLE_DIR) through add_memory and is then compacted into
+segments, so the real segmented search path is what is measured.
+
+It also reports top-10 latency for each scorer (bm25 vs legacy).
+
+Usage: python benchmarks/memory_tokenizer.py [--size 100000] [--queries 200]
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ZH_WORDS = [
+    "用户", "喜欢", "使用", "模型", "项目", "配置", "偏好", "深色", "模式", "会议",
+    "时间", "文档", "搜索", "记忆", "训练", "数据", "部署", "服务", "接口", "测试",
+    "面试", "准备", "学习", "笔记", "周报", "需求", "上线", "回滚", "监控", "告警",
+    "数据库", "向量", "检索", "排序", "缓存", "日志", "权限", "账号", "邮件", "提醒",
+]
+EN_WORDS = [
+    "kimi", "openclaw", "python", "pytorch", "deadline", "project", "meeting", "model",
+    "agent", "search", "memory", "vector", "index", "deploy", "docker", "config",
+    "release", "review", "bug", "fix", "api", "token", "latency", "cache", "mnist",
+    "training", "dataset", "prompt", "browser", "notes", "march", "friday", "team",
+]
+ZH_CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严龙飞"
+
+
+def vocabulary(rng, count):
+    """Seed words plus a long tail of generated ones, most frequent first"""
+    zh = list(ZH_WORDS)
+    while len(zh) < count:
+        zh.append("".join(rng.choice(ZH_CHARS) for _ in range(rng.randint(2, 3))))
+    syllables = ["ka", "ri", "to", "mo", "la", "ne", "su", "vi", "do", "pe", "xo", "qu", "ben", "tal"]
+    en = list(EN_WORDS)
+    while len(en) < count:
+        en.append("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    # Zipf-like weights so a few words are common and most are rare
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(count)))
+    return zh, en, cum_weights
+
+
+def make_corpus(size, seed, vocab_size=3000):
+    """Seeded mixed-language memories; Chinese words often run together"""
+    rng = random.Random(seed)
+    zh, en, cum_weights = vocabulary(rng, vocab_size)
+    memories = []
+    for i in range(size):
+        parts = []
+        for _ in range(rng.randint(3, 9)):
+            if rng.random() < 0.6:
+                run = "".join(rng.choices(zh, cum_weights=cum_weights)[0] for _ in range(rng.randint(1, 3)))
+                parts.append(run)
+            else:
+                parts.append(rng.choices(en, cum_weights=cum_weights)[0])
+        memories.append({
+            "id": f"mem_{i}",
+            "content": " ".join(parts),
+            "timestamp": f"2026-01-01T00:00:{i:09d}",
+            "tags": [rng.choice(EN_WORDS)] if rng.random() < 0.1 else [],
+        })
+    return memories
+
+
+def make_queries(count, seed, vocab_size=3000):
+    """Chinese words and phrases, English words and prefixes, mixed queries"""
+    zh, en, _ = vocabulary(random.Random(seed), vocab_size)
+    rng = random.Random(seed + 1)
+    queries = []
+    for i in range(count):
+        kind = i % 5
+        if kind == 0:
+            queries.append(rng.choice(zh))
+        elif kind == 1:
+            queries.append(rng.choice(zh) + rng.choice(zh))
+        elif kind == 2:
+            queries.append(rng.choice(en))
+        elif kind == 3:
+            queries.append(rng.choice(en)[:3])
+        else:
+            queries.append(f"{rng.choice(en)} {rng.choice(zh)}")
+    return queries
+
+
+def scan_search(memory, memories, query, limit):
+    """The original matcher: score every memory with substring tests
+
+    Returns positions in `memories`, highest score then newest first.
+    """
+    query_lower = query.lower()
+    query_words = query_lower.split()
+    scored = []
+    for position, memory_item in enumerate(memories):
+        score = memory.score_memory(memory_item, query_lower, query_words)
+        if score > 0:
+            scored.append((score, memory_item['timestamp'], position))
+    return [position for _, _, position in heapq.nlargest(limit, scored, key=lambda x: x[:2])]
+
+
+def build_store(memory, memories, tokenizer):
+    """Clear the store and fill it with `memories` through add_memory and compact
+
+    Returns the seconds taken, the segment count and the corpus position
+    of each stored id.
+    """
+    memory.clear_all_memories()
+    memory.TOKENIZER = tokenizer
+    start = time.perf_counter()
+    positions = {}
+    for position, memory_item in enumerate(memories):
+        added = memory.add_memory(memory_item["content"], memory_item["tags"])
+        positions[added["memory"]["id"]] = position
+    compacted = memory.compact_memories()
+    if not compacted.get("success"):
+        raise RuntimeError(compacted.get("error"))
+    return time.perf_counter() - start, compacted["segments"], positions
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # memory.py reads its data directory at import time
+    store = tempfile.mkdtemp()
+    os.environ["MEMORY_SIMPLE_DIR"] = store
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "memory-simple"))
+    import memory
+    # Durability is not what is measured; fsync would dominate the build
+    memory.FSYNC_WRITES = False
+
+    memories = make_corpus(args.size, args.seed)
+    queries = make_queries(args.queries, args.seed)
+    # Full match sets, so recall covers every hit and not just the top 10
+    limit = len(memories)
+
+    timings, expected = [], []
+    for query in queries:
+        start = time.perf_counter()
+        expected.append(scan_search(memory, memories, query, limit))
+        timings.append(time.perf_counter() - start)
+    report = {
+        "corpus_size": args.size,
+        "queries": len(queries),
+        "seed": args.seed,
+        "substring_scan": percentiles(timings),
+        "indexed": {},
+    }
+
+    try:
+        # The default tokenizer goes last, so its store is the one left for the top-10 runs
+        names = sorted(memory.TOKENIZERS, key=lambda name: name == memory.TOKENIZER)
+        for name in names:
+            build_seconds, segments, positions = build_store(memory, memories, name)
+            # Loads the segments, so the timings below are warm searches
+            memory.search_memories(queries[0], 10)
+
+            timings, hits, relevant, top_hits, top_relevant = [], 0, 0, 0, 0
+            for query, want in zip(queries, expected):
+                start = time.perf_counter()
+                got = memory.search_memories(query, limit, scorer="legacy")
+                timings.append(time.perf_counter() - start)
+                got = [positions[m["id"]] for m in got]
+                got_set = set(got)
+                hits += sum(1 for position in want if position in got_set)
+                relevant += len(want)
+                top = set(got[:10])
+                top_hits += sum(1 for position in want[:10] if position in top)
+                top_relevant += len(want[:10])
+
+            report["indexed"][name] = {
+                "build_seconds": round(build_seconds, 3),
+                "segments": segments,
+                "latency": percentiles(timings),
+                "recall": round(hits / relevant, 4) if relevant else 1.0,
+                "recall_at_10": round(top_hits / top_relevant, 4) if top_relevant else 1.0,
+            }
+
+        # Ranking comparison on the default tokenizer: top-10 latency per scorer
+        report["top10"] = {}
+        for scorer in memory.SCORERS:
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                memory.search_memories(query, 10, scorer=scorer)
+                timings.append(time.perf_counter() - start)
+            report["top10"][scorer] = percentiles(timings)
+    finally:
+        shutil.rmtree(store, ignore_errors=True)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
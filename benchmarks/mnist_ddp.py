@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+MNIST data-parallel scaling benchmark - train.py --ddp at 1/2/4/8 processes
+
+Writes a seeded synthetic MNIST-shaped dataset (uint8 28x28 digits drawn
+from ten noisy class templates) as the tensor-mode .npy cache, so nothing
+is downloaded, then runs `torchrun --standalone --nproc_per_node N
+train.py --ddp` for each N. Each run's CPU cores are split evenly between
+its processes (OMP_NUM_THREADS). Reports total training samples/sec (from
+rank 0's --metrics file, first epoch excluded as warm-up when there are
+more), speedup and parallel efficiency over one process, and final test
+accuracy.
+
+Usage: python benchmarks/mnist_ddp.py [--procs 1,2,4,8] [--epochs 2] [--train-size 60000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+MNIST_DIR = Path(__file__).resolve().parent.parent / "01-mnist-classification"
+
+
+def write_synthetic_mnist(data_dir, train_size=60000, test_size=10000, seed=0):
+    """MNIST-shaped uint8 images and int64 labels in training.py's tensor cache layout"""
+    rng = np.random.default_rng(seed)
+    templates = rng.integers(0, 256, size=(10, 28, 28)).astype(np.float32)
+    os.makedirs(data_dir, exist_ok=True)
+    for split, size in (("train", train_size), ("test", test_size)):
+        labels = rng.integers(0, 10, size=size).astype(np.int64)
+        noise = rng.normal(0, 64, size=(size, 28, 28)).astype(np.float32)
+        images = np.clip(templates[labels] + noise, 0, 255).astype(np.uint8)
+        np.save(os.path.join(data_dir, f"mnist_{split}_images.npy"), images)
+        np.save(os.path.join(data_dir, f"mnist_{split}_labels.npy"), labels)
+
+
+def run(procs, workdir, data_dir, epochs, threads):
+    metrics = os.path.join(workdir, f"metrics_{procs}.jsonl")
+    command = [
+        sys.executable, "-m", "torch.distributed.run", "--standalone", f"--nproc_per_node={procs}",
+        str(MNIST_DIR / "train.py"), "--ddp", "--data-dir", data_dir, "--epochs", str(epochs),
+        "--metrics", metrics, "--checkpoint-dir", os.path.join(workdir, f"checkpoints_{procs}"),
+        "--checkpoint-every", "0",
+    ]
+    env = dict(os.environ, OMP_NUM_THREADS=str(threads))
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+
+    with open(metrics, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    throughput = [r["samples_per_sec"] for r in records if r["type"] == "throughput"]
+    measured = throughput[1:] or throughput
+    tests = [r for r in records if r["type"] == "test"]
+    return {
+        "threads_per_process": threads,
+        "samples_per_sec": round(sum(measured) / len(measured), 1),
+        "wall_seconds": round(elapsed, 2),
+        "test_accuracy": tests[-1]["accuracy"] if tests else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--procs", default="1,2,4,8", help="comma-separated process counts")
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--train-size", type=int, default=60000)
+    parser.add_argument("--test-size", type=int, default=10000)
+    parser.add_argument("--cores", type=int, default=os.cpu_count(), help="cores to split between processes")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    data_dir = os.path.join(workdir, "data")
+    write_synthetic_mnist(data_dir, args.train_size, args.test_size)
+
+    report = {"cores": args.cores, "epochs": args.epochs, "train_size": args.train_size, "runs": {}}
+    baseline = None
+    for procs in (int(p) for p in args.procs.split(",")):
+        result = run(procs, workdir, data_dir, args.epochs, max(1, args.cores // procs))
+        if "error" not in result:
+            baseline = baseline or (procs, result["samples_per_sec"])
+            speedup = result["samples_per_sec"] / baseline[1]
+            result["speedup"] = round(speedup, 2)
+            result["efficiency"] = round(speedup * baseline[0] / procs, 2)
+        report["runs"][procs] = result
+        print(f"{procs} processes: {json.dumps(result)}", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+MNIST inference server load generator - micro-batching vs one-at-a-time
+
+Starts 01-mnist-classification/serve.py in a subprocess (CPU only), once
+per batching configuration, and drives it with closed-loop clients: each
+client thread keeps one keep-alive connection and sends its next
+single-image /predict as soon as the previous answer arrives. Reports
+client-side latency percentiles and requests/sec, plus the server's own
+/stats (queue-to-answer latency, average batch size).
+
+With no --model, a randomly initialized Net is saved to a temp file;
+latency does not depend on the weights.
+
+Usage: python benchmarks/mnist_serve.py [--requests 2000] [--clients 32] [--configs 1:0,64:2] [--unix]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+MNIST_DIR = Path(__file__).resolve().parent.parent / "01-mnist-classification"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=30):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def connect(address):
+    if isinstance(address, str):
+        return UnixHTTPConnection(address)
+    return http.client.HTTPConnection(*address, timeout=30)
+
+
+def request(conn, method, path, body=None):
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def random_model(path):
+    """Save a randomly initialized Net state_dict to `path`"""
+    sys.path.insert(0, str(MNIST_DIR))
+    import torch
+    from training import Net
+    torch.save(Net().state_dict(), path)
+
+
+def start_server(model, max_batch, max_wait_ms, unix_path=None, threads=0):
+    command = [sys.executable, str(MNIST_DIR / "serve.py"), "--model", model,
+               "--max-batch", str(max_batch), "--max-wait-ms", str(max_wait_ms), "--threads", str(threads)]
+    if unix_path:
+        command += ["--unix", unix_path]
+        address = unix_path
+    else:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        command += ["--port", str(port)]
+        address = ("127.0.0.1", port)
+    process = subprocess.Popen(command, cwd=MNIST_DIR, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py exited with status {process.returncode}")
+        try:
+            conn = connect(address)
+            request(conn, "GET", "/health")
+            conn.close()
+            return process, address
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("serve.py did not start within 60s")
+
+
+def run_load(address, total, clients, seed=0):
+    rng = random.Random(seed)
+    # A fixed pool of request bodies, so JSON encoding is not measured
+    bodies = [json.dumps({"pixels": [rng.randrange(256) for _ in range(784)]}) for _ in range(64)]
+    latencies = []
+    errors = []
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def client():
+        conn = connect(address)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            try:
+                status, result = request(conn, "POST", "/predict", bodies[i % len(bodies)])
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(str(e))
+                conn.close()
+                conn = connect(address)
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                if status == 200 and result.get("success"):
+                    latencies.append(elapsed)
+                else:
+                    errors.append(result.get("error", status))
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+    return {
+        "requests": len(ordered),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(ordered) / elapsed, 1),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=32, help="concurrent closed-loop clients")
+    parser.add_argument("--configs", default="1:0,64:2",
+                        help="comma-separated max_batch:max_wait_ms server configurations")
+    parser.add_argument("--model", help="Net state_dict (default: random weights)")
+    parser.add_argument("--unix", action="store_true", help="serve on a Unix socket instead of TCP")
+    parser.add_argument("--threads", type=int, default=0, help="server torch threads (0 = default)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    model = args.model and os.path.abspath(args.model)
+    if not model:
+        model = os.path.join(workdir, "random_model.pt")
+        random_model(model)
+
+    report = {"requests": args.requests, "clients": args.clients, "transport": "unix" if args.unix else "tcp"}
+    for config in args.configs.split(","):
+        max_batch, max_wait_ms = config.split(":")
+        unix_path = os.path.join(workdir, "serve.sock") if args.unix else None
+        process, address = start_server(model, int(max_batch), float(max_wait_ms), unix_path, args.threads)
+        try:
+            # Warm up the connection setup and the first forward passes
+            run_load(address, min(200, args.requests), args.clients, seed=1)
+            client = run_load(address, args.requests, args.clients)
+            conn = connect(address)
+            _, server = request(conn, "GET", "/stats")
+            conn.close()
+        finally:
+            process.terminate()
+            process.wait()
+        report[f"batch{max_batch}_wait{max_wait_ms}ms"] = {
+            "client": client,
+            "server": {key: server[key] for key in ("avg_batch_size", "p50_ms", "p99_ms")},
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
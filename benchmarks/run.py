@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark harness - every skill on seeded data, compared with a baseline
+
+Runs without network access or downloaded models. Every input is generated
+from a seed or committed, so two runs on one machine measure the same work:
+
+- memory-simple: a seeded mixed Chinese/English corpus per --memory-sizes
+  (1k to 1M), sealed into segments in a temp dir. Reports the segment
+  write, the cold first search, top-10 search and list latency
+  percentiles, and add latency and adds/sec (fsync on).
+- memory-search: the same corpus through add_many into the NumPy backend,
+  with a seeded hashing embedder in place of sentence-transformers (model
+  time is excluded; only the store is measured). Reports docs/sec and
+  search latency percentiles.
+- search-parse: the saved DuckDuckGo pages (benchmarks/fixtures) through
+  web-search/result_parser.py, all results and the top 5.
+- search-stub: web_search.py and local-search/search.py end to end against
+  benchmarks/ddg_stub.py serving the saved ddg_en.html page on localhost.
+- mnist-train: training.py's train() in process on a seeded synthetic
+  MNIST-shaped tensor cache; samples/sec, first epoch as warm-up.
+
+Each case runs in its own child process and reports its own peak RSS, so
+one case's allocations never inflate another's.
+
+Results are one JSON document (with the machine's python/cpu details).
+--save writes it, e.g. as a new baseline; --baseline (default
+benchmarks/baseline.json when present) compares medians, totals and rates
+with the stored run: p50_ms, *_seconds and *_mb are worse when higher,
+*_per_sec when lower (mean, p95 and max are reported but too noisy to
+gate on). A change past --tolerance is a regression and the exit status
+is 1. Baselines only compare on the machine that made them.
+
+Usage: python benchmarks/run.py [--only memory-simple] [--memory-sizes 1000,10000] [--save PATH] [--baseline PATH]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+FIXTURES = BENCH_DIR / "fixtures"
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+SUITES = ("memory-simple", "memory-search", "search-parse", "search-stub", "mnist-train")
+MEMORY_SIZES = "1000,10000,100000"
+TOLERANCE = 0.25
+SEED = 1
+QUERIES = 200
+ADDS = 200
+EMBEDDING_DIM = 384
+
+sys.path.insert(0, str(BENCH_DIR))
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def timed(function, *args, **kwargs):
+    """(result, seconds) of one call"""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def latencies(function, inputs):
+    samples = []
+    for item in inputs:
+        samples.append(timed(function, item)[1])
+    return samples
+
+
+def bench_memory_simple(size, args):
+    sys.path.insert(0, str(ROOT / "memory-simple"))
+    import memory
+    from memory_tokenizer import make_corpus, make_queries, percentiles
+
+    workdir = Path(tempfile.mkdtemp())
+    memory.MEMORY_FILE = workdir / "memory.json"
+    memory.LOG_FILE = workdir / "memory.jsonl"
+    memory.LOCK_FILE = workdir / ".memory.lock"
+    memory.SEGMENTS_DIR = workdir / "segments"
+
+    corpus = make_corpus(size, args.seed)
+    queries = make_queries(args.queries, args.seed)
+    _, snapshot_seconds = timed(memory.save_memories, corpus)
+    del corpus
+    _, cold_seconds = timed(memory.execute, {"command": "search", "query": queries[0], "limit": 10})
+    search = latencies(lambda q: memory.execute({"command": "search", "query": q, "limit": 10}), queries)
+    listing = latencies(lambda _: memory.execute({"command": "list", "limit": 10}), range(args.queries))
+    adds = latencies(lambda i: memory.execute({"command": "add", "text": f"benchmark add {i} 基准测试"}),
+                     range(args.adds))
+    return {
+        "memories": size,
+        "snapshot_seconds": round(snapshot_seconds, 3),
+        "cold_search_seconds": round(cold_seconds, 3),
+        "search": percentiles(search),
+        "list": percentiles(listing),
+        "add": percentiles(adds),
+        "adds_per_sec": round(len(adds) / sum(adds), 1),
+    }
+
+
+class HashEmbedder:
+    """Seeded bag-of-tokens hashing embedder standing in for the model"""
+
+    def __init__(self, dim=EMBEDDING_DIM, seed=SEED):
+        self.dim = dim
+        self.seed = seed
+
+    def __call__(self, texts):
+        import numpy as np
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.split():
+                h = zlib.crc32(token.encode("utf-8"), self.seed)
+                vectors[row, h % self.dim] += 1.0 if h & 1 << 31 else -1.0
+        return vectors.tolist()
+
+
+def bench_memory_search(size, args):
+    sys.path.insert(0, str(ROOT / "memory-search"))
+    import memory_search
+    from memory_tokenizer import make_corpus, make_queries, percentiles
+
+    workdir = Path(tempfile.mkdtemp())
+    memory_search.CONFIG_FILE = workdir / "config.json"
+    memory_search.CONFIG_FILE.write_text(json.dumps({
+        "db_path": str(workdir / "memory_db"),
+        "embedding_model": "benchmark-hash",
+        "backend": "numpy",
+        "embedding_cache_size": 0,
+    }), encoding="utf-8")
+    memory_search.get_embedding_function = lambda config: HashEmbedder(seed=args.seed)
+
+    corpus = make_corpus(size, args.seed)
+    items = ({"id": m["id"], "text": m["content"]} for m in corpus)
+    added, ingest_seconds = timed(memory_search.add_many, items)
+    if not added.get("success"):
+        raise RuntimeError(added.get("error"))
+    del corpus
+    queries = make_queries(args.queries, args.seed)
+    search = latencies(lambda q: memory_search.search_memories(q, 10), queries)
+    return {
+        "memories": size,
+        "ingest_seconds": round(ingest_seconds, 3),
+        "docs_per_sec": round(size / ingest_seconds, 1),
+        "search": percentiles(search),
+    }
+
+
+def bench_search_parse(args):
+    from search_parse import measure, parse_stream
+
+    report = {}
+    for path in sorted(FIXTURES.glob("ddg_*.html")):
+        data = path.read_bytes()
+        report[path.stem] = {
+            "all": measure(parse_stream, data, 1000, args.queries),
+            "top5": measure(parse_stream, data, 5, args.queries),
+        }
+    return report
+
+
+def bench_search_stub(args):
+    import ddg_stub
+    from memory_tokenizer import percentiles
+
+    server = ddg_stub.start(fixture=FIXTURES / "ddg_en.html")
+    # Read at import time by both scripts
+    os.environ["DUCKDUCKGO_URL"] = server.url
+    os.environ["BING_URL"] = server.bing_url
+    os.environ["SEARCH_BACKEND_STATS"] = os.path.join(tempfile.mkdtemp(), "backend_stats.json")
+    sys.path.insert(0, str(ROOT / "web-search"))
+    sys.path.insert(0, str(ROOT / "local-search"))
+    import search_batch
+    import web_search
+    import search as local_search
+    # Sequential queries to one host would otherwise wait on the rate limit
+    search_batch.RATE_LIMITER.rate = 0
+
+    queries = [f"benchmark query {i}" for i in range(args.queries)]
+    scripts = {
+        "web_search": lambda q: web_search.search(q, use_cache=False, backend="duckduckgo-html"),
+        "local_search": lambda q: local_search.search(q, use_cache=False),
+    }
+    report = {}
+    for name, search in scripts.items():
+        result = search(queries[0])
+        if result.get("success") is False or not result.get("results"):
+            raise RuntimeError(f"{name}: {result.get('error', 'no results')}")
+        samples = latencies(search, queries)
+        report[name] = {
+            "queries_per_sec": round(len(samples) / sum(samples), 1),
+            "latency": percentiles(samples),
+        }
+    server.shutdown()
+    return report
+
+
+def bench_mnist_train(args):
+    from mnist_ddp import write_synthetic_mnist
+
+    sys.path.insert(0, str(ROOT / "01-mnist-classification"))
+    import torch
+    import training
+    from train_config import LEARNING_RATE, MOMENTUM
+
+    data_dir = os.path.join(tempfile.mkdtemp(), "data")
+    write_synthetic_mnist(data_dir, args.train_size, 1000, args.seed)
+    torch.manual_seed(args.seed)
+    device = torch.device("cpu")
+    train_loader, _ = training.make_loaders("tensor", data_dir)
+    model = training.Net().to(device)
+    optimizer = torch.optim.SGD(model.parameters(), lr=LEARNING_RATE, momentum=MOMENTUM)
+    throughput = []
+    # train() prints its loss lines; keep them out of the JSON output
+    with contextlib.redirect_stdout(io.StringIO()):
+        for epoch in range(1, args.epochs + 1):
+            throughput.append(training.train(model, device, train_loader, optimizer, epoch))
+    measured = throughput[1:] or throughput
+    return {
+        "train_size": args.train_size,
+        "threads": torch.get_num_threads(),
+        "samples_per_sec": round(sum(measured) / len(measured), 1),
+    }
+
+
+def cases(args):
+    """(name, suite, size) for every case selected on the command line"""
+    sizes = [int(size) for size in args.memory_sizes.split(",")]
+    for suite in SUITES:
+        if args.only and suite not in args.only.split(","):
+            continue
+        if suite in ("memory-simple", "memory-search"):
+            for size in sizes:
+                yield f"{suite}/{size}", suite, size
+        else:
+            yield suite, suite, None
+
+
+def run_case(suite, size, args):
+    """Run one case in this process and return its report"""
+    if suite == "memory-simple":
+        report = bench_memory_simple(size, args)
+    elif suite == "memory-search":
+        report = bench_memory_search(size, args)
+    elif suite == "search-parse":
+        report = bench_search_parse(args)
+    elif suite == "search-stub":
+        report = bench_search_stub(args)
+    else:
+        report = bench_mnist_train(args)
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def run_child(name, suite, size, args):
+    """Run one case in a fresh interpreter"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    command = [sys.executable, __file__, "--child", suite, "--output", output,
+               "--seed", str(args.seed), "--queries", str(args.queries), "--adds", str(args.adds),
+               "--train-size", str(args.train_size), "--epochs", str(args.epochs)]
+    if size is not None:
+        command += ["--memory-sizes", str(size)]
+    env = dict(os.environ, MEMORY_SIMPLE_NO_DAEMON="1", MEMORY_SEARCH_NO_DAEMON="1")
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    try:
+        if completed.returncode != 0:
+            lines = completed.stderr.strip().splitlines()
+            return {"error": lines[-1] if lines else f"exit status {completed.returncode}"}
+        report = json.loads(Path(output).read_text(encoding="utf-8"))
+    finally:
+        os.unlink(output)
+    print(f"{name}: {elapsed:.1f}s", file=sys.stderr)
+    return report
+
+
+def environment():
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            info["cpu"] = next(line.split(":", 1)[1].strip() for line in f if line.startswith("model name"))
+    except (OSError, StopIteration):
+        info["cpu"] = platform.processor()
+    return info
+
+
+def flatten(report, prefix=""):
+    """{"a/b/p50_ms": 1.2, ...} for every numeric leaf"""
+    values = {}
+    for key, value in report.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, path + "/"))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def direction(key):
+    """+1 when higher is better, -1 when lower is better, 0 when not compared"""
+    name = key.rsplit("/", 1)[-1]
+    if name.endswith("_per_sec"):
+        return 1
+    if name == "p50_ms" or name.endswith(("_seconds", "_mb")):
+        return -1
+    return 0
+
+
+def compare(results, baseline, tolerance):
+    """Relative change of every compared metric and the regressions among them"""
+    current = flatten(results)
+    changes = {}
+    regressions = []
+    for key, old in flatten(baseline).items():
+        sign = direction(key)
+        if not sign or key not in current or not old:
+            continue
+        change = (current[key] - old) / old
+        changes[key] = round(change, 3)
+        if sign * change < -tolerance:
+            regressions.append(key)
+    return changes, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", help="comma-separated suites (" + ", ".join(SUITES) + ")")
+    parser.add_argument("--memory-sizes", default=MEMORY_SIZES, help="comma-separated corpus sizes")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--queries", type=int, default=QUERIES, help="searches (and parses) per case")
+    parser.add_argument("--adds", type=int, default=ADDS, help="memory-simple adds per case")
+    parser.add_argument("--train-size", type=int, default=20000, help="synthetic MNIST training images")
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--save", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with this saved run (default: benchmarks/baseline.json)")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed relative slowdown")
+    parser.add_argument("--child", choices=SUITES, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        size = int(args.memory_sizes) if args.child in ("memory-simple", "memory-search") else None
+        report = run_case(args.child, size, args)
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False), encoding="utf-8")
+        return
+
+    # Read the baseline before the (slow) run so a bad file fails fast
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE_FILE
+    baseline = None
+    if args.baseline or (BASELINE_FILE.exists() and not args.save):
+        try:
+            baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"Cannot read baseline {baseline_path}: {e}", file=sys.stderr)
+            sys.exit(1)
+        baseline = baseline.get("results") if isinstance(baseline, dict) else None
+        if not isinstance(baseline, dict):
+            print(f"Baseline {baseline_path} has no \"results\" object; regenerate it with --save", file=sys.stderr)
+            sys.exit(1)
+
+    results = {}
+    for name, suite, size in cases(args):
+        results[name] = run_child(name, suite, size, args)
+    report = {
+        "environment": environment(),
+        "settings": {"seed": args.seed, "queries": args.queries, "adds": args.adds,
+                     "train_size": args.train_size, "epochs": args.epochs},
+        "results": results,
+    }
+
+    regressions = []
+    if baseline is not None:
+        changes, regressions = compare(results, baseline, args.tolerance)
+        report["baseline"] = {"file": str(baseline_path), "tolerance": args.tolerance,
+                              "changes": changes, "regressions": regressions}
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    failed = [name for name, result in results.items() if "error" in result]
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
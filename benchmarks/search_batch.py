@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Search batch benchmark - sequential vs pooled concurrent queries
+
+Starts the stub DuckDuckGo server (benchmarks/ddg_stub.py) with a fixed
+per-request delay and runs the same query list through web_search.py and
+local-search/search.py: once one query at a time, as the CLIs did per
+invocation, and once through the batch thread pool. Reports queries/sec,
+per-query latency percentiles and TCP connections opened. The result cache
+is bypassed and the per-host rate limit is off unless --rate is given.
+
+Usage: python benchmarks/search_batch.py [--queries 200] [--workers 8] [--delay 0.05]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(ROOT / "local-search"))
+sys.path.insert(0, str(ROOT / "web-search"))
+import ddg_stub  # noqa: E402
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def stub_stats(server):
+    with urllib.request.urlopen(server.url.replace("/html/", "/stats")) as response:
+        return json.load(response)
+
+
+def run(server, search_batch, search, queries, workers):
+    """Run queries through the batch pool and report throughput"""
+    before = stub_stats(server)
+    latencies = []
+
+    def timed(**query):
+        start = time.perf_counter()
+        result = search(**query)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    start = time.perf_counter()
+    failed = sum(
+        1 for _, _, result in search_batch.run_batch(queries, timed, workers)
+        if result.get("success") is False or any("error" in r for r in result.get("results", []))
+    )
+    elapsed = time.perf_counter() - start
+    after = stub_stats(server)
+    return {
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "queries_per_sec": round(len(queries) / elapsed, 1),
+        "failed": failed,
+        # Less the connection of the second stats request
+        "connections": after["connections"] - before["connections"] - 1,
+        "latency": percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.05, help="stub server delay per request (s)")
+    parser.add_argument("--rate", type=float, default=0.0, help="per-host requests/sec limit (0 = off)")
+    args = parser.parse_args()
+
+    server = ddg_stub.start(delay=args.delay)
+    # Read at import time by both scripts
+    os.environ["DUCKDUCKGO_URL"] = server.url
+    os.environ["BING_URL"] = server.bing_url
+    os.environ["SEARCH_BACKEND_STATS"] = os.path.join(tempfile.mkdtemp(), "backend_stats.json")
+    import search_batch
+    import web_search
+    import search as local_search
+    search_batch.RATE_LIMITER.rate = args.rate
+
+    queries = [{"query": f"benchmark query {i}"} for i in range(args.queries)]
+    scripts = {
+        # One backend, so hedging cannot change what is measured
+        "web_search": lambda query: web_search.search(query, use_cache=False, backend="duckduckgo-html"),
+        "local_search": lambda query: local_search.search(query, use_cache=False),
+    }
+    report = {
+        "queries": args.queries,
+        "server_delay_ms": args.delay * 1000,
+        "rate_limit": args.rate,
+    }
+    for name, search in scripts.items():
+        report[name] = {
+            "sequential": run(server, search_batch, search, queries, 1),
+            "batch": run(server, search_batch, search, queries, args.workers),
+        }
+        report[name]["speedup"] = round(
+            report[name]["batch"]["queries_per_sec"] / report[name]["sequential"]["queries_per_sec"], 2
+        )
+
+    server.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
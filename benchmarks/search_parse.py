@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Search result parsing benchmark - streaming extractor vs regex and bs4
+
+Parses the saved DuckDuckGo fixture pages (benchmarks/fixtures/ddg_*.html),
+a large page built by repeating one fixture's results and a page of 10
+results without snippets (where the regex backtracks through the rest of
+the page for every result), with:
+
+- regex: the former web_search.py parser (re.DOTALL pattern over the
+  whole page, an HTMLParser per title and snippet)
+- bs4: the former search.py parser (full BeautifulSoup tree, .result nodes)
+- stream: web-search/result_parser.py fed 16 KiB chunks, all results
+- stream_top5: the same, stopping after 5 results as the scripts do
+
+and reports parse time percentiles and peak traced memory (tracemalloc).
+
+Usage: python benchmarks/search_parse.py [--repeat 20] [--scale 40]
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from html.parser import HTMLParser
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "web-search"))
+import result_parser  # noqa: E402
+
+FIXTURES = BENCH_DIR / "fixtures"
+RESULT_PATTERN = r'<div class="result[^"]*"[^>]*>.*?<a[^>]*class="result__a"[^>]*href="([^"]*)"[^>]*>(.*?)</a>.*?<a[^>]*class="result__snippet"[^>]*>(.*?)</a>.*?</div>'
+
+
+class MLStripper(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.fed = []
+
+    def handle_data(self, d):
+        self.fed.append(d)
+
+
+def strip_tags(html):
+    s = MLStripper()
+    s.feed(html)
+    return "".join(s.fed)
+
+
+def parse_regex(data, max_results):
+    html = data.decode("utf-8")
+    return [
+        {"title": strip_tags(title).strip(), "url": url, "snippet": strip_tags(snippet).strip()}
+        for url, title, snippet in re.findall(RESULT_PATTERN, html, re.DOTALL)[:max_results]
+    ]
+
+
+def parse_bs4(data, max_results):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(data.decode("utf-8"), "html.parser")
+    results = []
+    for result in soup.select(".result"):
+        title_elem = result.select_one(".result__title a")
+        snippet_elem = result.select_one(".result__snippet")
+        url_elem = result.select_one(".result__url")
+        if title_elem:
+            results.append({
+                "title": title_elem.get_text(strip=True),
+                "url": title_elem.get("href", ""),
+                "snippet": snippet_elem.get_text(strip=True) if snippet_elem else "",
+                "display_url": url_elem.get_text(strip=True) if url_elem else "",
+            })
+        if len(results) >= max_results:
+            break
+    return results
+
+
+def chunks(data, size=result_parser.CHUNK_SIZE):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def parse_stream(data, max_results):
+    return list(result_parser.extract_results(chunks(data), max_results))
+
+
+def large_page(data, scale):
+    """One fixture with its organic results repeated `scale` times"""
+    html = data.decode("utf-8")
+    start = html.index('<div class="result results_links results_links_deep web-result')
+    end = html.index('<div class="nav-link">')
+    return (html[:start] + html[start:end] * scale + html[end:]).encode("utf-8")
+
+
+def without_snippets(data, count=10):
+    """The first `count` organic results of a fixture, snippets removed"""
+    html = data.decode("utf-8")
+    marker = '<div class="result results_links results_links_deep web-result'
+    start = html.index(marker)
+    end = html.index('<div class="nav-link">')
+    results = html[start:end].split(marker)[1:count + 1]
+    body = re.sub(r'<a class="result__snippet"[^>]*>.*?</a>', "", "".join(marker + r for r in results), flags=re.DOTALL)
+    return (html[:start] + body + html[end:]).encode("utf-8")
+
+
+def measure(parse, data, max_results, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = parse(data, max_results)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    parse(data, max_results)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    ordered = sorted(timings)
+    return {
+        "results": len(results),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--scale", type=int, default=40, help="result repetitions in the large page")
+    args = parser.parse_args()
+
+    pages = {path.stem: path.read_bytes() for path in sorted(FIXTURES.glob("ddg_*.html"))}
+    pages["large"] = large_page(pages["ddg_en"], args.scale)
+    pages["no_snippets"] = without_snippets(pages["ddg_en"])
+
+    parsers = {"regex": (parse_regex, None), "bs4": (parse_bs4, None),
+               "stream": (parse_stream, None), "stream_top5": (parse_stream, 5)}
+    try:
+        import bs4  # noqa: F401
+    except ImportError:
+        del parsers["bs4"]
+        print("beautifulsoup4 not installed; skipping bs4", file=sys.stderr)
+
+    report = {}
+    for name, data in pages.items():
+        report[name] = {"bytes": len(data)}
+        for parser_name, (parse, max_results) in parsers.items():
+            report[name][parser_name] = measure(parse, data, max_results or 10 ** 9, args.repeat)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+CLI startup benchmark - cold-start wall time per skill command
+
+Agents start the skill scripts once per tool call, so their startup cost
+is paid on every call. For each command this runs the script --runs times
+and reports the median and max wall time, then runs it once more under
+`python -X importtime` and reports the total import time and the heaviest
+top-level imports (the interpreter's own `site` setup excluded).
+
+Medians are compared with benchmarks/startup_thresholds.json; a command
+over its threshold is flagged and the exit status is 1. Thresholds depend
+on the machine: regenerate them with --update (median x --headroom).
+
+Only cheap, read-only paths are timed: usage errors, --help and `list`.
+Daemons are bypassed so each run measures the script itself, and
+memory-simple runs against a temporary copy of the repo's memory.json
+(migrated to segments before timing) so the tracked store is not touched.
+memory-search runs against a temporary NumPy-backend store; its `list`
+must not import the embedding model's packages (FORBIDDEN_IMPORTS), and
+one that does is flagged like a threshold regression.
+
+Usage: python benchmarks/startup.py [--runs 5] [--only memory-simple] [--update]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+THRESHOLDS_FILE = Path(__file__).resolve().parent / "startup_thresholds.json"
+HEADROOM = 1.5
+COMMANDS = {
+    "memory-simple usage": ["memory-simple/memory.py"],
+    "memory-simple list": ["memory-simple/memory.py", "list"],
+    "memory-search usage": ["memory-search/memory_search.py"],
+    "memory-search list": ["memory-search/memory_search.py", "list"],
+    "web-search usage": ["web-search/web_search.py"],
+    "local-search usage": ["local-search/search.py"],
+    "mnist train --help": ["01-mnist-classification/train.py", "--help"],
+}
+# Commands that must stay off the embedding model: name -> modules
+FORBIDDEN_IMPORTS = {
+    "memory-search list": ["sentence_transformers"],
+}
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def command_env(store):
+    return dict(os.environ, MEMORY_SIMPLE_NO_DAEMON="1", MEMORY_SEARCH_NO_DAEMON="1", MEMORY_SIMPLE_DIR=store,
+                MEMORY_SEARCH_CONFIG=str(Path(store) / "memory_search.json"))
+
+
+def seed_store(store):
+    """Copy the repo's memory-simple store into `store` and migrate it once
+
+    Also writes a memory-search config with a NumPy-backend store in `store`.
+    """
+    config = {"db_path": str(Path(store) / "memory_db"), "backend": "numpy"}
+    (Path(store) / "memory_search.json").write_text(json.dumps(config), encoding="utf-8")
+    snapshot = ROOT / "memory-simple" / "memory.json"
+    if snapshot.exists():
+        shutil.copy(snapshot, Path(store) / "memory.json")
+    subprocess.run([sys.executable, "memory-simple/memory.py", "list"], cwd=ROOT, env=command_env(store),
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wall_times(argv, runs, store):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + argv, cwd=ROOT, env=command_env(store),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def import_profile(argv, store, top=5):
+    """Total import time, the heaviest top-level imports (in ms) and every module imported"""
+    completed = subprocess.run([sys.executable, "-X", "importtime"] + argv, cwd=ROOT, env=command_env(store),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = []
+    imported = set()
+    for line in completed.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            imported.add(match.group(4))
+        # One space of indentation marks an import made by the script itself
+        if match and len(match.group(3)) == 1 and match.group(4) != "site":
+            modules.append((match.group(4), int(match.group(2)) / 1000))
+    modules.sort(key=lambda item: -item[1])
+    return {
+        "import_ms": round(sum(ms for _, ms in modules), 1),
+        "heaviest": {name: round(ms, 1) for name, ms in modules[:top]},
+    }, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--only", help="only commands whose name contains this")
+    parser.add_argument("--update", action="store_true", help="write thresholds from this run")
+    parser.add_argument("--headroom", type=float, default=HEADROOM, help="threshold = median x headroom")
+    args = parser.parse_args()
+
+    thresholds = json.loads(THRESHOLDS_FILE.read_text(encoding="utf-8")) if THRESHOLDS_FILE.exists() else {}
+    report = {}
+    regressions = []
+    with tempfile.TemporaryDirectory() as store:
+        seed_store(store)
+        for name, argv in COMMANDS.items():
+            if args.only and args.only not in name:
+                continue
+            timings = wall_times(argv, args.runs, store)
+            median_ms = statistics.median(timings) * 1000
+            profile, imported = import_profile(argv, store)
+            result = {
+                "median_ms": round(median_ms, 1),
+                "max_ms": round(max(timings) * 1000, 1),
+                **profile,
+            }
+            forbidden = [module for module in FORBIDDEN_IMPORTS.get(name, []) if module in imported]
+            if forbidden:
+                result["forbidden_imports"] = forbidden
+                regressions.append(name)
+            if args.update:
+                thresholds[name] = round(median_ms * args.headroom)
+            if name in thresholds:
+                result["threshold_ms"] = thresholds[name]
+                result["regression"] = median_ms > thresholds[name]
+                if result["regression"] and name not in regressions:
+                    regressions.append(name)
+            report[name] = result
+
+    if args.update:
+        THRESHOLDS_FILE.write_text(json.dumps(thresholds, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if regressions:
+        print(f"Startup regressions: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,110 @@
 """
 
 import sys
+import os
 import json
-import requests
-from bs4 import BeautifulSoup
+import importlib.util
+import threading
+from pathlib import Path
 
-def search(query, max_results=5, language="zh-CN"):
+# 结果解析、缓存、批量搜索与web-search共用，需要web-search技能和本技能放在同一目录下
+WEB_SEARCH_DIR = Path(__file__).resolve().parent.parent / "web-search"
+
+def web_search_module(name):
+    """
+    按文件路径导入web-search的共用模块，不修改sys.path
+
+    以原模块名登记在sys.modules里，和web_search.py在同一进程时共用
+    同一个缓存、限速器和连接状态。
+
+    Raises:
+        ImportError: 找不到web-search技能
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    path = WEB_SEARCH_DIR / f"{name}.py"
+    if not path.exists():
+        raise ImportError(f"local-search needs the web-search skill next to it: {path} not found")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+try:
+    result_parser = web_search_module("result_parser")
+    search_batch = web_search_module("search_batch")
+    search_cache = web_search_module("search_cache")
+except ImportError as e:
+    if __name__ != "__main__":
+        raise
+    print(json.dumps({"success": False, "error": str(e)}, ensure_ascii=False))
+    sys.exit(1)
+CHUNK_SIZE, extract_results = result_parser.CHUNK_SIZE, result_parser.extract_results
+DEFAULT_WORKERS, RATE_LIMITER, main_batch = search_batch.DEFAULT_WORKERS, search_batch.RATE_LIMITER, search_batch.main_batch
+cache_key, cached, spawn_refresh = search_cache.cache_key, search_cache.cached, search_cache.spawn_refresh
+
+# 可指向镜像或本地测试服务器
+DUCKDUCKGO_URL = os.environ.get("DUCKDUCKGO_URL", "https://duckduckgo.com/html/")
+REQUEST_TIMEOUT = 10
+
+_http_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """所有请求共用一个Session，复用keep-alive连接（跳过TCP/TLS握手）
+
+    requests第一次真正发请求时才导入（约0.25秒），命中缓存、参数错误时不用等。
+    """
+    global _http_session
+    with _session_lock:
+        if _http_session is not None:
+            return _http_session
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        session.headers["User-Agent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+        session.mount("https://", HTTPAdapter(pool_maxsize=DEFAULT_WORKERS * 2))
+        session.mount("http://", HTTPAdapter(pool_maxsize=DEFAULT_WORKERS * 2))
+        _http_session = session
+        return session
+
+def search(query, max_results=5, language="zh-CN", use_cache=True, refresh=False, revalidate=None,
+           timeout=REQUEST_TIMEOUT):
+    """
+    带缓存的DuckDuckGo搜索
+
+    相同的查询（忽略大小写和空白）、语言和结果数量在TTL内直接返回缓存结果，
+    输出中的cache字段标明是否命中。
+
+    Args:
+        query: 搜索关键词
+        max_results: 返回结果数量
+        language: 语言设置 (zh-CN, en-US)
+        use_cache: 是否使用缓存
+        refresh: 跳过缓存读取，重新搜索并写入缓存
+        revalidate: 命中过期缓存时的后台刷新方式（默认后台线程）
+        timeout: 单次请求超时（秒）
+
+    Returns:
+        JSON格式的搜索结果
+    """
+    result, cache_info = cached(
+        cache_key("local-search", DUCKDUCKGO_URL, query, language, max_results),
+        lambda: fetch_results(query, max_results, language, timeout),
+        ok=lambda result: result.get("success"),
+        use_cache=use_cache,
+        refresh=refresh,
+        revalidate=revalidate
+    )
+    return dict(result, cache=cache_info)
+
+def fetch_results(query, max_results=5, language="zh-CN", timeout=REQUEST_TIMEOUT):
     """
     使用DuckDuckGo进行搜索
 
@@ -16,48 +115,25 @@ def search(query, max_results=5, language="zh-CN"):
         query: 搜索关键词
         max_results: 返回结果数量
         language: 语言设置 (zh-CN, en-US)
+        timeout: 请求超时（秒）
 
     Returns:
         JSON格式的搜索结果
     """
     try:
         # DuckDuckGo HTML搜索URL
-        url = "https://duckduckgo.com/html/"
+        url = DUCKDUCKGO_URL
         params = {
             "q": query,
             "kl": language,
             "num": max_results
         }
 
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.text, "html.parser")
-        results = []
-
-        # 解析搜索结果
-        for result in soup.select(".result"):
-            try:
-                title_elem = result.select_one(".result__title a")
-                snippet_elem = result.select_one(".result__snippet")
-                url_elem = result.select_one(".result__url")
-
-                if title_elem:
-                    results.append({
-                        "title": title_elem.get_text(strip=True),
-                        "url": title_elem.get("href", ""),
-                        "snippet": snippet_elem.get_text(strip=True) if snippet_elem else "",
-                        "display_url": url_elem.get_text(strip=True) if url_elem else ""
-                    })
-
-                if len(results) >= max_results:
-                    break
-            except Exception as e:
-                continue
+        RATE_LIMITER.wait(url)
+        # 边下载边解析，拿到max_results条结果后不再读取剩余页面
+        with get_session().get(url, params=params, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            results = list(extract_results(response.iter_content(CHUNK_SIZE), max_results))
 
         return {
             "success": True,
@@ -74,31 +150,75 @@ def search(query, max_results=5, language="zh-CN"):
             "results": []
         }
 
+def parse_query(args):
+    """
+    从命令行参数中取出 --max=N 和 --lang=LANG，其余拼成查询
+
+    Returns:
+        (query, max_results, language)
+
+    Raises:
+        ValueError: --max 不是正整数
+    """
+    max_results = 5
+    language = "zh-CN"
+    words = []
+    for arg in args:
+        if arg.startswith("--max="):
+            value = arg.split("=", 1)[1]
+            try:
+                max_results = int(value)
+            except ValueError:
+                max_results = 0
+            if max_results < 1:
+                raise ValueError(f"--max must be a positive integer, got {value!r}")
+        elif arg.startswith("--lang="):
+            language = arg.split("=", 1)[1]
+        else:
+            words.append(arg)
+    return " ".join(words), max_results, language
+
 def main():
     """命令行入口"""
-    if len(sys.argv) < 2:
+    args = sys.argv[1:]
+    use_cache = "--no-cache" not in args
+    refresh = "--refresh" in args
+    batch = "--batch" in args
+    args = [arg for arg in args if arg not in ("--no-cache", "--refresh", "--batch")]
+    timeout = REQUEST_TIMEOUT
+    if "--timeout" in args[:-1]:
+        i = args.index("--timeout")
+        timeout = float(args[i + 1])
+        del args[i:i + 2]
+
+    if batch:
+        # 批量模式：stdin每行一个查询，或JSON数组（字符串或
+        # {"query", "max_results", "language"}对象）；按完成顺序输出JSONL
+        sys.exit(main_batch(args, lambda query, max_results=5, language="zh-CN", **_: search(
+            query, int(max_results), language, use_cache=use_cache, refresh=refresh, timeout=timeout
+        )))
+
+    if not args:
         print(json.dumps({
             "success": False,
-            "error": "Usage: python search.py <query> [max_results] [language]"
+            "error": "Usage: python search.py <query> [--max=N] [--lang=LANG] [--no-cache] [--refresh] [--timeout S]\n"
+                     "       python search.py --batch [JSON array] [--workers N] [--rate R] < queries"
         }, ensure_ascii=False))
         sys.exit(1)
 
-    query = " ".join(sys.argv[1:])
-    max_results = 5
-    language = "zh-CN"
-
-    # 简单的参数解析
-    if "--max=" in query:
-        parts = query.split("--max=")
-        max_results = int(parts[1].split()[0])
-        query = parts[0].strip() + " " + parts[1].split(max_results, 1)[-1]
-
-    if "--lang=" in query:
-        parts = query.split("--lang=")
-        language = parts[1].split()[0]
-        query = parts[0].strip() + " " + parts[1].split(language, 1)[-1]
+    try:
+        query, max_results, language = parse_query(args)
+    except ValueError as e:
+        print(json.dumps({"success": False, "error": str(e)}, ensure_ascii=False))
+        sys.exit(1)
 
-    result = search(query, max_results, language)
+    result = search(
+        query, max_results, language,
+        use_cache=use_cache,
+        refresh=refresh,
+        revalidate=lambda: spawn_refresh(__file__, [arg for arg in sys.argv[1:] if arg != "--refresh"]),
+        timeout=timeout
+    )
     print(json.dumps(result, ensure_ascii=False, indent=2))
 
 if __name__ == "__main__":
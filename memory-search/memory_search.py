@@ -1,28 +1,63 @@
 #!/usr/bin/env python3
 """
 Memory Search Skill - Local semantic search using ChromaDB
+(or a NumPy flat index when ChromaDB is not installed)
 """
 
 import sys
 import json
 import os
+import atexit
+import hashlib
+import importlib.util
+import itertools
+import signal
+import socket
+import socketserver
+import threading
+import time
+import unicodedata
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 
-# Try to import chromadb
 try:
-    import chromadb
-    from chromadb.config import Settings
-    CHROMADB_AVAILABLE = True
-except ImportError:
-    CHROMADB_AVAILABLE = False
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single writer assumed
+    fcntl = None
+
+def chromadb_available():
+    """Whether ChromaDB is installed, without paying for importing it
+
+    chromadb takes seconds to import; only the chroma backend needs it,
+    so usage errors, `list` on the NumPy backend and daemon clients skip it.
+    """
+    return importlib.util.find_spec("chromadb") is not None
+
+CONFIG_FILE = Path(os.environ.get("MEMORY_SEARCH_CONFIG", Path(__file__).parent / "config.json"))
 
 def load_config():
     """Load skill configuration"""
-    config_path = Path(__file__).parent / "config.json"
+    config_path = CONFIG_FILE
     default_config = {
         "db_path": str(Path(__file__).parent / "memory_db"),
         "collection_name": "memories",
-        "embedding_model": "all-MiniLM-L6-v2"
+        "embedding_model": "all-MiniLM-L6-v2",
+        # "chroma", "numpy" (flat index) or "auto": chroma when installed
+        "backend": "auto",
+        # Embeddings kept in the on-disk cache (LRU); 0 disables it
+        "embedding_cache_size": 10000,
+        # NumPy backend scan representation: "none" (float32), "fp16",
+        # "int8" or "pq" (product quantization)
+        "quantization": "none",
+        # Quantized scans shortlist n_results x this, re-ranked with the
+        # exact float32 vectors; 0 returns the approximate ranking
+        "rerank_factor": 10,
+        # Subvectors per embedding for "pq" (one byte each)
+        "pq_subvectors": 48
     }
     
     if config_path.exists():
@@ -41,7 +76,10 @@ def load_config():
 
 def get_chroma_client(config):
     """Initialize ChromaDB client"""
-    if not CHROMADB_AVAILABLE:
+    try:
+        import chromadb
+        from chromadb.config import Settings
+    except ImportError:
         raise ImportError("ChromaDB not installed. Run: pip install chromadb")
     
     db_path = config["db_path"]
@@ -58,30 +96,265 @@ def get_chroma_client(config):
     
     return client
 
-def get_or_create_collection(client, config):
+class SentenceTransformerEmbedder:
+    """Embedding function backed by sentence-transformers
+
+    A plain callable from a list of texts to a list of vectors, which is
+    all ChromaDB asks of an embedding function, so the NumPy backend can
+    use the same one when ChromaDB is not installed.
+    """
+
+    def __init__(self, model_name):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("sentence-transformers not installed. Run: pip install sentence-transformers")
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def __call__(self, texts):
+        return self.model.encode(list(texts), convert_to_numpy=True).tolist()
+
+def get_embedding_function(config):
+    """Load the configured sentence-transformers embedding model"""
+    embedding_function = SentenceTransformerEmbedder(config["embedding_model"])
+    if config.get("embedding_cache_size", 0) > 0:
+        cache = EmbeddingCache(
+            Path(config["db_path"]) / "embedding_cache",
+            config["embedding_model"],
+            config["embedding_cache_size"]
+        )
+        embedding_function = CachedEmbeddingFunction(embedding_function, cache)
+    return embedding_function
+
+def normalize_text(text):
+    """Canonical form for cache keys: NFKC, whitespace runs collapsed"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+# Caches still in use, flushed once at exit; a Session flushes the cache
+# it drops, so a reload never leaves one behind
+LIVE_CACHES = weakref.WeakSet()
+
+@atexit.register
+def flush_caches():
+    for cache in list(LIVE_CACHES):
+        cache.flush()
+
+class EmbeddingCache:
+    """On-disk LRU cache of embeddings keyed by (model, normalized text hash)
+
+    Vectors live in a fixed-capacity float32 matrix memory-mapped from
+    `vectors.f32`, with each slot's key hash in a parallel `keys.bin`; a
+    small JSON index maps key -> slot in LRU order and carries the hit and
+    miss counters. A slot is only trusted if its stored key matches, so a
+    slot reused by another process is seen as a miss, never a wrong vector.
+    """
+
+    KEY_BYTES = 40
+
+    def __init__(self, cache_dir, model_name, capacity):
+        safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in model_name)
+        self.dir = Path(cache_dir) / safe_name
+        self.model_name = model_name
+        self.capacity = int(capacity)
+        self.index_path = self.dir / "index.json"
+        self.slots = OrderedDict()
+        self.dim = None
+        self.vectors = None
+        self.keys = None
+        self.free = []
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.load()
+        LIVE_CACHES.add(self)
+
+    def key(self, text):
+        return hashlib.sha1(f"{self.model_name}\0{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+    def load(self):
+        try:
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        if data.get("capacity") != self.capacity or not data.get("dim"):
+            # Resized: start over rather than remap every slot
+            return
+        self.dim = data["dim"]
+        self.slots = OrderedDict(data.get("slots", []))
+        self.hits = data.get("hits", 0)
+        self.misses = data.get("misses", 0)
+        self.open_arrays()
+
+    def open_arrays(self):
+        used = set(self.slots.values())
+        # Popped from the end, so the lowest free slot is used first
+        self.free = [i for i in range(self.capacity - 1, -1, -1) if i not in used]
+        import numpy as np
+        self.dir.mkdir(parents=True, exist_ok=True)
+        mode = "r+" if (self.dir / "vectors.f32").exists() else "w+"
+        self.vectors = np.memmap(self.dir / "vectors.f32", dtype=np.float32, mode=mode,
+                                 shape=(self.capacity, self.dim))
+        self.keys = np.memmap(self.dir / "keys.bin", dtype=f"S{self.KEY_BYTES}", mode=mode,
+                              shape=(self.capacity,))
+
+    def get(self, text):
+        """Cached vector for `text` (a list of floats) or None"""
+        key = self.key(text)
+        slot = self.slots.get(key)
+        if slot is not None and self.keys[slot] == key.encode('ascii'):
+            self.slots.move_to_end(key)
+            self.hits += 1
+            self.dirty = True
+            return self.vectors[slot].tolist()
+        if slot is not None:
+            del self.slots[key]
+            self.free.append(slot)
+        self.misses += 1
+        self.dirty = True
+        return None
+
+    def put(self, text, vector):
+        if self.vectors is None:
+            self.dim = len(vector)
+            self.open_arrays()
+        key = self.key(text)
+        if key in self.slots:
+            slot = self.slots.pop(key)
+        elif self.free:
+            slot = self.free.pop()
+        else:
+            # Evict the least recently used entry and take its slot
+            _, slot = self.slots.popitem(last=False)
+        self.vectors[slot] = vector
+        self.keys[slot] = key.encode('ascii')
+        self.slots[key] = slot
+        self.dirty = True
+
+    def flush(self):
+        """Write the LRU index and counters (vectors are already on disk)"""
+        if not self.dirty or self.vectors is None:
+            return
+        self.vectors.flush()
+        self.keys.flush()
+        data = {
+            "model": self.model_name,
+            "dim": self.dim,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "slots": list(self.slots.items())
+        }
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self.slots),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "path": str(self.dir)
+        }
+
+class CachedEmbeddingFunction:
+    """Embedding function that consults an EmbeddingCache before the model"""
+
+    def __init__(self, embedding_function, cache):
+        self.embedding_function = embedding_function
+        self.cache = cache
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self.lock:
+            embeddings = [self.cache.get(text) for text in texts]
+            missing = {}
+            for i, vector in enumerate(embeddings):
+                if vector is None:
+                    missing.setdefault(self.cache.key(texts[i]), []).append(i)
+            if missing:
+                # One model call for all distinct misses, so batches stay batched
+                positions = list(missing.values())
+                computed = self.embedding_function([texts[group[0]] for group in positions])
+                for group, vector in zip(positions, computed):
+                    vector = [float(x) for x in vector]
+                    self.cache.put(texts[group[0]], vector)
+                    for i in group:
+                        embeddings[i] = vector
+                self.cache.flush()
+            return embeddings
+
+class LazyEmbeddingFunction:
+    """Embedding function resolved on its first call
+
+    Backends are handed one of these, so commands that never embed
+    (list, stats, id lookups) neither import sentence-transformers nor
+    load the model.
+    """
+
+    def __init__(self, resolve):
+        self.resolve = resolve
+        self.embedding_function = None
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        if self.embedding_function is None:
+            with self.lock:
+                if self.embedding_function is None:
+                    self.embedding_function = self.resolve()
+        return self.embedding_function(texts)
+
+def get_or_create_collection(client, config, embedding_function=None):
     """Get or create the memories collection"""
     collection_name = config["collection_name"]
     
     try:
-        collection = client.get_collection(name=collection_name)
+        collection = client.get_collection(
+            name=collection_name,
+            embedding_function=embedding_function
+        )
     except Exception:
         # Collection doesn't exist, create it
         collection = client.create_collection(
             name=collection_name,
-            metadata={"hnsw:space": "cosine"}
+            metadata={"hnsw:space": "cosine"},
+            embedding_function=embedding_function
         )
     
     return collection
 
-def search_memories(query, n_results=5):
-    """Search memories semantically"""
-    try:
-        config = load_config()
-        client = get_chroma_client(config)
-        collection = get_or_create_collection(client, config)
-        
-        results = collection.query(
-            query_texts=[query],
+@contextmanager
+def store_lock(path):
+    """Serialize writers to one store across processes"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+class ChromaBackend:
+    """Vector store backed by a persistent ChromaDB collection"""
+    name = "chroma"
+
+    def __init__(self, config, embedding_function):
+        self.client = get_chroma_client(config)
+        self.collection = get_or_create_collection(self.client, config, embedding_function)
+
+    def add(self, ids, documents, metadatas):
+        self.collection.add(ids=ids, documents=documents, metadatas=metadatas)
+
+    def query(self, text, n_results):
+        results = self.collection.query(
+            query_texts=[text],
             n_results=n_results,
             include=["documents", "metadatas", "distances"]
         )
@@ -96,34 +369,634 @@ def search_memories(query, n_results=5):
                     "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
                     "distance": results["distances"][0][i] if results["distances"] else None
                 })
+        return formatted
+
+    def get(self, limit):
+        results = self.collection.get(
+            limit=limit,
+            include=["documents", "metadatas"]
+        )
         
-        return {"success": True, "results": formatted, "query": query}
+        formatted = []
+        if results["ids"]:
+            for i, doc_id in enumerate(results["ids"]):
+                formatted.append({
+                    "id": doc_id,
+                    "content": results["documents"][i] if results["documents"] else "",
+                    "metadata": results["metadatas"][i] if results["metadatas"] else {}
+                })
+        return formatted
+
+    def existing_ids(self, ids):
+        return set(self.collection.get(ids=ids, include=[])["ids"])
+
+    def count(self):
+        return self.collection.count()
+
+    def persist(self):
+        if hasattr(self.client, "persist"):
+            self.client.persist()
+
+# Rows per block when scanning quantized codes; blocks this small keep
+# the widened float32 copy in cache
+SCAN_ROWS = 1024
+
+def top_indices(scores, k):
+    """Indices of the k highest scores, best first"""
+    import numpy as np
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+class Float16Quantizer:
+    """Half-precision copy of each row: 2 bytes per dimension"""
+    name = "fp16"
+
+    def __init__(self, config=None):
+        pass
+
+    def fit(self, rows):
+        pass
+
+    def encode(self, rows):
+        import numpy as np
+        return np.asarray(rows, dtype=np.float16)
+
+    def scores(self, codes, vector):
+        import numpy as np
+        # NumPy has no float16 BLAS (and widening is slow: fp16 scans take
+        # several times as long as float32); widen a block at a time
+        return np.concatenate([
+            codes[i:i + SCAN_ROWS].astype(np.float32) @ vector for i in range(0, len(codes), SCAN_ROWS)
+        ]) if len(codes) else np.zeros(0, dtype=np.float32)
+
+    def state(self):
+        return {}
+
+    def load_state(self, state):
+        pass
+
+class Int8Quantizer(Float16Quantizer):
+    """Symmetric per-dimension int8 scalar quantization: 1 byte per dimension
+
+    Each dimension is scaled by its largest magnitude over the fitted rows,
+    so a dot product is the int8 codes against the query times the scales.
+    """
+    name = "int8"
+
+    def __init__(self, config=None):
+        self.scale = None
+
+    def fit(self, rows):
+        import numpy as np
+        self.scale = np.maximum(np.abs(rows).max(axis=0), 1e-12).astype(np.float32) / 127
+
+    def encode(self, rows):
+        import numpy as np
+        return np.clip(np.rint(np.asarray(rows) / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, codes, vector):
+        return super().scores(codes, vector * self.scale)
+
+    def state(self):
+        return {"scale": self.scale}
+
+    def load_state(self, state):
+        self.scale = state["scale"]
+
+class ProductQuantizer:
+    """Product quantization: each row as one centroid id per subvector
+
+    Rows are split into `pq_subvectors` subvectors and each is replaced by
+    the nearest of up to 256 k-means centroids trained for its subspace, so
+    a row takes one byte per subvector. A query scores rows by summing a
+    per-subspace table of its dot products with the centroids.
+    """
+    name = "pq"
+    CENTROIDS = 256
+    TRAIN_ROWS = 8192
+    ITERATIONS = 8
+
+    def __init__(self, config=None):
+        self.subvectors = int((config or {}).get("pq_subvectors", 48))
+        self.centroids = None
+
+    def fit(self, rows):
+        import numpy as np
+        dim = rows.shape[1]
+        # The largest subvector count that divides the dimension
+        subvectors = max(m for m in range(1, min(self.subvectors, dim) + 1) if dim % m == 0)
+        rng = np.random.default_rng(0)
+        sample = np.asarray(rows[np.sort(rng.choice(len(rows), min(len(rows), self.TRAIN_ROWS), replace=False))],
+                            dtype=np.float32)
+        k = min(self.CENTROIDS, len(sample))
+        parts = sample.reshape(len(sample), subvectors, -1)
+        self.centroids = np.stack([self.kmeans(np.ascontiguousarray(parts[:, m]), k, rng) for m in range(subvectors)])
+
+    def kmeans(self, points, k, rng):
+        import numpy as np
+        centroids = points[rng.choice(len(points), k, replace=False)].copy()
+        for _ in range(self.ITERATIONS):
+            assignment = self.nearest(points, centroids)
+            counts = np.bincount(assignment, minlength=k)
+            sums = np.stack([np.bincount(assignment, points[:, d], k) for d in range(points.shape[1])], axis=1)
+            # An empty cluster keeps its old centroid
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        return centroids
+
+    @staticmethod
+    def nearest(points, centroids):
+        distances = (centroids ** 2).sum(axis=1) - 2 * points @ centroids.T
+        return distances.argmin(axis=1)
+
+    def encode(self, rows):
+        import numpy as np
+        subvectors = len(self.centroids)
+        codes = np.empty((len(rows), subvectors), dtype=np.uint8)
+        for i in range(0, len(rows), SCAN_ROWS):
+            parts = np.asarray(rows[i:i + SCAN_ROWS], dtype=np.float32).reshape(-1, subvectors, self.centroids.shape[2])
+            for m in range(subvectors):
+                codes[i:i + SCAN_ROWS, m] = self.nearest(np.ascontiguousarray(parts[:, m]), self.centroids[m])
+        return codes
+
+    def scores(self, codes, vector):
+        import numpy as np
+        subvectors = len(self.centroids)
+        # table[m, j]: the query's m-th subvector against centroid j,
+        # flattened so code j of subvector m is entry m * centroids + j
+        table = np.einsum('mkd,md->mk', self.centroids, vector.reshape(subvectors, -1))
+        offsets = np.arange(subvectors, dtype=np.intp) * table.shape[1]
+        table = table.ravel()
+        return np.concatenate([
+            table[codes[i:i + SCAN_ROWS] + offsets].sum(axis=1) for i in range(0, len(codes), SCAN_ROWS)
+        ]) if len(codes) else np.zeros(0, dtype=np.float32)
+
+    def state(self):
+        return {"centroids": self.centroids}
+
+    def load_state(self, state):
+        self.centroids = state["centroids"]
+
+QUANTIZERS = {quantizer.name: quantizer for quantizer in (Float16Quantizer, Int8Quantizer, ProductQuantizer)}
+
+class NumpyBackend:
+    """Flat (brute-force) cosine index held in a NumPy float32 matrix
+
+    Rows are L2-normalized, so a query is one matrix-vector product plus
+    argpartition for the top k. `embeddings.npy` is memory-mapped on load.
+    Adds append raw rows to `pending.f32` and a line to `records.jsonl`
+    (O(1) I/O), and the pending rows are folded into a new embeddings.npy
+    once they outgrow COMPACT_ROWS and a quarter of the base matrix.
+
+    With config["quantization"] set, the base matrix is also encoded into
+    `codes.npy` (fp16, int8 or PQ, see QUANTIZERS) when it is written. A
+    query scans the codes, which are all that stays resident, and re-ranks
+    the best rerank_factor x n_results rows with their float32 vectors,
+    read from the memory-mapped base. Pending rows are always scanned
+    exactly, so up to max(COMPACT_ROWS, base rows / 4) float32 rows stay
+    resident next to the codes.
+    """
+    name = "numpy"
+    COMPACT_ROWS = 4096
+    STATS_QUERIES = 100
+
+    def __init__(self, config, embedding_function):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("NumPy not installed. Run: pip install numpy")
+        self.np = numpy
+        self.dir = Path(config["db_path"]) / "numpy" / config["collection_name"]
+        self.model_name = config["embedding_model"]
+        self.embedding_function = embedding_function
+        self.records_path = self.dir / "records.jsonl"
+        self.base_path = self.dir / "embeddings.npy"
+        self.pending_path = self.dir / "pending.f32"
+        self.meta_path = self.dir / "meta.json"
+        self.lock_path = self.dir / ".lock"
+        self.codes_path = self.dir / "codes.npy"
+        self.quantizer_path = self.dir / "quantizer.npz"
+        self.quantization = config.get("quantization", "none")
+        if self.quantization != "none" and self.quantization not in QUANTIZERS:
+            raise ValueError(f"Unknown quantization: {self.quantization} (choose from none, {', '.join(QUANTIZERS)})")
+        self.config = config
+        self.rerank_factor = int(config.get("rerank_factor", 10))
+        self.records_size = None
+        self.refresh()
+
+    def refresh(self, locked=False):
+        """Reload if another process has written since the last load
+
+        Stale codes are re-encoded under the store lock (`locked` when the
+        caller already holds it), checked again once it is held, since
+        another process may have re-encoded them or replaced the base.
+        """
+        try:
+            size = self.records_path.stat().st_size
+        except OSError:
+            size = 0
+        if size != self.records_size:
+            self.load()
+        if self.codes_stale and not locked:
+            with store_lock(self.lock_path):
+                self.load()
+                if self.codes_stale:
+                    self.write_codes()
+        elif self.codes_stale:
+            self.write_codes()
+
+    def load(self):
+        np = self.np
+        self.dim = None
+        if self.meta_path.exists():
+            meta = json.loads(self.meta_path.read_text(encoding='utf-8'))
+            if meta.get("model") != self.model_name:
+                raise ValueError(
+                    f"Store at {self.dir} was built with {meta.get('model')}, "
+                    f"not {self.model_name}; re-import it or change embedding_model"
+                )
+            self.dim = meta["dim"]
+        
+        self.records = []
+        self.records_size = 0
+        if self.records_path.exists():
+            with open(self.records_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    self.records.append(json.loads(line))
+                    self.records_size += len(line)
+        
+        self.base = np.load(self.base_path, mmap_mode="r") if self.base_path.exists() else None
+        base_rows = 0 if self.base is None else len(self.base)
+        self.pending = np.zeros((0, self.dim or 0), dtype=np.float32)
+        # A base that already covers every record means a compaction
+        # finished but was interrupted before clearing the pending rows
+        if self.pending_path.exists() and self.dim and base_rows < len(self.records):
+            pending = np.fromfile(self.pending_path, dtype=np.float32)
+            self.pending = pending[:len(pending) // self.dim * self.dim].reshape(-1, self.dim)
+        # Rows written without their record (or vice versa) are dropped
+        rows = min(len(self.records), base_rows + len(self.pending))
+        del self.records[rows:]
+        self.pending = self.pending[:max(0, rows - base_rows)]
+        self.id_set = {record["id"] for record in self.records}
+        self.load_codes()
+
+    def load_codes(self):
+        """Open the base matrix's codes, or mark them stale if they are missing or out of date
+
+        The codes are derived data: they are checked against the configured
+        quantization and the base row count, so switching modes or an
+        interrupted write is repaired by the next refresh.
+        """
+        np = self.np
+        self.quantizer = None
+        self.codes = None
+        self.codes_stale = False
+        if self.quantization == "none" or self.base is None or not len(self.base):
+            return
+        quantizer = QUANTIZERS[self.quantization](self.config)
+        try:
+            with np.load(self.quantizer_path) as state:
+                if str(state["mode"]) == self.quantization and int(state["rows"]) == len(self.base):
+                    quantizer.load_state({key: state[key] for key in state.files})
+                    codes = np.load(self.codes_path, mmap_mode="r")
+                    if len(codes) == len(self.base):
+                        self.quantizer, self.codes = quantizer, codes
+                        return
+        except (OSError, ValueError, KeyError):
+            pass
+        self.codes_stale = True
+
+    def write_codes(self):
+        """Fit the quantizer on the base matrix and write its codes (store lock held)"""
+        np = self.np
+        quantizer = QUANTIZERS[self.quantization](self.config)
+        quantizer.fit(self.base)
+        codes = quantizer.encode(self.base)
+        with open(self.codes_path.with_suffix(".tmp"), 'wb') as f:
+            np.save(f, codes)
+        os.replace(self.codes_path.with_suffix(".tmp"), self.codes_path)
+        # Written last: its row count is what marks the codes as current
+        with open(self.quantizer_path.with_suffix(".tmp"), 'wb') as f:
+            np.savez(f, mode=self.quantization, rows=len(self.base), **quantizer.state())
+        os.replace(self.quantizer_path.with_suffix(".tmp"), self.quantizer_path)
+        self.quantizer = quantizer
+        self.codes = np.load(self.codes_path, mmap_mode="r")
+        self.codes_stale = False
+
+    def normalize(self, vectors):
+        np = self.np
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def add(self, ids, documents, metadatas):
+        np = self.np
+        vectors = self.normalize(self.embedding_function(documents))
+        os.makedirs(self.dir, exist_ok=True)
+        with store_lock(self.lock_path):
+            self.refresh(locked=True)
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self.pending = np.zeros((0, self.dim), dtype=np.float32)
+                self.meta_path.write_text(json.dumps({"model": self.model_name, "dim": self.dim}), encoding='utf-8')
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding size {vectors.shape[1]} does not match store ({self.dim})")
+            # Vectors first: a record without its row is dropped on load
+            with open(self.pending_path, 'ab') as f:
+                f.write(vectors.tobytes())
+            lines = b"".join(
+                (json.dumps({"id": i, "document": d, "metadata": m}, ensure_ascii=False) + "\n").encode('utf-8')
+                for i, d, m in zip(ids, documents, metadatas)
+            )
+            with open(self.records_path, 'ab') as f:
+                f.write(lines)
+            self.records.extend(
+                {"id": i, "document": d, "metadata": m} for i, d, m in zip(ids, documents, metadatas)
+            )
+            self.records_size += len(lines)
+            self.pending = np.concatenate([self.pending, vectors])
+            self.id_set.update(ids)
+            base_rows = 0 if self.base is None else len(self.base)
+            if len(self.pending) > max(self.COMPACT_ROWS, base_rows // 4):
+                self.compact()
+
+    def compact(self):
+        """Fold the pending rows into a new memory-mapped embeddings.npy"""
+        np = self.np
+        parts = [part for part in (self.base, self.pending) if part is not None and len(part)]
+        if not parts:
+            return
+        tmp_path = self.dir / "embeddings.tmp.npy"
+        np.save(tmp_path, np.concatenate(parts))
+        os.replace(tmp_path, self.base_path)
+        self.pending_path.unlink()
+        self.base = np.load(self.base_path, mmap_mode="r")
+        self.pending = np.zeros((0, self.dim), dtype=np.float32)
+        if self.quantization != "none":
+            self.write_codes()
+
+    def scores(self, vector, exact=True):
+        """Cosine similarity of `vector` (normalized) against every row
+
+        With exact=False the base rows are scored from their codes.
+        """
+        np = self.np
+        if exact or self.codes is None:
+            parts = [part @ vector for part in (self.base, self.pending) if part is not None and len(part)]
+        else:
+            parts = [self.quantizer.scores(self.codes, vector)] + ([self.pending @ vector] if len(self.pending) else [])
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def nearest(self, vector, k, rerank_factor=None):
+        """Row indices of the k best matches and their cosine similarities"""
+        np = self.np
+        if self.codes is None:
+            scores = self.scores(vector)
+            top = top_indices(scores, k)
+            return top, scores[top]
+        rerank_factor = self.rerank_factor if rerank_factor is None else rerank_factor
+        approximate = self.scores(vector, exact=False)
+        shortlist = top_indices(approximate, k * max(1, rerank_factor))
+        scores = approximate[shortlist]
+        if rerank_factor:
+            in_base = shortlist < len(self.base)
+            # Sorted row order reads the memory-mapped base front to back
+            order = np.argsort(shortlist[in_base])
+            rows = shortlist[in_base][order]
+            exact = np.empty(len(rows), dtype=np.float32)
+            exact[order] = self.base[rows] @ vector
+            scores = scores.astype(np.float32)
+            scores[in_base] = exact
+        top = top_indices(scores, k)
+        return shortlist[top], scores[top]
+
+    def query(self, text, n_results):
+        self.refresh()
+        if not self.records or n_results <= 0:
+            return []
+        query = self.normalize(self.embedding_function([text]))[0]
+        top, scores = self.nearest(query, n_results)
+        return [
+            {
+                "id": self.records[i]["id"],
+                "content": self.records[i]["document"],
+                "metadata": self.records[i]["metadata"],
+                # Same convention as Chroma's cosine space
+                "distance": float(1.0 - score)
+            }
+            for i, score in zip(top, scores)
+        ]
+
+    def get(self, limit):
+        self.refresh()
+        return [
+            {"id": record["id"], "content": record["document"], "metadata": record["metadata"]}
+            for record in self.records[:limit]
+        ]
+
+    def existing_ids(self, ids):
+        self.refresh()
+        return self.id_set.intersection(ids)
+
+    def count(self):
+        self.refresh()
+        return len(self.records)
+
+    def stats(self, k=10, queries=STATS_QUERIES):
+        """Footprint of the scanned representation and its recall@k
+
+        Recall is measured with up to `queries` stored vectors as queries
+        (no embedding model needed): the share of the exact top k that the
+        quantized search returns, with and without re-ranking.
+        """
+        np = self.np
+        self.refresh()
+        rows = len(self.records)
+        base_rows = 0 if self.base is None else len(self.base)
+        float_bytes = rows * (self.dim or 0) * 4
+        scanned_bytes = float_bytes if self.codes is None else (
+            self.codes.nbytes + self.pending.nbytes + sum(a.nbytes for a in self.quantizer.state().values())
+        )
+        result = {
+            "backend": self.name,
+            "quantization": self.quantization,
+            "rows": rows,
+            "quantized_rows": 0 if self.codes is None else base_rows,
+            "dim": self.dim,
+            "float32_bytes": float_bytes,
+            "scanned_bytes": scanned_bytes,
+            "memory_saved_bytes": float_bytes - scanned_bytes,
+            "compression": round(float_bytes / scanned_bytes, 2) if scanned_bytes else None,
+            "disk_bytes": sum(p.stat().st_size for p in self.dir.iterdir() if p.is_file()) if self.dir.exists() else 0,
+            "rerank_factor": self.rerank_factor,
+        }
+        if not rows or k <= 0:
+            return result
+        
+        sample = np.sort(np.random.default_rng(0).choice(rows, min(queries, rows), replace=False))
+        vectors = np.concatenate([
+            np.asarray(self.base[sample[sample < base_rows]]) if base_rows else np.zeros((0, self.dim), dtype=np.float32),
+            self.pending[sample[sample >= base_rows] - base_rows]
+        ])
+        timings = {"exact": 0.0, "approximate": 0.0, "reranked": 0.0}
+        found = {"approximate": 0, "reranked": 0}
+        for vector in vectors:
+            start = time.perf_counter()
+            expected = set(top_indices(self.scores(vector), k).tolist())
+            timings["exact"] += time.perf_counter() - start
+            for mode, rerank_factor in (("approximate", 0), ("reranked", None)):
+                start = time.perf_counter()
+                top, _ = self.nearest(vector, k, rerank_factor)
+                timings[mode] += time.perf_counter() - start
+                found[mode] += len(expected.intersection(top.tolist()))
+        total = len(vectors) * min(k, rows)
+        result["recall_at_k"] = {
+            "k": k,
+            "queries": len(vectors),
+            **{mode: round(hits / total, 4) for mode, hits in found.items()}
+        }
+        result["query_ms"] = {mode: round(seconds / len(vectors) * 1000, 3) for mode, seconds in timings.items()}
+        return result
+
+    def persist(self):
+        # Every add is already on disk
+        pass
+
+BACKENDS = {backend.name: backend for backend in (ChromaBackend, NumpyBackend)}
+
+def get_backend(config, embedding_function):
+    """Open the vector store selected by config["backend"]
+
+    "auto" uses ChromaDB when it is installed and the NumPy flat index
+    otherwise.
+    """
+    name = config.get("backend", "auto")
+    if name == "auto":
+        name = "chroma" if chromadb_available() else "numpy"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name} (choose from auto, {', '.join(BACKENDS)})")
+    if name != "numpy" and config.get("quantization", "none") != "none":
+        raise ValueError(f'Quantization needs the numpy backend (backend is {name}); set "backend": "numpy"')
+    return BACKENDS[name](config, embedding_function)
+
+class Session:
+    """Process-wide config, vector store backend and embedding model
+
+    Each piece is built on first use and then reused, so library callers
+    (an agent host importing this module) and the daemon pay for store
+    setup and model loading once. The backend only loads the model on its
+    first add or query. Editing config.json invalidates all of them on the
+    next call.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.config_stamp = None
+        self._config = None
+        self._backend = None
+        self._embedding_function = None
+        # Flush to disk after each write; long-lived processes never reach
+        # the exit-time flush that one-shot CLI calls rely on
+        self.persist_on_write = False
+
+    def check_config(self):
+        """Drop everything built from an outdated config.json"""
+        try:
+            stat = CONFIG_FILE.stat()
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        if self._config is not None and stamp == self.config_stamp:
+            return
+        self.persist()
+        self.config_stamp = stamp
+        self._config = load_config()
+        self._backend = None
+        self._embedding_function = None
+
+    @property
+    def config(self):
+        with self.lock:
+            self.check_config()
+            return self._config
+
+    @property
+    def embedding_function(self):
+        with self.lock:
+            self.check_config()
+            if self._embedding_function is None:
+                self._embedding_function = get_embedding_function(self._config)
+            return self._embedding_function
+
+    @property
+    def backend(self):
+        with self.lock:
+            self.check_config()
+            if self._backend is None:
+                self._backend = get_backend(self._config, LazyEmbeddingFunction(lambda: self.embedding_function))
+            return self._backend
+
+    def persist(self):
+        if self._backend is not None:
+            self._backend.persist()
+        cache = getattr(self._embedding_function, "cache", None)
+        if cache is not None:
+            cache.flush()
+
+    def written(self):
+        """Called after every write"""
+        if self.persist_on_write:
+            self.persist()
+
+    def reset(self):
+        """Forget everything; the next access rebuilds from config.json"""
+        with self.lock:
+            self.persist()
+            self._config = None
+            self._backend = None
+            self._embedding_function = None
+
+SESSION = Session()
+
+def search_memories(query, n_results=5):
+    """Search memories semantically"""
+    try:
+        results = SESSION.backend.query(query, n_results)
+        return {"success": True, "results": results, "query": query}
         
     except ImportError as e:
         return {"success": False, "error": f"Missing dependency: {str(e)}", "results": []}
     except Exception as e:
         return {"success": False, "error": str(e), "results": []}
 
+_id_counter = itertools.count()
+
+def new_memory_id():
+    """Millisecond timestamp plus a per-process counter and random suffix
+
+    The timestamp alone collides when several adds land in the same
+    millisecond, within one process or across several.
+    """
+    return f"mem_{int(time.time() * 1000)}_{next(_id_counter):04d}{uuid.uuid4().hex[:8]}"
+
 def add_memory(text, metadata=None):
     """Add a memory to the collection"""
     try:
-        config = load_config()
-        client = get_chroma_client(config)
-        collection = get_or_create_collection(client, config)
+        backend = SESSION.backend
         
-        # Generate a simple ID based on timestamp
-        import time
-        memory_id = f"mem_{int(time.time() * 1000)}"
+        memory_id = new_memory_id()
         
         if metadata is None:
             metadata = {}
         metadata["timestamp"] = time.time()
         
-        collection.add(
-            ids=[memory_id],
-            documents=[text],
-            metadatas=[metadata]
-        )
+        backend.add([memory_id], [text], [metadata])
+        SESSION.written()
         
         return {"success": True, "id": memory_id, "text": text}
         
@@ -132,62 +1005,530 @@ def add_memory(text, metadata=None):
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-def list_memories(limit=10):
-    """List recent memories"""
+DEFAULT_BATCH_SIZE = 64
+
+def add_many(items, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Add many memories, embedding and inserting them in batches
+
+    `items` is any iterable of dicts with "text" and optional "metadata"
+    and "id"; it is consumed lazily, so a generator over a large file never
+    sits in memory whole. Ids already in the collection are skipped, which
+    makes re-running an interrupted batch safe. `progress(added, skipped,
+    elapsed)` is called after every batch.
+    """
+    added = skipped = 0
+    start = time.perf_counter()
     try:
-        config = load_config()
-        client = get_chroma_client(config)
-        collection = get_or_create_collection(client, config)
-        
-        # Get all documents (limited)
-        results = collection.get(
-            limit=limit,
-            include=["documents", "metadatas"]
+        backend = SESSION.backend
+        items = iter(items)
+        while True:
+            batch = list(itertools.islice(items, max(1, batch_size)))
+            if not batch:
+                break
+            ids = [item.get("id") or new_memory_id() for item in batch]
+            existing = backend.existing_ids(ids)
+            fresh = [
+                (memory_id, item) for memory_id, item in zip(ids, batch)
+                if memory_id not in existing
+            ]
+            # Duplicate ids inside one batch would fail the whole add
+            fresh = list(dict(fresh).items())
+            skipped += len(batch) - len(fresh)
+            if fresh:
+                now = time.time()
+                backend.add(
+                    [memory_id for memory_id, _ in fresh],
+                    [item["text"] for _, item in fresh],
+                    [dict({"timestamp": now}, **(item.get("metadata") or {})) for _, item in fresh]
+                )
+                added += len(fresh)
+            if progress:
+                progress(added, skipped, time.perf_counter() - start)
+        SESSION.written()
+    except ImportError as e:
+        return {"success": False, "error": f"Missing dependency: {str(e)}", "added": added}
+    except Exception as e:
+        return {"success": False, "error": str(e), "added": added, "skipped": skipped}
+    
+    elapsed = time.perf_counter() - start
+    return {
+        "success": True,
+        "added": added,
+        "skipped": skipped,
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(added / elapsed, 1) if elapsed > 0 else None
+    }
+
+IMPORT_STATE_FILE = "import_state.json"
+
+def read_import_records(path):
+    """Yield (text, metadata, id) records from a JSONL or Markdown file
+
+    JSONL lines carry "text" (or "content") plus optional "metadata", "tags"
+    and "id". Markdown is split into one record per heading section.
+    """
+    path = Path(path)
+    if path.suffix.lower() in (".jsonl", ".ndjson"):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                text = record.get("text") or record.get("content") or ""
+                metadata = dict(record.get("metadata") or {})
+                if record.get("tags"):
+                    # Chroma metadata values must be scalars
+                    metadata["tags"] = ",".join(record["tags"])
+                if record.get("timestamp") is not None:
+                    metadata["source_timestamp"] = str(record["timestamp"])
+                yield text, metadata, record.get("id")
+    else:
+        heading, lines = "", []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in itertools.chain(f, ["# \n"]):
+                if line.startswith("#"):
+                    text = "".join(lines).strip()
+                    if text:
+                        yield text, {"heading": heading}, None
+                    heading, lines = line.lstrip("#").strip(), [line]
+                else:
+                    lines.append(line)
+
+IMPORT_CHECKPOINT_SECONDS = 30
+
+def import_files(path, batch_size=DEFAULT_BATCH_SIZE, resume=True):
+    """Bulk-import a JSONL/Markdown file (or a directory of them)
+
+    Records get deterministic ids derived from the source file, position
+    and text. Every IMPORT_CHECKPOINT_SECONDS (and at the end of each file)
+    the store is persisted and the number of records committed per file is
+    saved, so an interrupted import resumes from its last checkpoint and
+    ids already stored past it are skipped rather than duplicated.
+    """
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(
+            p for p in path.rglob("*")
+            if p.suffix.lower() in (".jsonl", ".ndjson", ".md", ".markdown")
         )
+    elif path.exists():
+        files = [path]
+    else:
+        return {"success": False, "error": f"No such file or directory: {path}"}
+    
+    state_path = Path(SESSION.config["db_path"]) / IMPORT_STATE_FILE
+    try:
+        state = json.loads(state_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        state = {}
+    
+    def checkpoint(key, position):
+        SESSION.persist()
+        state[key] = position
+        os.makedirs(state_path.parent, exist_ok=True)
+        tmp_path = state_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(state, indent=2, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, state_path)
+    
+    totals = {"added": 0, "skipped": 0, "resumed_from": 0}
+    start = time.perf_counter()
+    for file_path in files:
+        key = str(file_path.resolve())
+        done = state.get(key, 0) if resume else 0
+        totals["resumed_from"] += done
+        # Position just past the last record handed to add_many
+        cursor = {"position": done, "saved_at": time.perf_counter()}
         
-        formatted = []
-        if results["ids"]:
-            for i, doc_id in enumerate(results["ids"]):
-                formatted.append({
-                    "id": doc_id,
-                    "content": results["documents"][i] if results["documents"] else "",
-                    "metadata": results["metadatas"][i] if results["metadatas"] else {}
-                })
+        def records():
+            for position, (text, metadata, record_id) in enumerate(read_import_records(file_path)):
+                if position < done or not text.strip():
+                    continue
+                digest = hashlib.sha1(f"{key}:{position}:{text}".encode('utf-8')).hexdigest()[:20]
+                cursor["position"] = position + 1
+                yield {"id": record_id or f"imp_{digest}", "text": text, "metadata": dict(metadata, source=key)}
         
-        return {"success": True, "memories": formatted}
+        def progress(added, skipped, elapsed):
+            if time.perf_counter() - cursor["saved_at"] >= IMPORT_CHECKPOINT_SECONDS:
+                checkpoint(key, cursor["position"])
+                cursor["saved_at"] = time.perf_counter()
+            total = totals["added"] + added
+            rate = total / (time.perf_counter() - start or 1e-9)
+            print(f"{file_path.name}: {cursor['position']} records, {total} added, {rate:.1f} docs/sec",
+                  file=sys.stderr)
+        
+        result = add_many(records(), batch_size=batch_size, progress=progress)
+        totals["added"] += result.get("added", 0)
+        totals["skipped"] += result.get("skipped", 0)
+        if not result.get("success"):
+            return dict(result, **totals, file=key)
+        checkpoint(key, cursor["position"])
+    
+    elapsed = time.perf_counter() - start
+    return dict(
+        {"success": True, "files": len(files)},
+        **totals,
+        seconds=round(elapsed, 3),
+        docs_per_sec=round(totals["added"] / elapsed, 1) if elapsed > 0 else None
+    )
+
+def list_memories(limit=10):
+    """List recent memories"""
+    try:
+        return {"success": True, "memories": SESSION.backend.get(limit)}
         
     except ImportError as e:
         return {"success": False, "error": f"Missing dependency: {str(e)}"}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+def cache_stats():
+    """Hit/miss counters and size of the embedding cache"""
+    try:
+        embedding_function = SESSION.embedding_function
+    except ImportError as e:
+        return {"success": False, "error": f"Missing dependency: {str(e)}"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    cache = getattr(embedding_function, "cache", None)
+    if cache is None:
+        return {"success": True, "enabled": False}
+    return {"success": True, "enabled": True, **cache.stats()}
+
+def store_stats(k=10, queries=NumpyBackend.STATS_QUERIES):
+    """Memory footprint and recall@k of the vector store's quantization"""
+    try:
+        backend = SESSION.backend
+        if not hasattr(backend, "stats"):
+            return {"success": False, "error": f"stats needs the numpy backend (backend is {backend.name})"}
+        return {"success": True, **backend.stats(k, queries)}
+    except ImportError as e:
+        return {"success": False, "error": f"Missing dependency: {str(e)}"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+# Hybrid search: memory-simple's keyword index and the vector store,
+# fused in one process over one id space
+MEMORY_SIMPLE_FILE = Path(__file__).parent.parent / "memory-simple" / "memory.py"
+MIGRATED_SOURCE = "memory-simple"
+HYBRID_POOL = 20
+RRF_K = 60
+
+_keyword_module = None
+
+def keyword_module():
+    """Import memory-simple's memory.py (once) without touching sys.path"""
+    global _keyword_module
+    if _keyword_module is None:
+        if not MEMORY_SIMPLE_FILE.exists():
+            raise ImportError(f"memory-simple not found at {MEMORY_SIMPLE_FILE}")
+        spec = importlib.util.spec_from_file_location("memory_simple", MEMORY_SIMPLE_FILE)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _keyword_module = module
+    return _keyword_module
+
+def parse_timestamp(value):
+    """memory-simple's ISO timestamps as epoch seconds, like add_memory's"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+def migrated_metadata(memory):
+    """A memory-simple memory's metadata as stored by migrate_simple"""
+    metadata = {"timestamp": parse_timestamp(memory.get("timestamp")), "source": MIGRATED_SOURCE}
+    if memory.get("tags"):
+        # Chroma metadata values must be scalars
+        metadata["tags"] = ",".join(memory["tags"])
+    return metadata
+
+def migrate_simple(batch_size=DEFAULT_BATCH_SIZE):
+    """Copy memory-simple's memories into the vector store under their own ids
+
+    Memories keep their memory-simple id, so both stores share one id
+    space and hybrid search can fuse them. Ids already in the vector store
+    are skipped, so re-running only embeds what was added since.
+    """
+    try:
+        memories = keyword_module().iter_memories()
+    except ImportError as e:
+        return {"success": False, "error": f"Missing dependency: {str(e)}"}
+    total = 0
+    
+    def items():
+        nonlocal total
+        for memory in memories:
+            total += 1
+            if not memory.get("id") or not memory.get("content", "").strip():
+                continue
+            yield {"id": memory["id"], "text": memory["content"], "metadata": migrated_metadata(memory)}
+    
+    result = add_many(items(), batch_size=batch_size)
+    SESSION.persist()
+    return dict(result, total=total)
+
+def hybrid_search(query, n_results=5, pool=HYBRID_POOL):
+    """Keyword (BM25) and vector search fused with reciprocal rank fusion
+
+    Each side returns its top `pool` ids; an id scores sum(1 / (RRF_K +
+    rank)) over the lists it appears in, so memories both searches agree
+    on rise to the top without calibrating BM25 against cosine distance.
+    Migrated memories since deleted from memory-simple are dropped, and
+    keyword hits carry the metadata migrate_simple would have stored.
+    """
+    if not query or not query.strip():
+        return {"success": False, "error": "Empty query", "results": []}
+    pool = max(pool, n_results)
+    try:
+        keyword = keyword_module()
+        keyword_hits = keyword.search_memories(query, pool)
+        store = keyword.STORE.refresh()
+        vector_hits = SESSION.backend.query(query, pool)
+    except ImportError as e:
+        return {"success": False, "error": f"Missing dependency: {str(e)}", "results": []}
+    except Exception as e:
+        return {"success": False, "error": str(e), "results": []}
+    
+    fused = {}
+    for rank, memory in enumerate(keyword_hits, 1):
+        fused[memory["id"]] = {
+            "id": memory["id"],
+            "content": memory.get("content", ""),
+            # Same shape as the vector side, whichever search found the hit
+            "metadata": migrated_metadata(memory),
+            "score": 1.0 / (RRF_K + rank),
+            "keyword_rank": rank,
+            "vector_rank": None,
+            "distance": None
+        }
+    for rank, hit in enumerate(vector_hits, 1):
+        if (hit.get("metadata") or {}).get("source") == MIGRATED_SOURCE and store.get(hit["id"]) is None:
+            continue
+        entry = fused.setdefault(hit["id"], {
+            "id": hit["id"],
+            "content": hit["content"],
+            "metadata": hit["metadata"],
+            "score": 0.0,
+            "keyword_rank": None
+        })
+        entry["score"] += 1.0 / (RRF_K + rank)
+        entry["vector_rank"] = rank
+        entry["distance"] = hit["distance"]
+    
+    results = sorted(fused.values(), key=lambda entry: -entry["score"])[:n_results]
+    for entry in results:
+        entry["score"] = round(entry["score"], 6)
+    return {"success": True, "results": results, "query": query}
+
+def execute(request):
+    """Run one command request and return its JSON response
+
+    Requests are dicts such as {"command": "search", "query": "...",
+    "n_results": 5}; the CLI builds them from argv and the daemon reads
+    them off its socket, so both paths produce identical output.
+    """
+    command = request.get("command")
+    
+    if command == "search":
+        return search_memories(request.get("query", ""), int(request.get("n_results", 5)))
+    
+    elif command == "hybrid":
+        return hybrid_search(request.get("query", ""), int(request.get("n_results", 5)))
+    
+    elif command == "add":
+        return add_memory(request.get("text", ""), request.get("metadata"))
+    
+    elif command == "list":
+        return list_memories(int(request.get("limit", 10)))
+    
+    elif command == "cache-stats":
+        return cache_stats()
+    
+    elif command == "stats":
+        return store_stats(int(request.get("k", 10)), int(request.get("queries", NumpyBackend.STATS_QUERIES)))
+    
+    elif command == "import":
+        return import_files(request.get("path", ""), int(request.get("batch_size", DEFAULT_BATCH_SIZE)),
+                            resume=request.get("resume", True))
+    
+    elif command == "migrate":
+        return migrate_simple(int(request.get("batch_size", DEFAULT_BATCH_SIZE)))
+    
+    return {"error": f"Unknown command: {command}"}
+
+COMMANDS = ("search", "hybrid", "add", "list", "import", "migrate", "cache-stats", "stats")
+
+# Long-lived daemon: keeps ChromaDB and the embedding model loaded and
+# answers newline-delimited JSON requests
+SOCKET_FILE = Path(os.environ.get("MEMORY_SEARCH_SOCKET", Path(__file__).parent / "memory_search.sock"))
+DAEMON_CONNECT_TIMEOUT = 0.5
+
+def call_daemon(request, socket_path=None):
+    """Send a request to a running daemon; returns None if none is listening
+
+    Only a failed connect falls back to running in-process: once the
+    request is sent a failure is reported, so writes never run twice.
+    """
+    if os.environ.get("MEMORY_SEARCH_NO_DAEMON") or not hasattr(socket, "AF_UNIX"):
+        return None
+    socket_path = Path(socket_path or SOCKET_FILE)
+    if not socket_path.exists():
+        return None
+    
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(DAEMON_CONNECT_TIMEOUT)
+        try:
+            sock.connect(str(socket_path))
+        except OSError:
+            return None
+        sock.settimeout(None)
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            line = f.readline()
+        if not line:
+            return {"success": False, "error": "Daemon closed the connection"}
+        return json.loads(line)
+    except (OSError, ValueError) as e:
+        return {"success": False, "error": f"Daemon request failed: {e}"}
+    finally:
+        sock.close()
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """One connection: any number of request lines, one response line each"""
+    # ChromaDB's DuckDB backend is not safe for concurrent use
+    lock = threading.Lock()
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                with self.lock:
+                    response = execute(request)
+            except ValueError:
+                response = {"success": False, "error": "Invalid JSON request"}
+            except Exception as e:
+                response = {"success": False, "error": str(e)}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+def serve(socket_path=None):
+    """Load ChromaDB and the model once, then serve requests until stopped"""
+    if not hasattr(socket, "AF_UNIX"):
+        return {"success": False, "error": "Unix domain sockets are not supported on this platform"}
+    socket_path = Path(socket_path or SOCKET_FILE)
+    if socket_path.exists():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(socket_path))
+            return {"success": False, "error": f"Daemon already running on {socket_path}"}
+        except OSError:
+            # Left behind by a daemon that did not shut down cleanly
+            socket_path.unlink()
+        finally:
+            probe.close()
+    
+    try:
+        backend = SESSION.backend
+    except ImportError as e:
+        return {"success": False, "error": f"Missing dependency: {str(e)}"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    try:
+        # Load the embedding model now rather than on the first request
+        backend.query("warmup", 1)
+    except Exception:
+        # An empty collection cannot be queried; the model is loaded anyway
+        pass
+    SESSION.persist_on_write = True
+    
+    server = socketserver.ThreadingUnixStreamServer(str(socket_path), DaemonHandler)
+    server.daemon_threads = True
+    # shutdown() blocks until serve_forever returns, so call it off-thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"Memory search daemon listening on {socket_path} ({backend.name} backend)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path.exists():
+            socket_path.unlink()
+        SESSION.persist_on_write = False
+        SESSION.persist()
+    return {"success": True, "message": "Daemon stopped"}
+
+def pop_option(args, name, default=None):
+    """Remove `--name value` or `--name=value` from args and return the value"""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        if arg.startswith(name + "="):
+            del args[i]
+            return arg[len(name) + 1:]
+    return default
+
 def main():
     """Main entry point for CLI usage"""
+    args = sys.argv[1:]
+    socket_path = pop_option(args, "--socket")
+    batch_size = int(pop_option(args, "--batch-size", DEFAULT_BATCH_SIZE))
+    resume = "--no-resume" not in args
+    args = [arg for arg in args if arg != "--no-resume"]
+    sys.argv = sys.argv[:1] + args
+    
     if len(sys.argv) < 2:
         print(json.dumps({"error": "Usage: memory_search.py <command> [args]"}))
         sys.exit(1)
     
     command = sys.argv[1]
     
-    if command == "search":
-        query = sys.argv[2] if len(sys.argv) > 2 else ""
-        n_results = int(sys.argv[3]) if len(sys.argv) > 3 else 5
-        result = search_memories(query, n_results)
+    if command == "serve":
+        result = serve(socket_path)
         print(json.dumps(result, indent=2, ensure_ascii=False))
+        sys.exit(0 if result.get("success") else 1)
+    
+    if command not in COMMANDS:
+        print(json.dumps({"error": f"Unknown command: {command}"}))
+        sys.exit(1)
+    
+    request = {"command": command}
+    
+    if command in ("search", "hybrid"):
+        request["query"] = sys.argv[2] if len(sys.argv) > 2 else ""
+        request["n_results"] = int(sys.argv[3]) if len(sys.argv) > 3 else 5
     
     elif command == "add":
-        text = sys.argv[2] if len(sys.argv) > 2 else ""
-        result = add_memory(text)
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        request["text"] = sys.argv[2] if len(sys.argv) > 2 else ""
     
     elif command == "list":
-        limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10
-        result = list_memories(limit)
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        request["limit"] = int(sys.argv[2]) if len(sys.argv) > 2 else 10
     
-    else:
-        print(json.dumps({"error": f"Unknown command: {command}"}))
-        sys.exit(1)
+    elif command == "import":
+        if len(sys.argv) < 3:
+            print(json.dumps({"error": "Usage: memory_search.py import <file|dir> [--batch-size N] [--no-resume]"}))
+            sys.exit(1)
+        # The daemon may run from another directory
+        request["path"] = str(Path(sys.argv[2]).resolve())
+        request["batch_size"] = batch_size
+        request["resume"] = resume
+    
+    elif command == "migrate":
+        request["batch_size"] = batch_size
+    
+    elif command == "stats":
+        request["k"] = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        request["queries"] = int(sys.argv[3]) if len(sys.argv) > 3 else NumpyBackend.STATS_QUERIES
+    
+    result = call_daemon(request, socket_path)
+    if result is None:
+        result = execute(request)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
 
 if __name__ == "__main__":
     main()
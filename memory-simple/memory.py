@@ -8,170 +8,1428 @@ import sys
 import json
 import re
 import os
+import base64
+import bisect
+import functools
+import hashlib
+import heapq
+import itertools
+import math
+import shutil
+import signal
+import socket
+import socketserver
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single writer assumed
+    fcntl = None
+
 # Get the skill directory
 SKILL_DIR = Path(__file__).parent
-MEMORY_FILE = SKILL_DIR / "memory.json"
+# Where the store lives; the skill directory unless $MEMORY_SIMPLE_DIR is set
+DATA_DIR = Path(os.environ.get("MEMORY_SIMPLE_DIR", SKILL_DIR))
+# Snapshot written by versions before segments; imported once on first use
+MEMORY_FILE = DATA_DIR / "memory.json"
+# The active segment: an append-only log of adds and deletes
+LOG_FILE = DATA_DIR / "memory.jsonl"
+LOCK_FILE = DATA_DIR / ".memory.lock"
+# Sealed segments and manifest.json, which holds their headers
+SEGMENTS_DIR = DATA_DIR / "segments"
+MANIFEST_VERSION = 1
+SEGMENT_VERSION = 1
 
-def load_memories():
-    """Load all memories from file"""
-    if not MEMORY_FILE.exists():
-        return []
-    
+# Seal the active segment once its log passes this size
+SEGMENT_BYTES = 1 << 20
+# Memories per segment when importing or merging; a small newest segment
+# absorbs the active one instead of leaving many tiny segments. A search
+# pays a fixed cost per segment it visits, and common CJK bigrams pass
+# nearly every Bloom filter, so segments are few and large
+SEGMENT_SIZE = 16384
+# Rewrite a sealed segment once this fraction of it is deleted
+SEGMENT_DELETED_FRACTION = 0.25
+# Segment file bytes kept loaded per process (LRU); headers always are.
+# Loaded segments take three times their file size in memory (up to six
+# once queries have decoded most of their postings), and a cache smaller
+# than the segments one query visits reloads every one of them on every
+# query
+SEGMENT_CACHE_BYTES = 64 << 20
+# Bloom filter false positive rate; a false positive only costs a load
+BLOOM_ERROR_RATE = 0.01
+# Term n-grams up to this length go into the Bloom filter, so a query
+# fragment that may sit inside a longer term can still rule a segment out
+NGRAM_MAX = 3
+# Tag substrings up to this length go into the Bloom filter
+TAG_SUBSTRING_MAX = 32
+# fsync every appended record; turn off for bulk ingest on throwaway stores
+FSYNC_WRITES = True
+
+# Ranking: "bm25" (term rarity and length aware), "legacy", the original
+# 10/3/5 phrase/word/tag substring scores, or "recent": legacy matches
+# newest first, which stops reading segments once `limit` is filled
+SCORERS = ("bm25", "legacy", "recent")
+DEFAULT_SCORER = "bm25"
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Added per tag containing the whole query, on the order of one rare term
+BM25_TAG_WEIGHT = 3.0
+
+# CJK ideographs, kana and hangul: scripts written without spaces
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+CJK_RUN_RE = re.compile(f'[{CJK_CHARS}]+')
+WORD_RE = re.compile(f'(?:(?![{CJK_CHARS}])\\w)+')
+SCRIPT_RUN_RE = re.compile(f'(?P<cjk>[{CJK_CHARS}]+)|(?P<word>(?:(?![{CJK_CHARS}])\\w)+)')
+
+class WhitespaceTokenizer:
+    """Whitespace-separated terms (the original matcher's notion of a word)"""
+    name = "whitespace"
+
+    def tokenize(self, text):
+        return text.lower().split()
+
+    def query_terms(self, word):
+        """Split one query word into (term, exact) lookups
+
+        `exact` terms must appear verbatim in the postings; the others may be
+        any substring of an indexed term and are resolved against the vocabulary.
+        """
+        return [(word, False)]
+
+class WordTokenizer:
+    """Latin text: lowercase runs of word characters, punctuation dropped"""
+    name = "word"
+
+    def tokenize(self, text):
+        return WORD_RE.findall(text.lower())
+
+    def query_terms(self, word):
+        # A run at the edge of the query word may be part of a longer term
+        return [(term, False) for term in WORD_RE.findall(word)]
+
+class CJKBigramTokenizer:
+    """CJK text: overlapping character bigrams, single characters kept as is"""
+    name = "cjk-bigram"
+
+    def tokenize(self, text):
+        terms = []
+        for run in CJK_RUN_RE.findall(text.lower()):
+            terms.extend(self.ngrams(run))
+        return terms
+
+    def ngrams(self, run):
+        if len(run) == 1:
+            return [run]
+        return [run[i:i + 2] for i in range(len(run) - 1)]
+
+    def query_terms(self, word):
+        # Every bigram of a query run occurs in any text containing the run;
+        # a lone character can only be found inside the indexed bigrams
+        lookups = []
+        for run in CJK_RUN_RE.findall(word):
+            if len(run) == 1:
+                lookups.append((run, False))
+            else:
+                lookups.extend((gram, True) for gram in self.ngrams(run))
+        return lookups
+
+class MixedTokenizer:
+    """Mixed-language text: CJK runs become bigrams, everything else words"""
+    name = "mixed"
+
+    def __init__(self):
+        self.cjk = CJKBigramTokenizer()
+        self.word = WordTokenizer()
+
+    def tokenize(self, text):
+        terms = []
+        for match in SCRIPT_RUN_RE.finditer(text.lower()):
+            if match.lastgroup == 'cjk':
+                terms.extend(self.cjk.ngrams(match.group()))
+            else:
+                terms.append(match.group())
+        return terms
+
+    def query_terms(self, word):
+        lookups = []
+        for match in SCRIPT_RUN_RE.finditer(word):
+            if match.lastgroup == 'cjk':
+                lookups.extend(self.cjk.query_terms(match.group()))
+            else:
+                lookups.append((match.group(), False))
+        return lookups
+
+TOKENIZERS = {
+    tokenizer.name: tokenizer
+    for tokenizer in (WhitespaceTokenizer, WordTokenizer, CJKBigramTokenizer, MixedTokenizer)
+}
+# Tokenizer used for new indexes; an index built with another one is rebuilt
+TOKENIZER = "mixed"
+
+def get_tokenizer(name=None):
+    """Instantiate a tokenizer by name (defaults to TOKENIZER)"""
+    name = name or TOKENIZER
+    if name not in TOKENIZERS:
+        raise ValueError(f"Unknown tokenizer: {name} (choose from {', '.join(TOKENIZERS)})")
+    return TOKENIZERS[name]()
+
+class InvertedIndex:
+    """Term and tag posting lists used to narrow and rank search candidates
+
+    `terms` maps each term to {memory id: term frequency}; `docs` keeps each
+    memory's [length in terms, timestamp] for BM25, and `recent` holds
+    (timestamp, id) pairs in timestamp order for the no-query listing.
+    Document frequencies are the posting list sizes.
+    """
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.terms = {}
+        self.tags = {}
+        self.docs = {}
+        self.recent = []
+        self.total_length = 0
+        self.source = None
+
+    def add(self, memory):
+        """Add a memory's content terms and tags to the postings"""
+        memory_id = memory.get('id')
+        if memory_id is None:
+            return
+        if memory_id in self.docs:
+            # Replaying a record the index already holds
+            self.discard_id(memory_id)
+        terms = self.tokenizer.tokenize(memory.get('content', ''))
+        for term, count in Counter(terms).items():
+            self.terms.setdefault(term, {})[memory_id] = count
+        for tag in memory.get('tags', []):
+            self.tags.setdefault(tag.lower(), {})[memory_id] = 1
+        timestamp = memory.get('timestamp', '')
+        self.docs[memory_id] = [len(terms), timestamp]
+        self.total_length += len(terms)
+        bisect.insort(self.recent, [timestamp, memory_id])
+
+    def remove(self, memory):
+        """Drop a memory from every posting list it appears in"""
+        memory_id = memory.get('id')
+        for postings, keys in (
+            (self.terms, set(self.tokenizer.tokenize(memory.get('content', '')))),
+            (self.tags, {tag.lower() for tag in memory.get('tags', [])}),
+        ):
+            for key in keys:
+                ids = postings.get(key)
+                if ids is None:
+                    continue
+                ids.pop(memory_id, None)
+                if not ids:
+                    del postings[key]
+        self.forget_doc(memory_id)
+
+    def discard_id(self, memory_id):
+        """Drop an id whose terms are unknown (e.g. a replayed tombstone)"""
+        for postings in (self.terms, self.tags):
+            for key in [k for k, ids in postings.items() if memory_id in ids]:
+                del postings[key][memory_id]
+                if not postings[key]:
+                    del postings[key]
+        self.forget_doc(memory_id)
+
+    def forget_doc(self, memory_id):
+        doc = self.docs.pop(memory_id, None)
+        if doc is None:
+            return
+        length, timestamp = doc
+        self.total_length -= length
+        position = bisect.bisect_left(self.recent, [timestamp, memory_id])
+        if position < len(self.recent) and self.recent[position] == [timestamp, memory_id]:
+            del self.recent[position]
+
+    def lookup(self, term, exact):
+        """Ids whose content contains `term` (verbatim term or inside one)"""
+        ids = set(self.terms.get(term, ()))
+        if not exact:
+            for other in self.terms:
+                if other != term and term in other:
+                    ids.update(self.terms[other])
+        return ids
+
+    def expand(self, term):
+        """Indexed terms containing a partial query term"""
+        return [other for other in self.terms if term in other]
+
+    def word_candidates(self, word):
+        """Ids of memories whose content may contain `word`, or None if unknown
+
+        Each lookup is a necessary condition for the word to occur, so the
+        intersection never misses a memory the substring scan would match.
+        A word with no indexable characters (pure punctuation) returns None.
+        """
+        lookups = self.tokenizer.query_terms(word)
+        if not lookups:
+            return None
+        # Resolve the rarest exact terms first so the intersection shrinks fast
+        lookups.sort(key=lambda item: (not item[1], len(self.terms.get(item[0], ()))))
+        found = None
+        for term, exact in lookups:
+            ids = self.lookup(term, exact)
+            found = ids if found is None else found & ids
+            if not found:
+                break
+        return found
+
+    def candidates(self, query_lower, query_words):
+        """Return ids of memories that can score above zero for the query,
+        or None when the query cannot be answered from the index alone"""
+        found = set()
+        for word in set(query_words):
+            ids = self.word_candidates(word)
+            if ids is None:
+                return None
+            found |= ids
+        for tag in self.tags:
+            if query_lower in tag:
+                found.update(self.tags[tag])
+        return found
+
+    def pack(self, ids):
+        """Postings as "position[:frequency] ..." strings over `ids`, for a segment file"""
+        position = {memory_id: i for i, memory_id in enumerate(ids)}
+        
+        def encode(postings):
+            return " ".join(
+                str(position[memory_id]) if frequency == 1 else f"{position[memory_id]}:{frequency}"
+                for memory_id, frequency in postings.items()
+            )
+        
+        return {
+            "tokenizer": self.tokenizer.name,
+            "terms": {term: encode(postings) for term, postings in self.terms.items()},
+            "tags": {tag: encode(postings) for tag, postings in self.tags.items()},
+            "lengths": [self.docs[memory_id][0] for memory_id in ids],
+        }
+
+    @classmethod
+    def build(cls, memories, tokenizer=None):
+        index = cls(tokenizer)
+        for memory in memories:
+            index.add(memory)
+        return index
+
+class PackedPostings(Mapping):
+    """term -> {memory id: frequency}, decoded from its packed string on first access"""
+
+    def __init__(self, packed, ids):
+        self.packed = packed
+        self.ids = ids
+        self.decoded = {}
+
+    def __getitem__(self, term):
+        postings = self.decoded.get(term)
+        if postings is None:
+            packed = self.packed[term]
+            if ':' not in packed:
+                # Every frequency is 1, the common case
+                postings = dict.fromkeys(map(self.ids.__getitem__, map(int, packed.split())), 1)
+            else:
+                postings = {}
+                for entry in packed.split():
+                    position, _, frequency = entry.partition(':')
+                    postings[self.ids[int(position)]] = int(frequency or 1)
+            self.decoded[term] = postings
+        return postings
+
+    def get(self, term, default=None):
+        # Mapping.get goes through a KeyError for every absent term
+        postings = self.decoded.get(term)
+        if postings is None:
+            return self[term] if term in self.packed else default
+        return postings
+
+    def __iter__(self):
+        return iter(self.packed)
+
+    def __len__(self):
+        return len(self.packed)
+
+    def __contains__(self, term):
+        return term in self.packed
+
+class SegmentIndex(InvertedIndex):
+    """A sealed segment's index, read-only
+
+    Parsing thousands of small posting dicts dominated loading a segment,
+    so postings stay packed strings until a query touches their term.
+    """
+
+    def __init__(self, data):
+        super().__init__(get_tokenizer(data["index"]["tokenizer"]))
+        ids = data["ids"]
+        self.terms = PackedPostings(data["index"]["terms"], ids)
+        self.tags = PackedPostings(data["index"]["tags"], ids)
+        lengths = data["index"]["lengths"]
+        self.docs = {i: [n, t] for i, n, t in zip(ids, lengths, data["timestamps"])}
+        # Segment files are written in (timestamp, id) order
+        self.recent = [[t, i] for t, i in zip(data["timestamps"], ids)]
+        self.total_length = sum(lengths)
+        self.vocabulary = None
+
+    def expand(self, term):
+        # One str.find pass over the newline-joined vocabulary (terms never
+        # contain a newline) instead of a substring test per term
+        if self.vocabulary is None:
+            words = list(self.terms)
+            self.vocabulary = (words, "\n".join(words) + "\n",
+                               list(itertools.accumulate((len(w) + 1 for w in words), initial=0)))
+        words, text, starts = self.vocabulary
+        others = []
+        position = text.find(term)
+        while position != -1:
+            i = bisect.bisect_right(starts, position) - 1
+            others.append(words[i])
+            position = text.find(term, starts[i + 1])
+        return others
+
+def file_stamp(path):
+    """Identify a file's current contents by (mtime_ns, size)"""
     try:
-        with open(MEMORY_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading memories: {e}", file=sys.stderr)
-        return []
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def log_size():
+    try:
+        return LOG_FILE.stat().st_size
+    except OSError:
+        return 0
+
+@functools.lru_cache(maxsize=4096)
+def bloom_hash(key):
+    """The two 32-bit hashes of a key; the same in every segment's filter, so
+    a query hashes each key once (32-bit halves keep the arithmetic on small ints)"""
+    h = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+    return h & 0xFFFFFFFF, (h >> 32) | 1
+
+class BloomFilter:
+    """Bit array answering "possibly present" or "definitely absent"
+
+    Sized for its keys at BLOOM_ERROR_RATE; positions come from one
+    BLAKE2b digest split into two hashes (double hashing).
+    """
+
+    def __init__(self, size, hashes, data=None):
+        self.size = size
+        self.hashes = hashes
+        self.data = bytearray(data) if data is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_keys(cls, keys, error_rate=BLOOM_ERROR_RATE):
+        keys = set(keys)
+        count = max(1, len(keys))
+        size = max(64, math.ceil(-count * math.log(error_rate) / math.log(2) ** 2))
+        bloom = cls(size, max(1, round(size / count * math.log(2))))
+        # Segments hold tens of thousands of keys; positions() inlined
+        data, steps, blake2b = bloom.data, range(bloom.hashes), hashlib.blake2b
+        for key in keys:
+            h = int.from_bytes(blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+            h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+            for i in steps:
+                position = (h1 + i * h2) % size
+                data[position >> 3] |= 1 << (position & 7)
+        return bloom
+
+    def positions(self, key):
+        h1, h2 = bloom_hash(key)
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key):
+        data = self.data
+        for position in self.positions(key):
+            data[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        data = self.data
+        for position in self.positions(key):
+            if not data[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def to_dict(self):
+        return {"size": self.size, "hashes": self.hashes, "data": base64.b64encode(bytes(self.data)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["size"], data["hashes"], base64.b64decode(data["data"]))
+
+def term_grams(term):
+    """Character n-grams (up to NGRAM_MAX) that any substring of `term` shares"""
+    size = min(NGRAM_MAX, len(term))
+    return {term[i:i + size] for i in range(len(term) - size + 1)}
+
+def segment_keys(memories, index):
+    """Bloom filter keys: indexed terms and their n-grams, tag substrings and ids"""
+    keys = {"t:" + term for term in index.terms}
+    grams = set()
+    for term in index.terms:
+        for size in range(1, min(NGRAM_MAX, len(term)) + 1):
+            grams.update(term[i:i + size] for i in range(len(term) - size + 1))
+    keys.update("g:" + gram for gram in grams)
+    for memory in memories:
+        keys.add("id:" + str(memory.get('id')))
+        for tag in memory.get('tags', []):
+            tag = tag.lower()[:TAG_SUBSTRING_MAX]
+            keys.update("#" + tag[i:j] for i in range(len(tag)) for j in range(i + 1, len(tag) + 1))
+    return keys
+
+def may_match(header, bloom, query_lower, word_lookups):
+    """False only if the segment cannot hold a memory matching the query
+
+    Every match shares an indexed term with the query or has a tag
+    containing it, so a segment whose filter has neither is skipped. A
+    lookup that may be part of a longer term is ruled out by any of its
+    n-grams missing. `word_lookups` holds TOKENIZER's query_terms for each
+    query word.
+    """
+    if header.get("tokenizer") != TOKENIZER:
+        return True
+    for lookups in word_lookups:
+        if not lookups:
+            return True
+        for term, exact in lookups:
+            if exact and "t:" + term in bloom:
+                return True
+            if not exact and all("g:" + gram in bloom for gram in term_grams(term)):
+                return True
+    if len(query_lower) > TAG_SUBSTRING_MAX:
+        return bool(header.get("long_tags"))
+    return "#" + query_lower in bloom
+
+def manifest_path():
+    return SEGMENTS_DIR / "manifest.json"
+
+def new_manifest():
+    return {
+        "version": MANIFEST_VERSION,
+        "next_segment": 1,
+        # Bytes of the log already sealed into segments
+        "log_offset": 0,
+        # Deleted ids of sealed memories: [segment id, length in terms]
+        "deleted": {},
+        "segments": [],
+        # Replaced segment files, removed at the next seal so a reader
+        # holding the previous manifest can still open them
+        "obsolete": [],
+    }
+
+def read_manifest():
+    path = manifest_path()
+    if not path.exists():
+        return new_manifest()
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def write_json(path, data):
+    """Atomically replace `path` with `data` as JSON"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        # dumps() runs the C encoder; dump() to a file encodes in Python
+        f.write(json.dumps(data, ensure_ascii=False))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def write_manifest(manifest):
+    write_json(manifest_path(), manifest)
+
+def write_segment(manifest, memories):
+    """Seal memories into a new immutable segment file; returns its header"""
+    memories = {m.get('id'): m for m in memories}.values()
+    memories = sorted(memories, key=lambda m: (m.get('timestamp', ''), str(m.get('id'))))
+    index = InvertedIndex.build(memories)
+    segment_id = manifest["next_segment"]
+    manifest["next_segment"] += 1
+    name = f"segment_{segment_id:08d}.json"
+    ids = [m.get('id') for m in memories]
+    write_json(SEGMENTS_DIR / name, {
+        "version": SEGMENT_VERSION,
+        "ids": ids,
+        "timestamps": [m.get('timestamp', '') for m in memories],
+        # One JSON document per memory, decoded only when it is needed
+        "memories": [json.dumps(m, ensure_ascii=False) for m in memories],
+        "index": index.pack(ids),
+    })
+    return {
+        "id": segment_id,
+        "file": name,
+        "min_timestamp": memories[0].get('timestamp', ''),
+        "max_timestamp": memories[-1].get('timestamp', ''),
+        "count": len(memories),
+        "length": index.total_length,
+        "tokenizer": index.tokenizer.name,
+        "long_tags": any(len(tag) > TAG_SUBSTRING_MAX for m in memories for tag in m.get('tags', [])),
+        "bloom": BloomFilter.for_keys(segment_keys(memories, index)).to_dict(),
+    }
+
+def write_segments(manifest, memories):
+    """Seal memories in time order into segments of SEGMENT_SIZE"""
+    memories = sorted(memories, key=lambda m: (m.get('timestamp', ''), str(m.get('id'))))
+    for start in range(0, len(memories), SEGMENT_SIZE):
+        manifest["segments"].append(write_segment(manifest, memories[start:start + SEGMENT_SIZE]))
+
+class Segment:
+    """The active segment: memories replayed from the log and their index"""
+    header = None
+
+    def __init__(self, memories=None):
+        self.memories = memories or []
+        self.positions = {m.get('id'): i for i, m in enumerate(self.memories)}
+        self.index = InvertedIndex.build(self.memories)
+
+    def memory_at(self, position):
+        return self.memories[position]
+
+    def get(self, memory_id):
+        position = self.positions.get(memory_id)
+        return None if position is None else self.memory_at(position)
+
+    def candidates(self, query_lower, query_words):
+        """Memories reachable through the index for a legacy-scored query"""
+        ids = self.index.candidates(query_lower, query_words)
+        if ids is None:
+            return self.memories
+        return [self.memory_at(p) for p in sorted(self.positions[i] for i in ids if i in self.positions)]
+
+class SealedSegment(Segment):
+    """An immutable segment loaded from its file"""
+
+    def __init__(self, header, data, size=0):
+        self.header = header
+        self.size = size
+        self.lines = data["memories"]
+        self.decoded = None
+        # Memories handed out by get(); the newest are listed again and again
+        self.read = {}
+        self.positions = {memory_id: i for i, memory_id in enumerate(data["ids"])}
+        if data["index"]["tokenizer"] == TOKENIZER:
+            self.index = SegmentIndex(data)
+        else:
+            self.index = InvertedIndex.build(self.memories)
+
+    @classmethod
+    def load(cls, header):
+        path = SEGMENTS_DIR / header["file"]
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(header, json.load(f), path.stat().st_size)
+
+    @property
+    def memories(self):
+        if self.decoded is None:
+            self.decoded = [json.loads(line) for line in self.lines]
+        return self.decoded
+
+    def memory_at(self, position):
+        if self.decoded is not None:
+            return self.decoded[position]
+        return json.loads(self.lines[position])
+
+    def get(self, memory_id):
+        memory = self.read.get(memory_id)
+        if memory is None:
+            memory = super().get(memory_id)
+            if memory is not None:
+                self.read[memory_id] = memory
+        return memory
+
+class SegmentStore:
+    """Segment headers, the active segment and a few loaded sealed segments
+
+    Headers (time range, counts, Bloom filter) are small and always kept;
+    sealed segments are loaded on demand into an LRU of SEGMENT_CACHE_BYTES, so
+    a process stays about the same size however long the history grows.
+    A long-lived process (the daemon, or a library caller) only replays
+    the records appended to the log since its last access.
+    """
+
+    def __init__(self):
+        self.manifest_stamp = None
+        self.headers = []
+        self.newest_first = []
+        self.blooms = {}
+        self.deleted = {}
+        self.offset = 0
+        self.active = None
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+
+    def refresh(self):
+        stamp = file_stamp(manifest_path())
+        if stamp is None and MEMORY_FILE.exists():
+            import_snapshot()
+            stamp = file_stamp(manifest_path())
+        size = log_size()
+        if self.active is None or stamp != self.manifest_stamp or size < self.offset:
+            self.reload(stamp)
+        elif size > self.offset:
+            self.catch_up()
+        return self
+
+    def reload(self, stamp):
+        manifest = read_manifest()
+        self.manifest_stamp = stamp
+        self.headers = manifest["segments"]
+        self.newest_first = sorted(self.headers, key=lambda h: h["max_timestamp"], reverse=True)
+        self.blooms = {h["id"]: BloomFilter.from_dict(h["bloom"]) for h in self.headers}
+        self.deleted = dict(manifest["deleted"])
+        # A log shorter than the sealed offset was restarted after sealing
+        self.offset = manifest["log_offset"] if log_size() >= manifest["log_offset"] else 0
+        self.active = Segment()
+        # A cleared store reuses segment file names, so compare whole headers
+        files = {h["file"]: h for h in self.headers}
+        for header_file in [f for f, s in self.cache.items() if files.get(f) != s.header]:
+            self.cache_bytes -= self.cache.pop(header_file).size
+        self.catch_up()
+
+    def catch_up(self):
+        active = self.active
+        deleted = False
+        for record, self.offset in read_log(self.offset):
+            if record.get("op") == "add":
+                memory = record["memory"]
+                position = active.positions.get(memory.get('id'))
+                if position is None:
+                    active.positions[memory.get('id')] = len(active.memories)
+                    active.memories.append(memory)
+                else:
+                    active.memories[position] = memory
+                active.index.add(memory)
+            elif record.get("op") == "delete":
+                position = active.positions.pop(record.get("id"), None)
+                if position is None:
+                    self.deleted[record.get("id")] = [record.get("segment"), record.get("length", 0)]
+                    continue
+                active.index.remove(active.memories[position])
+                active.memories[position] = None
+                deleted = True
+        if deleted:
+            active.memories = [m for m in active.memories if m is not None]
+            active.positions = {m.get('id'): i for i, m in enumerate(active.memories)}
+
+    def segment(self, header):
+        """A sealed segment, loaded through the LRU cache"""
+        segment = self.cache.get(header["file"])
+        if segment is None:
+            segment = self.cache[header["file"]] = SealedSegment.load(header)
+            self.cache_bytes += segment.size
+            while len(self.cache) > 1 and self.cache_bytes > SEGMENT_CACHE_BYTES:
+                self.cache_bytes -= self.cache.popitem(last=False)[1].size
+        else:
+            self.cache.move_to_end(header["file"])
+        return segment
+
+    def sealed(self, since=None, until=None):
+        """Headers of sealed segments overlapping [since, until], newest first"""
+        for header in self.newest_first:
+            if since is not None and header["max_timestamp"] < since:
+                continue
+            if until is not None and header["min_timestamp"] > until:
+                continue
+            yield header
+
+    def parts(self, query_lower, query_words, since=None, until=None):
+        """None for the active segment, then headers that may hold a match"""
+        yield None
+        tokenizer = get_tokenizer()
+        word_lookups = [tokenizer.query_terms(word) for word in query_words]
+        for header in self.sealed(since, until):
+            if may_match(header, self.blooms[header["id"]], query_lower, word_lookups):
+                yield header
+
+    def part(self, header):
+        return self.active if header is None else self.segment(header)
+
+    def visible(self, part, memory_id, timestamp, since=None, until=None):
+        if part.header is not None and memory_id in self.deleted:
+            return False
+        return (since is None or timestamp >= since) and (until is None or timestamp <= until)
+
+    def count(self):
+        return len(self.active.memories) + sum(h["count"] for h in self.headers) - sum(
+            1 for segment, _ in self.deleted.values() if segment is not None
+        )
+
+    def total_length(self):
+        return self.active.index.total_length + sum(h["length"] for h in self.headers) - sum(
+            length for segment, length in self.deleted.values() if segment is not None
+        )
+
+    def find(self, memory_id):
+        """(segment, memory) holding a live memory id, or (None, None)"""
+        memory = self.active.get(memory_id)
+        if memory is not None:
+            return self.active, memory
+        if memory_id in self.deleted:
+            return None, None
+        for header in self.sealed():
+            if "id:" + str(memory_id) in self.blooms[header["id"]]:
+                segment = self.segment(header)
+                memory = segment.get(memory_id)
+                if memory is not None:
+                    return segment, memory
+        return None, None
+
+    def get(self, memory_id):
+        return self.find(memory_id)[1]
+
+    def recent(self, limit, since=None, until=None):
+        """The `limit` newest memories, newest first
+
+        Segments are read newest first and the walk stops at the first one
+        whose newest memory is older than everything already kept.
+        """
+        if limit <= 0:
+            return []
+        best = []
+        for header in itertools.chain([None], self.sealed(since, until)):
+            if header is not None and len(best) >= limit and header["max_timestamp"] < best[0][0]:
+                break
+            part = self.part(header)
+            for timestamp, memory_id in reversed(part.index.recent):
+                if since is not None and timestamp < since:
+                    break
+                if not self.visible(part, memory_id, timestamp, since, until):
+                    continue
+                entry = (timestamp, memory_id, part.header["id"] if part.header else 0, part.get(memory_id))
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+                else:
+                    # The rest of this segment is older still
+                    break
+        return [entry[-1] for entry in sorted(best, key=lambda e: e[:-1], reverse=True)]
+
+    def search(self, query, limit=10, scorer=None, since=None, until=None):
+        scorer = scorer or DEFAULT_SCORER
+        if scorer not in SCORERS:
+            raise ValueError(f"Unknown scorer: {scorer} (choose from {', '.join(SCORERS)})")
+        query_lower = query.lower()
+        query_words = query_lower.split()
+        if scorer == "bm25":
+            return self.search_bm25(query_lower, query_words, limit, since, until)
+        
+        best = []
+        counter = itertools.count()
+        for header in self.parts(query_lower, query_words, since, until):
+            if (scorer == "recent" and header is not None and len(best) >= limit
+                    and header["max_timestamp"] < best[0][0]):
+                break
+            part = self.part(header)
+            for memory in part.candidates(query_lower, query_words):
+                timestamp = memory.get('timestamp', '')
+                if not self.visible(part, memory.get('id'), timestamp, since, until):
+                    continue
+                score = score_memory(memory, query_lower, query_words)
+                if score <= 0:
+                    continue
+                # Ties go to the memory seen first
+                key = (timestamp,) if scorer == "recent" else (score, timestamp)
+                entry = key + (-next(counter), memory)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry[:-1] > best[0][:-1]:
+                    heapq.heapreplace(best, entry)
+        return [entry[-1] for entry in sorted(best, key=lambda e: e[:-1], reverse=True)]
+
+    def search_bm25(self, query_lower, query_words, limit, since, until):
+        """BM25 over the segments that may match
+
+        Skipped segments hold none of the query's terms, so document
+        frequencies summed over the visited ones are exact. A partial term
+        is used as is if any segment has it, else expanded against every
+        segment's vocabulary, as one index over the whole store would.
+        The first pass only gathers each segment's posting lists for the
+        query (walking them just where deletions or a time range hide
+        memories) and keeps no segment itself, so the cache still bounds
+        memory; the second scores them, and only the top `limit` are read out.
+        """
+        tokenizer = get_tokenizer()
+        lookups = [lookup for word in query_words for lookup in tokenizer.query_terms(word)]
+        verbatim = set()
+        expansions = {}
+        frequencies = Counter()
+        # (header, {term: postings}, matching tag postings, hidden ids) per segment
+        found = []
+        bounded = since is not None or until is not None
+        deleted_in = {segment for segment, _ in self.deleted.values()}
+        for header in self.parts(query_lower, query_words, since, until):
+            part = self.part(header)
+            index = part.index
+            wanted = set()
+            for term, exact in lookups:
+                if exact or term in index.terms:
+                    wanted.add(term)
+                    if not exact:
+                        verbatim.add(term)
+                elif term not in verbatim:
+                    others = index.expand(term)
+                    expansions.setdefault(term, set()).update(others)
+                    wanted.update(others)
+            postings = {}
+            for term in wanted:
+                ids = index.terms.get(term)
+                if ids:
+                    postings[term] = ids
+            tags = [index.tags[tag] for tag in index.tags if query_lower in tag]
+            hidden = set()
+            if bounded or (header is not None and (header["id"] in deleted_in or None in deleted_in)):
+                docs = index.docs
+                for ids in itertools.chain(postings.values(), tags):
+                    hidden.update(i for i in ids if not self.visible(part, i, docs[i][1], since, until))
+            for term, ids in postings.items():
+                frequencies[term] += len(ids) - len(hidden.intersection(ids)) if hidden else len(ids)
+            found.append((header, postings, tags, hidden))
+        
+        count = self.count()
+        if not count or not found:
+            return []
+        terms = set()
+        for term, exact in lookups:
+            terms.update((term,) if exact or term in verbatim else expansions.get(term, ()))
+        average_length = self.total_length() / count or 1.0
+        idf = {
+            term: math.log(1 + (count - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+            for term in terms if frequencies[term]
+        }
+        
+        matches = []
+        for header, postings, tags, hidden in found:
+            docs = self.part(header).index.docs
+            scores = {}
+            for term, weight in idf.items():
+                for memory_id, frequency in postings.get(term, {}).items():
+                    if hidden and memory_id in hidden:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * docs[memory_id][0] / average_length)
+                    scores[memory_id] = scores.get(memory_id, 0) + weight * frequency * (BM25_K1 + 1) / (frequency + norm)
+            if tags:
+                matching_tags = Counter(i for ids in tags for i in ids if i not in hidden)
+                for memory_id, tag_count in matching_tags.items():
+                    scores[memory_id] = scores.get(memory_id, 0) + tag_count * BM25_TAG_WEIGHT
+            matches.extend((score, docs[memory_id][1], header, memory_id)
+                           for memory_id, score in scores.items() if score > 0)
+        best = heapq.nlargest(limit, matches, key=lambda match: match[:2])
+        return [self.part(header).get(memory_id) for _, _, header, memory_id in best]
+
+    def iter_memories(self):
+        """Every live memory, oldest segment first, one segment loaded at a time"""
+        for header in self.headers:
+            segment = self.cache.get(header["file"]) or SealedSegment.load(header)
+            for memory in segment.memories:
+                if memory.get('id') not in self.deleted:
+                    yield memory
+        yield from list(self.active.memories)
+
+STORE = SegmentStore()
+
+@contextmanager
+def store_lock():
+    """Serialize writers (appends and sealing) across processes"""
+    if fcntl is None:
+        yield
+        return
+    with open(LOCK_FILE, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def read_log(offset=0):
+    """Stream (record, end_offset) pairs from the append-only log
+
+    A torn final line (crash mid-append) is skipped rather than failing
+    the whole load.
+    """
+    if not LOG_FILE.exists():
+        return
+    with open(LOG_FILE, 'rb') as f:
+        f.seek(offset)
+        position = offset
+        for line in f:
+            position += len(line)
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"Warning: skipping corrupt log record at byte {position - len(line)}", file=sys.stderr)
+                continue
+            yield record, position
+
+def append_log(record):
+    """Append one record to the log: O(1) I/O regardless of store size"""
+    line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+    with store_lock():
+        if not LOG_FILE.exists():
+            restart_log()
+        with open(LOG_FILE, 'ab') as f:
+            # Terminate a torn line left by a crash so this record parses
+            if f.tell() > 0:
+                with open(LOG_FILE, 'rb') as tail:
+                    tail.seek(-1, os.SEEK_END)
+                    if tail.read(1) != b'\n':
+                        line = b'\n' + line
+            f.write(line)
+            f.flush()
+            if FSYNC_WRITES:
+                os.fsync(f.fileno())
+    maybe_seal()
+
+def restart_log():
+    """Reset the sealed offset before a new log is started
+
+    Sealing removes the log and then zeroes the offset; after a crash in
+    between, the offset would otherwise hide the new log's first records.
+    """
+    if manifest_path().exists():
+        manifest = read_manifest()
+        if manifest["log_offset"]:
+            manifest["log_offset"] = 0
+            write_manifest(manifest)
+
+def import_snapshot():
+    """Split a memory.json snapshot from before segments into sealed segments
+
+    The log it was paired with stays in place as the active segment.
+    """
+    with store_lock():
+        if manifest_path().exists():
+            return
+        try:
+            with open(MEMORY_FILE, 'r', encoding='utf-8') as f:
+                memories = json.load(f)
+        except Exception as e:
+            print(f"Error loading memories: {e}", file=sys.stderr)
+            return
+        for position, memory in enumerate(memories):
+            memory.setdefault('id', f"mem_import_{position}")
+        manifest = new_manifest()
+        write_segments(manifest, memories)
+        write_manifest(manifest)
+
+def iter_memories():
+    """Stream all live memories without holding the whole store"""
+    return STORE.refresh().iter_memories()
+
+def load_memories():
+    """Load all memories (every segment plus the log)"""
+    return list(iter_memories())
 
 def save_memories(memories):
-    """Save all memories to file"""
+    """Replace the whole store with `memories`, sealed into fresh segments"""
     try:
-        with open(MEMORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(memories, f, indent=2, ensure_ascii=False)
+        with store_lock():
+            manifest = new_manifest()
+            if manifest_path().exists():
+                old = read_manifest()
+                manifest["next_segment"] = old["next_segment"]
+                manifest["obsolete"] = old["obsolete"] + [h["file"] for h in old["segments"]]
+            write_segments(manifest, memories)
+            write_manifest(manifest)
+            if LOG_FILE.exists():
+                LOG_FILE.unlink()
         return True
     except Exception as e:
         print(f"Error saving memories: {e}", file=sys.stderr)
         return False
 
-def search_memories(query, limit=10):
-    """Search memories by keyword (simple text matching)"""
-    memories = load_memories()
-    
-    if not query or not query.strip():
-        # Return most recent memories if no query
-        sorted_memories = sorted(
-            memories, 
-            key=lambda x: x.get('timestamp', ''), 
-            reverse=True
-        )
-        return sorted_memories[:limit]
-    
-    query_lower = query.lower()
-    query_words = query_lower.split()
-    
-    # Score each memory based on match quality
-    scored_memories = []
-    
-    for memory in memories:
-        content = memory.get('content', '').lower()
-        tags = memory.get('tags', [])
-        
-        score = 0
+def seal(compact=False):
+    """Seal the active segment and rewrite segments with many deletions
+
+    The log's memories become a new segment (or are merged into a newest
+    segment still under SEGMENT_SIZE), its tombstones move into the
+    manifest, and segments over SEGMENT_DELETED_FRACTION deleted (any
+    deleted, when compacting) are rewritten without them.
+    """
+    with store_lock():
+        manifest = read_manifest()
+        offset = manifest["log_offset"] if log_size() >= manifest["log_offset"] else 0
+        memories = {}
+        end = offset
+        for record, end in read_log(offset):
+            if record.get("op") == "add":
+                memories[record["memory"].get('id')] = record["memory"]
+            elif record.get("op") == "delete":
+                if memories.pop(record.get("id"), None) is None:
+                    manifest["deleted"][record.get("id")] = [record.get("segment"), record.get("length", 0)]
         
-        # Full phrase match gets highest score
-        if query_lower in content:
-            score += 10
+        for name in manifest["obsolete"]:
+            (SEGMENTS_DIR / name).unlink(missing_ok=True)
+        manifest["obsolete"] = []
+        headers = manifest["segments"]
+        if memories and headers and headers[-1]["count"] + len(memories) <= SEGMENT_SIZE:
+            # Merging rewrites the newest segment without its deleted memories too
+            header = headers.pop()
+            memories = dict({m.get('id'): m for m in SealedSegment.load(header).memories}, **memories)
+            for memory_id in [i for i, (s, _) in manifest["deleted"].items() if s == header["id"]]:
+                memories.pop(memory_id, None)
+                del manifest["deleted"][memory_id]
+            manifest["obsolete"].append(header["file"])
+        if memories:
+            headers.append(write_segment(manifest, memories.values()))
         
-        # Individual word matches
-        for word in query_words:
-            if word in content:
-                score += 3
+        # Tombstones from before segments carry no segment id
+        by_id = {h["id"]: h for h in headers}
+        for memory_id, (segment_id, _) in list(manifest["deleted"].items()):
+            if segment_id is None or segment_id not in by_id:
+                del manifest["deleted"][memory_id]
+                for header in headers:
+                    if "id:" + str(memory_id) in BloomFilter.from_dict(header["bloom"]):
+                        segment = SealedSegment.load(header)
+                        if segment.get(memory_id) is not None:
+                            length = segment.index.docs.get(memory_id, [0])[0]
+                            manifest["deleted"][memory_id] = [header["id"], length]
+                            break
         
-        # Tag matches
-        for tag in tags:
-            if query_lower in tag.lower():
-                score += 5
+        deleted_per_segment = Counter(s for s, _ in manifest["deleted"].values())
+        for position, header in enumerate(headers):
+            deleted = deleted_per_segment.get(header["id"], 0)
+            if not deleted or (not compact and deleted <= SEGMENT_DELETED_FRACTION * header["count"]):
+                continue
+            kept = [m for m in SealedSegment.load(header).memories if m.get('id') not in manifest["deleted"]]
+            for memory_id in [i for i, (s, _) in manifest["deleted"].items() if s == header["id"]]:
+                del manifest["deleted"][memory_id]
+            headers[position] = write_segment(manifest, kept) if kept else None
+            manifest["obsolete"].append(header["file"])
+        manifest["segments"] = [h for h in headers if h is not None]
         
-        if score > 0:
-            scored_memories.append((score, memory))
+        manifest["log_offset"] = end
+        write_manifest(manifest)
+        if LOG_FILE.exists():
+            LOG_FILE.unlink()
+        manifest["log_offset"] = 0
+        write_manifest(manifest)
+    return manifest
+
+def compact_memories():
+    """Seal the log and drop deleted memories from every segment"""
+    try:
+        manifest = seal(compact=True)
+    except Exception as e:
+        return {"success": False, "error": f"Failed to compact: {e}"}
+    return {
+        "success": True,
+        "count": sum(h["count"] for h in manifest["segments"]),
+        "segments": len(manifest["segments"]),
+    }
+
+def maybe_seal():
+    """Seal the active segment once its log passes SEGMENT_BYTES"""
+    if log_size() > SEGMENT_BYTES:
+        seal()
+
+def score_memory(memory, query_lower, query_words):
+    """Score one memory: phrase match 10, each word 3, each matching tag 5"""
+    content = memory.get('content', '').lower()
+    tags = memory.get('tags', [])
+    
+    score = 0
+    
+    # Full phrase match gets highest score
+    if query_lower in content:
+        score += 10
+    
+    # Individual word matches
+    for word in query_words:
+        if word in content:
+            score += 3
+    
+    # Tag matches
+    for tag in tags:
+        if query_lower in tag.lower():
+            score += 5
     
-    # Sort by score descending, then by timestamp
-    scored_memories.sort(
-        key=lambda x: (-x[0], x[1].get('timestamp', '')),
-        reverse=True
-    )
+    return score
+
+def search_memories(query, limit=10, scorer=None, since=None, until=None):
+    """Search memories by keyword (BM25, the legacy scores or newest first)
+
+    `since` and `until` are timestamp strings (see time_bound); segments
+    entirely outside the range are never read.
+    """
+    store = STORE.refresh()
+    
+    if not query or not query.strip():
+        # Return most recent memories if no query
+        return store.recent(limit, since, until)
     
-    # Return top results
-    return [m for _, m in scored_memories[:limit]]
+    return store.search(query, limit, scorer, since, until)
+
+def time_bound(value, end=False):
+    """An ISO date or datetime as a string comparable with memory timestamps
+
+    A bare date as the end of a range covers that whole day.
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        return parsed.date().isoformat() + "T23:59:59.999999"
+    return parsed.isoformat()
 
 def add_memory(content, tags=None):
     """Add a new memory"""
     if not content or not content.strip():
         return {"success": False, "error": "Content cannot be empty"}
     
-    memories = load_memories()
-    
-    # Generate a unique ID
-    memory_id = f"mem_{datetime.now().strftime('%Y%m%d%H%M%S')}_{len(memories)}"
+    now = datetime.now()
+    # Generate a unique ID without counting the existing memories
+    memory_id = f"mem_{now.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
     
     new_memory = {
         "id": memory_id,
         "content": content.strip(),
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now.isoformat(),
         "tags": tags or []
     }
     
-    memories.append(new_memory)
-    
-    if save_memories(memories):
-        return {"success": True, "memory": new_memory}
-    else:
+    try:
+        append_log({"op": "add", "memory": new_memory})
+    except Exception as e:
+        print(f"Error saving memory: {e}", file=sys.stderr)
         return {"success": False, "error": "Failed to save memory"}
+    return {"success": True, "memory": new_memory}
 
 def delete_memory(memory_id):
-    """Delete a memory by ID"""
-    memories = load_memories()
-    
-    original_count = len(memories)
-    memories = [m for m in memories if m.get("id") != memory_id]
-    
-    if len(memories) == original_count:
+    """Delete a memory by ID (appends a tombstone to the log)"""
+    segment, memory = STORE.refresh().find(memory_id)
+    if memory is None:
         return {"success": False, "error": "Memory not found"}
     
-    if save_memories(memories):
-        return {"success": True, "deleted_id": memory_id}
-    else:
+    record = {"op": "delete", "id": memory_id}
+    if segment.header is not None:
+        # Lets the sealed segment's live count and length be kept exact
+        record["segment"] = segment.header["id"]
+        record["length"] = segment.index.docs[memory_id][0]
+    try:
+        append_log(record)
+    except Exception as e:
+        print(f"Error saving deletion: {e}", file=sys.stderr)
         return {"success": False, "error": "Failed to save after deletion"}
+    return {"success": True, "deleted_id": memory_id}
 
 def clear_all_memories():
     """Clear all memories"""
     try:
-        if MEMORY_FILE.exists():
-            MEMORY_FILE.unlink()
+        with store_lock():
+            for path in (MEMORY_FILE, LOG_FILE):
+                if path.exists():
+                    path.unlink()
+            if SEGMENTS_DIR.exists():
+                shutil.rmtree(SEGMENTS_DIR)
         return {"success": True, "message": "All memories cleared"}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-def main():
-    """CLI entry point"""
-    if len(sys.argv) < 2:
-        print(json.dumps({"error": "Usage: memory.py <command> [args]"}))
-        sys.exit(1)
+def pop_option(args, name, default=None):
+    """Remove `--name value` or `--name=value` from args and return the value"""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        if arg.startswith(name + "="):
+            del args[i]
+            return arg[len(name) + 1:]
+    return default
+
+def execute(request):
+    """Run one command request and return its JSON response
+
+    Requests are dicts such as {"command": "search", "query": "kimi",
+    "limit": 5}; the CLI builds them from argv and the daemon reads them
+    off its socket, so both paths produce identical output.
+    """
+    command = request.get("command")
     
-    command = sys.argv[1]
+    if command in ("search", "list"):
+        try:
+            since = time_bound(request.get("since"))
+            until = time_bound(request.get("until"), end=True)
+        except ValueError as e:
+            return {"success": False, "error": f"Invalid date: {e}"}
     
     if command == "search":
-        query = sys.argv[2] if len(sys.argv) > 2 else ""
-        limit = int(sys.argv[3]) if len(sys.argv) > 3 else 10
-        results = search_memories(query, limit)
-        print(json.dumps({"success": True, "results": results}, indent=2, ensure_ascii=False))
+        results = search_memories(request.get("query", ""), int(request.get("limit", 10)),
+                                  scorer=request.get("scorer"), since=since, until=until)
+        return {"success": True, "results": results}
     
     elif command == "add":
-        text = sys.argv[2] if len(sys.argv) > 2 else ""
-        result = add_memory(text)
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return add_memory(request.get("text", ""), request.get("tags"))
     
     elif command == "delete":
-        memory_id = sys.argv[2] if len(sys.argv) > 2 else ""
-        result = delete_memory(memory_id)
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return delete_memory(request.get("id", ""))
     
     elif command == "list":
-        limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10
-        results = search_memories("", limit)
-        print(json.dumps({"success": True, "results": results}, indent=2, ensure_ascii=False))
+        results = search_memories("", int(request.get("limit", 10)), since=since, until=until)
+        return {"success": True, "results": results}
+    
+    elif command == "compact":
+        return compact_memories()
     
     elif command == "clear":
-        result = clear_all_memories()
+        return clear_all_memories()
+    
+    return {"error": f"Unknown command: {command}"}
+
+COMMANDS = ("search", "add", "delete", "list", "compact", "clear")
+
+# Long-lived daemon: keeps STORE warm and answers newline-delimited JSON
+SOCKET_FILE = Path(os.environ.get("MEMORY_SIMPLE_SOCKET", DATA_DIR / "memory.sock"))
+DAEMON_CONNECT_TIMEOUT = 0.5
+
+def call_daemon(request, socket_path=None):
+    """Send a request to a running daemon; returns None if none is listening
+
+    Only a failed connect falls back to running in-process: once the
+    request is sent a failure is reported, so writes never run twice.
+    """
+    if os.environ.get("MEMORY_SIMPLE_NO_DAEMON") or not hasattr(socket, "AF_UNIX"):
+        return None
+    socket_path = Path(socket_path or SOCKET_FILE)
+    if not socket_path.exists():
+        return None
+    
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(DAEMON_CONNECT_TIMEOUT)
+        try:
+            sock.connect(str(socket_path))
+        except OSError:
+            return None
+        sock.settimeout(None)
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            line = f.readline()
+        if not line:
+            return {"success": False, "error": "Daemon closed the connection"}
+        return json.loads(line)
+    except (OSError, ValueError) as e:
+        return {"success": False, "error": f"Daemon request failed: {e}"}
+    finally:
+        sock.close()
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """One connection: any number of request lines, one response line each"""
+    lock = threading.Lock()
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                with self.lock:
+                    response = execute(request)
+            except ValueError:
+                response = {"success": False, "error": "Invalid JSON request"}
+            except Exception as e:
+                response = {"success": False, "error": str(e)}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+def serve(socket_path=None):
+    """Run the daemon in the foreground until interrupted"""
+    if not hasattr(socket, "AF_UNIX"):
+        return {"success": False, "error": "Unix domain sockets are not supported on this platform"}
+    socket_path = Path(socket_path or SOCKET_FILE)
+    if socket_path.exists():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(socket_path))
+            return {"success": False, "error": f"Daemon already running on {socket_path}"}
+        except OSError:
+            # Left behind by a daemon that did not shut down cleanly
+            socket_path.unlink()
+        finally:
+            probe.close()
+    
+    STORE.refresh()
+    server = socketserver.ThreadingUnixStreamServer(str(socket_path), DaemonHandler)
+    server.daemon_threads = True
+    # shutdown() blocks until serve_forever returns, so call it off-thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"Memory daemon listening on {socket_path} ({STORE.count()} memories)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path.exists():
+            socket_path.unlink()
+    return {"success": True, "message": "Daemon stopped"}
+
+def main():
+    """CLI entry point"""
+    args = sys.argv[1:]
+    scorer = pop_option(args, "--scorer")
+    socket_path = pop_option(args, "--socket")
+    since = pop_option(args, "--since")
+    until = pop_option(args, "--until")
+    if scorer is not None and scorer not in SCORERS:
+        print(json.dumps({"error": f"Unknown scorer: {scorer} (choose from {', '.join(SCORERS)})"}))
+        sys.exit(1)
+    sys.argv = sys.argv[:1] + args
+    
+    if len(sys.argv) < 2:
+        print(json.dumps({"error": "Usage: memory.py <command> [args] [--scorer bm25|legacy|recent] "
+                                   "[--since DATE] [--until DATE]"}))
+        sys.exit(1)
+    
+    command = sys.argv[1]
+    
+    if command == "serve":
+        result = serve(socket_path)
         print(json.dumps(result, indent=2, ensure_ascii=False))
+        sys.exit(0 if result.get("success") else 1)
     
-    else:
+    if command not in COMMANDS:
         print(json.dumps({"error": f"Unknown command: {command}"}))
         sys.exit(1)
+    
+    request = {"command": command}
+    
+    if command == "search":
+        request["query"] = sys.argv[2] if len(sys.argv) > 2 else ""
+        request["limit"] = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+        request["scorer"] = scorer
+        request["since"] = since
+        request["until"] = until
+    
+    elif command == "add":
+        request["text"] = sys.argv[2] if len(sys.argv) > 2 else ""
+    
+    elif command == "delete":
+        request["id"] = sys.argv[2] if len(sys.argv) > 2 else ""
+    
+    elif command == "list":
+        request["limit"] = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        request["since"] = since
+        request["until"] = until
+    
+    result = call_daemon(request, socket_path)
+    if result is None:
+        result = execute(request)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
 
 if __name__ == "__main__":
     main()
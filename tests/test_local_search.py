@@ -0,0 +1,60 @@
+"""local-search command-line parsing"""
+
+import importlib.util
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parent.parent / "local-search" / "search.py"
+
+
+@pytest.fixture
+def local_search(monkeypatch):
+    spec = importlib.util.spec_from_file_location("local_search", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    calls = []
+    monkeypatch.setattr(module, "search", lambda *args, **kwargs: calls.append(args) or {"success": True})
+    module.calls = calls
+    return module
+
+
+def run_main(module, monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["search.py", *argv])
+    module.main()
+
+
+def test_max_option(local_search, monkeypatch, capsys):
+    run_main(local_search, monkeypatch, "hello", "--max=3")
+    assert local_search.calls == [("hello", 3, "zh-CN")]
+    assert json.loads(capsys.readouterr().out) == {"success": True}
+
+
+def test_max_and_lang_anywhere_in_query(local_search, monkeypatch):
+    run_main(local_search, monkeypatch, "--lang=en-US", "python", "--max=10", "asyncio")
+    assert local_search.calls == [("python asyncio", 10, "en-US")]
+
+
+@pytest.mark.parametrize("value", ["abc", "0", "-2", ""])
+def test_invalid_max_is_a_usage_error(local_search, monkeypatch, capsys, value):
+    with pytest.raises(SystemExit) as exit_info:
+        run_main(local_search, monkeypatch, "hello", f"--max={value}")
+    assert exit_info.value.code == 1
+    output = json.loads(capsys.readouterr().out)
+    assert output["success"] is False
+    assert "--max" in output["error"]
+    assert local_search.calls == []
+
+
+def test_missing_web_search_is_reported(tmp_path):
+    (tmp_path / "local-search").mkdir()
+    script = shutil.copy(SCRIPT, tmp_path / "local-search" / "search.py")
+    completed = subprocess.run([sys.executable, script, "hello"], capture_output=True, text=True)
+    assert completed.returncode == 1
+    output = json.loads(completed.stdout)
+    assert output["success"] is False
+    assert "needs the web-search skill" in output["error"]
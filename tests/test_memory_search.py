@@ -0,0 +1,97 @@
+"""memory-search hybrid search"""
+
+import gc
+import importlib.util
+import json
+import types
+import zlib
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parent.parent / "memory-search" / "memory_search.py"
+
+
+def hash_embedder(texts):
+    """Bag-of-words hashing vectors, so no model is needed"""
+    vectors = []
+    for text in texts:
+        vector = [0.0] * 64
+        for word in text.split():
+            vector[zlib.crc32(word.encode("utf-8")) % 64] += 1.0
+        vectors.append(vector)
+    return vectors
+
+
+@pytest.fixture
+def memory_search(tmp_path, monkeypatch):
+    monkeypatch.setenv("MEMORY_SEARCH_NO_DAEMON", "1")
+    spec = importlib.util.spec_from_file_location("memory_search", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.CONFIG_FILE = tmp_path / "config.json"
+    write_config(module, embedding_cache_size=0)
+    module.SentenceTransformerEmbedder = lambda model_name: hash_embedder
+    yield module
+    module.SESSION.reset()
+
+
+def write_config(module, **config):
+    config = dict({"db_path": str(module.CONFIG_FILE.parent / "memory_db"), "backend": "numpy"}, **config)
+    module.CONFIG_FILE.write_text(json.dumps(config), encoding="utf-8")
+
+
+def keyword_store(memories):
+    """Stands in for memory-simple: every memory matches every query"""
+    by_id = {memory["id"]: memory for memory in memories}
+    store = types.SimpleNamespace(get=by_id.get)
+    return types.SimpleNamespace(
+        search_memories=lambda query, limit: memories[:limit],
+        STORE=types.SimpleNamespace(refresh=lambda: store),
+    )
+
+
+def test_hybrid_metadata_has_one_shape(memory_search):
+    memory_search._keyword_module = keyword_store([{
+        "id": "mem_keyword",
+        "content": "deadline for the kimi project",
+        "timestamp": "2026-03-01T09:30:00",
+        "tags": ["work", "kimi"],
+    }])
+    added = memory_search.add_memory("deadline moved to friday")
+    assert added["success"]
+
+    result = memory_search.hybrid_search("deadline", 5)
+    assert result["success"]
+    hits = {hit["id"]: hit for hit in result["results"]}
+    keyword_hit = hits["mem_keyword"]
+    vector_hit = hits[added["id"]]
+    assert keyword_hit["keyword_rank"] == 1 and keyword_hit["vector_rank"] is None
+    assert vector_hit["vector_rank"] == 1 and vector_hit["keyword_rank"] is None
+
+    assert keyword_hit["metadata"] == {
+        "timestamp": memory_search.parse_timestamp("2026-03-01T09:30:00"),
+        "source": "memory-simple",
+        "tags": "work,kimi",
+    }
+    assert isinstance(vector_hit["metadata"]["timestamp"], float)
+    for hit in hits.values():
+        assert all(isinstance(value, (str, int, float)) for value in hit["metadata"].values())
+
+
+def test_session_reloads_do_not_leak_embedding_caches(memory_search):
+    for size in (100, 200, 300):
+        write_config(memory_search, embedding_cache_size=size)
+        memory_search.add_memory(f"cached text {size}")
+        memory_search.search_memories("cached text")
+        # A hit only marks the index dirty; it is written when the cache is dropped
+        memory_search.search_memories("cached text")
+        memory_search.SESSION.reset()
+    gc.collect()
+    assert len(memory_search.LIVE_CACHES) == 0
+
+    # Dropped caches were flushed, hits included
+    index = json.loads((memory_search.CONFIG_FILE.parent / "memory_db" / "embedding_cache"
+                        / "all-MiniLM-L6-v2" / "index.json").read_text(encoding="utf-8"))
+    assert index["capacity"] == 300
+    assert (index["hits"], index["misses"]) == (1, 2)
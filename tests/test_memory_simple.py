@@ -0,0 +1,34 @@
+"""memory-simple segment store"""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parent.parent / "memory-simple" / "memory.py"
+
+
+@pytest.fixture
+def memory(tmp_path):
+    spec = importlib.util.spec_from_file_location("memory_simple", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.MEMORY_FILE = tmp_path / "memory.json"
+    module.LOG_FILE = tmp_path / "memory.jsonl"
+    module.LOCK_FILE = tmp_path / ".memory.lock"
+    module.SEGMENTS_DIR = tmp_path / "segments"
+    module.FSYNC_WRITES = False
+    return module
+
+
+def test_search_after_clear_does_not_reuse_cached_segments(memory):
+    memory.add_memory("alpha project notes")
+    memory.compact_memories()
+    assert [m["content"] for m in memory.search_memories("alpha")] == ["alpha project notes"]
+
+    # The rebuilt store's first segment has the same file name as the old one
+    memory.clear_all_memories()
+    memory.add_memory("beta project notes")
+    memory.compact_memories()
+    assert memory.search_memories("alpha") == []
+    assert [m["content"] for m in memory.search_memories("project")] == ["beta project notes"]
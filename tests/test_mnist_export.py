@@ -0,0 +1,26 @@
+"""MNIST export variants"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "01-mnist-classification"))
+
+import export  # noqa: E402
+from training import Net  # noqa: E402
+
+
+def test_int8_variant_loads_back(tmp_path):
+    torch.manual_seed(0)
+    model = Net().eval()
+    variants = {name: (variant, save) for name, variant, save in export.build_variants(model)}
+    quantized, save = variants['int8']
+    path = tmp_path / 'mnist_int8.pt'
+    save(quantized, path)
+
+    loaded = export.load_int8(path)
+    images = torch.randn(8, 1, 28, 28)
+    with torch.inference_mode():
+        assert torch.equal(loaded(images), quantized(images))
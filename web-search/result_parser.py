@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Search result extractor - shared by web-search and local-search
+
+A single-pass html.parser state machine: it is fed the response in chunks
+as they arrive, emits each result as soon as its container (`div.result`
+on DuckDuckGo, `li.b_algo` on Bing) closes and stops once `max_results`
+results are complete, so the rest of the page is never downloaded or
+parsed.
+"""
+
+import codecs
+from html.parser import HTMLParser
+
+# Class on an element inside a result -> field its text goes to
+FIELD_CLASSES = (
+    ("result__a", "title"),
+    ("result__snippet", "snippet"),
+    ("result__url", "display_url"),
+)
+CHUNK_SIZE = 16384
+
+class ResultParser(HTMLParser):
+    """Collects {title, url, snippet, display_url} for each div.result"""
+    container = "div"
+
+    def __init__(self, max_results=None):
+        super().__init__()
+        self.max_results = max_results
+        self.results = []
+        self.done = False
+        # Result being built and the number of containers open inside it
+        self.result = None
+        self.depth = 0
+        # Field being collected, its tag and nesting of that tag
+        self.field = None
+        self.field_tag = None
+        self.field_depth = 0
+        self.text = []
+
+    def is_result(self, tag, classes):
+        # Sponsored results are marked result--ad
+        return tag == "div" and "result" in classes and "result--ad" not in classes
+
+    def field_for(self, tag, classes):
+        for css_class, field in FIELD_CLASSES:
+            if css_class in classes:
+                return field
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if self.result is None:
+            if self.is_result(tag, classes):
+                self.result = {"title": "", "url": "", "snippet": "", "display_url": ""}
+                self.depth = 1
+            return
+        if tag == self.container:
+            self.depth += 1
+        if self.field is not None:
+            if tag == self.field_tag:
+                self.field_depth += 1
+            return
+        field = self.field_for(tag, classes)
+        if field and not self.result[field]:
+            if field == "title":
+                self.result["url"] = attrs.get("href") or ""
+            self.field, self.field_tag, self.field_depth, self.text = field, tag, 0, []
+
+    def handle_endtag(self, tag):
+        if self.done or self.result is None:
+            return
+        if self.field is not None and tag == self.field_tag:
+            if self.field_depth:
+                self.field_depth -= 1
+            else:
+                self.end_field()
+        if tag == self.container:
+            self.depth -= 1
+            if self.depth == 0:
+                self.end_result()
+
+    def handle_data(self, data):
+        if self.field is not None:
+            self.text.append(data)
+
+    def end_field(self):
+        self.result[self.field] = " ".join("".join(self.text).split())
+        self.field = None
+        self.text = []
+
+    def end_result(self):
+        if self.field is not None:
+            self.end_field()
+        if self.result["title"]:
+            self.results.append(self.result)
+        self.result = None
+        if self.max_results is not None and len(self.results) >= self.max_results:
+            self.done = True
+
+class BingResultParser(ResultParser):
+    """Bing's li.b_algo results: h2 > a title, first <p> snippet, <cite> url"""
+    container = "li"
+
+    def __init__(self, max_results=None):
+        super().__init__(max_results)
+        self.in_h2 = False
+
+    def is_result(self, tag, classes):
+        return tag == "li" and "b_algo" in classes
+
+    def field_for(self, tag, classes):
+        if tag == "a" and self.in_h2:
+            return "title"
+        if tag == "p":
+            return "snippet"
+        if tag == "cite":
+            return "display_url"
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "h2":
+            self.in_h2 = True
+        super().handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == "h2":
+            self.in_h2 = False
+        super().handle_endtag(tag)
+
+def extract_results(chunks, max_results=None, parser_class=ResultParser):
+    """Yield results from an iterable of byte chunks as each completes
+
+    Stops pulling chunks once `max_results` results have been yielded;
+    callers close the underlying response to abandon the rest.
+    """
+    parser = parser_class(max_results)
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    emitted = 0
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        while emitted < len(parser.results):
+            yield parser.results[emitted]
+            emitted += 1
+        if parser.done:
+            return
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    while emitted < len(parser.results):
+        yield parser.results[emitted]
+        emitted += 1
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Search backend registry - hedged requests across search engines
+
+Backends are plain functions (query, num_results, timeout) -> results
+that raise on failure. hedged_search() starts the best-ranked backend,
+starts the next one whenever the running ones have taken longer than the
+hedge delay (or one fails or comes back short), and returns as soon as
+the answers so far hold `num_results` distinct URLs. Backends still
+running are abandoned. Every call's latency is recorded in
+backend_stats.json; backends are ranked by median latency, penalized by
+failure rate, so the order adapts as engines speed up, slow down or
+start blocking.
+"""
+
+import importlib.util
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.parse
+from contextlib import closing
+from pathlib import Path
+
+STATS_FILE = Path(os.environ.get("SEARCH_BACKEND_STATS", Path(__file__).parent / "backend_stats.json"))
+# Latency samples kept per backend
+STATS_WINDOW = 100
+# Seconds before starting the next backend; unset = primary's p95, clamped
+HEDGE_AFTER = float(os.environ["SEARCH_HEDGE_AFTER"]) if os.environ.get("SEARCH_HEDGE_AFTER") else None
+HEDGE_MIN, HEDGE_MAX, HEDGE_DEFAULT = 0.3, 3.0, 1.0
+BING_URL = os.environ.get("BING_URL", "https://www.bing.com/search")
+LOCAL_SEARCH_FILE = Path(__file__).parent.parent / "local-search" / "search.py"
+
+BACKENDS = {}
+
+def register(name, search):
+    """Add a backend; registration order is the order before any stats exist"""
+    BACKENDS[name] = search
+
+def duckduckgo_html(query, num_results, timeout):
+    """html.duckduckgo.com via web_search.py's pooled urllib client"""
+    import web_search
+    results = web_search.duckduckgo_search(query, num_results, timeout)
+    errors = [r['error'] for r in results if 'error' in r]
+    if errors:
+        raise RuntimeError(errors[0])
+    return results
+
+_local_search = None
+
+def duckduckgo_requests(query, num_results, timeout):
+    """duckduckgo.com/html via local-search/search.py's requests session"""
+    global _local_search
+    if _local_search is None:
+        spec = importlib.util.spec_from_file_location("local_search", LOCAL_SEARCH_FILE)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _local_search = module
+    # wt-wt: no region, as html.duckduckgo.com defaults to
+    result = _local_search.fetch_results(query, num_results, "wt-wt", timeout)
+    if not result.get("success"):
+        raise RuntimeError(result.get("error", "search failed"))
+    return [{k: r[k] for k in ('title', 'url', 'snippet')} for r in result["results"]]
+
+def bing(query, num_results, timeout):
+    """Bing's HTML results page; what browser-search.sh opens in a browser"""
+    import web_search
+    from result_parser import BingResultParser, extract_results
+    url = f"{BING_URL}?q={urllib.parse.quote_plus(query)}"
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+    with closing(web_search.http_stream(url, headers, timeout)) as chunks:
+        return [
+            {k: r[k] for k in ('title', 'url', 'snippet')}
+            for r in extract_results(chunks, num_results, BingResultParser)
+        ]
+
+register("duckduckgo-html", duckduckgo_html)
+register("duckduckgo", duckduckgo_requests)
+register("bing", bing)
+
+class LatencyStats:
+    """Rolling per-backend latency samples and failure counts, on disk"""
+
+    def __init__(self, path=STATS_FILE, window=STATS_WINDOW):
+        self.path = Path(path)
+        self.window = window
+        self.lock = threading.Lock()
+        try:
+            self.data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.data = {}
+
+    def record(self, name, seconds, ok):
+        with self.lock:
+            entry = self.data.setdefault(name, {"latencies": [], "outcomes": []})
+            entry["latencies"] = (entry["latencies"] + [round(seconds, 4)])[-self.window:]
+            entry["outcomes"] = (entry["outcomes"] + [1 if ok else 0])[-self.window:]
+
+    def summary(self, name):
+        entry = self.data.get(name)
+        if not entry or not entry["latencies"]:
+            return None
+        ordered = sorted(entry["latencies"])
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {
+            "samples": len(ordered),
+            "p50": pick(0.50),
+            "p95": pick(0.95),
+            "p99": pick(0.99),
+            "success_rate": round(sum(entry["outcomes"]) / len(entry["outcomes"]), 3)
+        }
+
+    def ranked(self, names):
+        """Fastest reliable first: median latency / success rate
+
+        Backends without samples keep their registration order ahead of
+        measured ones, so each gets tried and measured.
+        """
+        def score(item):
+            position, name = item
+            summary = self.summary(name)
+            if summary is None:
+                return (0, position)
+            return (1, summary["p50"] / max(summary["success_rate"], 0.05))
+        return [name for _, name in sorted(enumerate(names), key=score)]
+
+    def hedge_delay(self, name):
+        if HEDGE_AFTER is not None:
+            return HEDGE_AFTER
+        summary = self.summary(name)
+        if summary is None or summary["samples"] < 5:
+            return HEDGE_DEFAULT
+        return min(HEDGE_MAX, max(HEDGE_MIN, summary["p95"]))
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.data)
+        try:
+            tmp_path = self.path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            tmp_path.write_text(data, encoding='utf-8')
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: failed to save backend stats: {e}", file=sys.stderr)
+
+_stats = None
+
+def get_stats():
+    global _stats
+    if _stats is None:
+        _stats = LatencyStats()
+    return _stats
+
+def url_key(url):
+    """Canonical form of a result URL for deduplication across backends
+
+    Unwraps DuckDuckGo's //duckduckgo.com/l/?uddg= redirect links and
+    ignores scheme, www., fragments and a trailing slash.
+    """
+    parts = urllib.parse.urlsplit(url)
+    if parts.path == "/l/" and "duckduckgo.com" in parts.netloc:
+        target = urllib.parse.parse_qs(parts.query).get("uddg")
+        if target:
+            parts = urllib.parse.urlsplit(target[0])
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return host + parts.path.rstrip("/") + (f"?{parts.query}" if parts.query else "")
+
+def dedupe(results, seen=None):
+    seen = set() if seen is None else seen
+    unique = []
+    for result in results:
+        key = url_key(result.get("url", ""))
+        if key not in seen:
+            seen.add(key)
+            unique.append(result)
+    return unique
+
+def hedged_search(query, num_results=5, timeout=10, backends=None):
+    """Query backends with hedging and return the first good answer
+
+    Returns {"results", "backend", "launched", "errors"}: "backend" is the
+    first to answer (its results lead; later answers only fill up to
+    num_results) and is None when every backend failed or came back empty
+    within `timeout`.
+    """
+    stats = get_stats()
+    order = stats.ranked(list(backends or BACKENDS))
+    done = queue.Queue()
+    started = {}
+    finished = {}
+    errors = {}
+
+    def run(name):
+        start = time.perf_counter()
+        try:
+            results = BACKENDS[name](query, num_results, timeout)
+        except Exception as e:
+            done.put((name, None, str(e), time.perf_counter() - start))
+        else:
+            done.put((name, results, None, time.perf_counter() - start))
+
+    def launch():
+        name = order[len(started)]
+        started[name] = time.perf_counter()
+        # Daemon threads: an abandoned backend must not hold up exit
+        threading.Thread(target=run, args=(name,), daemon=True).start()
+
+    deadline = time.perf_counter() + timeout
+    answers = []
+    seen = set()
+    results = []
+    launch()
+    next_hedge = time.perf_counter() + stats.hedge_delay(order[0])
+    while len(finished) < len(order) and len(results) < num_results:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        wait = deadline - now
+        if len(started) < len(order):
+            wait = min(wait, max(0.0, next_hedge - now))
+        try:
+            name, found, error, elapsed = done.get(timeout=wait)
+        except queue.Empty:
+            if len(started) < len(order) and time.perf_counter() >= next_hedge:
+                launch()
+                next_hedge = time.perf_counter() + stats.hedge_delay(order[len(started) - 1])
+            continue
+        finished[name] = found
+        stats.record(name, elapsed, bool(found))
+        if found:
+            answers.append(name)
+            results += dedupe(found, seen)
+        else:
+            errors[name] = error or "no results"
+        # A failed or short answer is backed up at once, not after the delay
+        if len(results) < num_results and len(started) < len(order) and len(started) == len(finished):
+            launch()
+            next_hedge = time.perf_counter() + stats.hedge_delay(order[len(started) - 1])
+
+    # Abandoned backends count as at least as slow as they have been so far
+    now = time.perf_counter()
+    for name, start in started.items():
+        if name not in finished:
+            stats.record(name, now - start, now < deadline)
+    stats.save()
+
+    return {
+        "results": results[:num_results],
+        "backend": answers[0] if answers else None,
+        "launched": list(started),
+        "errors": errors
+    }
+
+def backend_stats():
+    """Latency percentiles and success rate per registered backend"""
+    stats = get_stats()
+    return {
+        "order": stats.ranked(list(BACKENDS)),
+        "backends": {name: stats.summary(name) for name in BACKENDS}
+    }
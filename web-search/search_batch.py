@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Batch search helpers - shared by web-search and local-search
+
+Runs many queries through a bounded thread pool and yields each result as
+soon as it completes. Requests to one host are spaced out by a per-host
+rate limiter so a batch does not get the client blocked.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_WORKERS = 8
+# Requests per second per host; 0 disables the limit
+DEFAULT_RATE = float(os.environ.get("SEARCH_RATE_LIMIT", 5))
+
+class HostRateLimiter:
+    """Spaces requests to each host at least 1/rate seconds apart"""
+
+    def __init__(self, rate=DEFAULT_RATE):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, url):
+        if self.rate <= 0:
+            return
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+RATE_LIMITER = HostRateLimiter()
+
+def parse_queries(text):
+    """Queries from a JSON array or one query per line
+
+    Array items are query strings or objects with "query" and optional
+    per-query options (e.g. "max_results", "language").
+    """
+    text = text.strip()
+    if text.startswith("["):
+        items = json.loads(text)
+    else:
+        items = [line.strip() for line in text.splitlines() if line.strip()]
+    return [item if isinstance(item, dict) else {"query": str(item)} for item in items]
+
+def run_batch(queries, search, workers=DEFAULT_WORKERS):
+    """Yield (index, query dict, result) in completion order
+
+    `search(**query)` runs on up to `workers` threads; an exception
+    becomes a {"success": False, "error": ...} result for that query only.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(search, **query): (i, query) for i, query in enumerate(queries)}
+        for future in as_completed(futures):
+            i, query = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"success": False, "error": str(e), "query": query.get("query"), "results": []}
+            yield i, query, result
+
+def failed_result(result):
+    """Default failure test: the result says "success": false"""
+    return result.get("success") is False
+
+def main_batch(args, search, failed=failed_result):
+    """CLI batch mode: queries from args (a JSON array) or stdin, JSONL out
+
+    Each output line is the search result plus "index" (position in the
+    input); lines are flushed as results complete. `failed(result)` decides
+    which results count as failures; the exit status is 1 when every query
+    failed.
+    """
+    workers = DEFAULT_WORKERS
+    rest = []
+    i = 0
+    while i < len(args):
+        if args[i] in ("--workers", "--rate") and i + 1 < len(args):
+            if args[i] == "--workers":
+                workers = int(args[i + 1])
+            else:
+                RATE_LIMITER.rate = float(args[i + 1])
+            i += 2
+            continue
+        rest.append(args[i])
+        i += 1
+
+    try:
+        queries = parse_queries(" ".join(rest) if rest else sys.stdin.read())
+    except ValueError as e:
+        print(json.dumps({"success": False, "error": f"Invalid query list: {e}"}))
+        return 1
+
+    failures = 0
+    for index, _, result in run_batch(queries, search, workers):
+        if failed(result):
+            failures += 1
+        print(json.dumps(dict(result, index=index), ensure_ascii=False), flush=True)
+    return 1 if failures and failures == len(queries) else 0
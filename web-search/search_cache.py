@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Search result cache - shared by web-search and local-search
+
+Results are kept in one SQLite file keyed by a hash of the backend, the
+endpoint and the normalized query, language and result count. Entries are
+fresh for SEARCH_CACHE_TTL seconds; with SEARCH_CACHE_STALE > 0 an expired
+entry is still served for that many more seconds while a refresh runs in
+the background (stale-while-revalidate). The least recently used entries
+are evicted beyond SEARCH_CACHE_MAX_ENTRIES.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+CACHE_FILE = Path(os.environ.get("SEARCH_CACHE_FILE", Path(__file__).parent / "search_cache.sqlite"))
+CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", 3600))
+CACHE_STALE = float(os.environ.get("SEARCH_CACHE_STALE", 0))
+CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 1000))
+
+def normalize_query(query):
+    """Queries differing only in case, width or spacing share an entry"""
+    return " ".join(unicodedata.normalize("NFKC", query).lower().split())
+
+def cache_key(backend, endpoint, query, language, count):
+    key = json.dumps([backend, endpoint, normalize_query(query), language or "", int(count)], ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """SQLite-backed TTL cache of JSON-serializable search results"""
+
+    def __init__(self, path=None, ttl=None, stale=None, max_entries=None):
+        self.path = Path(path or CACHE_FILE)
+        self.ttl = CACHE_TTL if ttl is None else ttl
+        self.stale = CACHE_STALE if stale is None else stale
+        self.max_entries = CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.local = threading.local()
+
+    def connect(self):
+        """One connection per thread; SQLite connections are not shareable"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            os.makedirs(self.path.parent, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        """(value, age in seconds, "fresh" | "stale"), or None on a miss"""
+        conn = self.connect()
+        row = conn.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        age = now - row[1]
+        if age > self.ttl + self.stale:
+            return None
+        with conn:
+            conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), age, "fresh" if age <= self.ttl else "stale"
+
+    def put(self, key, value):
+        conn = self.connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl - self.stale,))
+            conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                " SELECT key FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        conn = self.connect()
+        with conn:
+            conn.execute("DELETE FROM results")
+
+_cache = None
+
+def get_cache():
+    """Process-wide cache with the settings from the environment"""
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
+
+def cached(key, fetch, ok=bool, use_cache=True, refresh=False, revalidate=None):
+    """Return (result, cache info), calling fetch() only when needed
+
+    A result is stored only when ok(result) is true, so failures are never
+    cached. A stale hit is returned at once and refreshed by revalidate()
+    (default: fetch and store in a background thread). With refresh=True
+    the cache is not read but the fresh result is still stored.
+    """
+    if not use_cache or CACHE_TTL <= 0:
+        return fetch(), {"status": "disabled"}
+    cache = get_cache()
+    try:
+        hit = None if refresh else cache.get(key)
+    except sqlite3.Error:
+        hit = None
+    if hit is not None:
+        value, age, status = hit
+        if status == "stale":
+            if revalidate is None:
+                threading.Thread(target=store, args=(key, fetch, ok)).start()
+            else:
+                revalidate()
+        return value, {"status": status, "age": round(age, 1)}
+    return store(key, fetch, ok), {"status": "refresh" if refresh else "miss"}
+
+def store(key, fetch, ok=bool):
+    result = fetch()
+    if ok(result):
+        try:
+            get_cache().put(key, result)
+        except sqlite3.Error as e:
+            print(f"Warning: search cache write failed: {e}", file=sys.stderr)
+    return result
+
+def spawn_refresh(script, args):
+    """Refresh a stale entry from a detached `script --refresh` process
+
+    CLI invocations exit as soon as they print, which would kill a
+    background thread, so they revalidate in a child process instead.
+    """
+    subprocess.Popen(
+        [sys.executable, str(script), *args, "--refresh"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
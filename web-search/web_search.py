@@ -4,71 +4,130 @@ Web Search Skill - Free web search without API keys
 """
 
 import sys
+import os
 import json
-import re
-import urllib.request
+import threading
+import urllib.error
 import urllib.parse
-import ssl
-from html.parser import HTMLParser
-
-class MLStripper(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.reset()
-        self.fed = []
-    
-    def handle_data(self, d):
-        self.fed.append(d)
-    
-    def get_data(self):
-        return ''.join(self.fed)
+from contextlib import closing
 
-def strip_tags(html):
-    s = MLStripper()
-    try:
-        s.feed(html)
-        return s.get_data()
-    except:
-        return html
+from result_parser import CHUNK_SIZE, extract_results
+from search_backends import BACKENDS, backend_stats, hedged_search
+from search_batch import RATE_LIMITER, main_batch
+from search_cache import cache_key, cached, spawn_refresh
+
+# Override to point at a mirror or a local stub server
+DUCKDUCKGO_URL = os.environ.get("DUCKDUCKGO_URL", "https://html.duckduckgo.com/html/")
+REQUEST_TIMEOUT = 10
+MAX_REDIRECTS = 3
+
+_ssl_context = None
+
+def get_ssl_context():
+    """Built on the first HTTPS request; creating it loads the CA bundle
+
+    Certificates are not verified.
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        import ssl
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        _ssl_context = context
+    return _ssl_context
 
-def duckduckgo_search(query, num_results=5):
+# Keep-alive connections per thread, keyed by (scheme, host)
+_connections = threading.local()
+
+def http_stream(url, headers, timeout=REQUEST_TIMEOUT, chunk_size=CHUNK_SIZE):
+    """GET url over a reused keep-alive connection, yielding the body in chunks
+
+    Each thread keeps one connection per host, so repeated and batched
+    searches skip the TCP and TLS handshakes. A connection the server has
+    closed in the meantime is reopened once. If the caller stops reading
+    early (closing the generator), the connection is dropped rather than
+    drained.
+    """
+    # http.client pulls in ssl and email; imported here, not at startup
+    import http.client
+    pool = _connections.__dict__.setdefault('pool', {})
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        for attempt in range(2):
+            conn = pool.get(key)
+            fresh = conn is None
+            if fresh:
+                if parts.scheme == 'https':
+                    conn = http.client.HTTPSConnection(parts.netloc, timeout=timeout, context=get_ssl_context())
+                else:
+                    conn = http.client.HTTPConnection(parts.netloc, timeout=timeout)
+                pool[key] = conn
+            elif conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                RATE_LIMITER.wait(url)
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                    ConnectionResetError, BrokenPipeError):
+                conn.close()
+                del pool[key]
+                if fresh or attempt:
+                    raise
+            except Exception:
+                conn.close()
+                del pool[key]
+                raise
+        
+        finished = False
+        try:
+            if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+                response.read()
+                finished = True
+                url = urllib.parse.urljoin(url, response.getheader('Location'))
+                continue
+            if response.status >= 400:
+                response.read()
+                finished = True
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+            while True:
+                chunk = response.read1(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            finished = True
+            return
+        finally:
+            if not finished or response.will_close:
+                conn.close()
+                pool.pop(key, None)
+    raise urllib.error.URLError(f'Too many redirects: {url}')
+
+def duckduckgo_search(query, num_results=5, timeout=REQUEST_TIMEOUT):
     """Search using DuckDuckGo HTML scraping"""
     results = []
     
     try:
-        # Create SSL context that doesn't verify certificates
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        
         # URL encode the query
         encoded_query = urllib.parse.quote_plus(query)
-        url = f"https://html.duckduckgo.com/html/?q={encoded_query}"
+        url = f"{DUCKDUCKGO_URL}?q={encoded_query}"
         
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         
-        req = urllib.request.Request(url, headers=headers)
-        
-        with urllib.request.urlopen(req, context=ssl_context, timeout=10) as response:
-            html = response.read().decode('utf-8')
-            
-            # Extract results using regex
-            # DuckDuckGo result pattern
-            result_pattern = r'<div class="result[^"]*"[^>]*>.*?<a[^>]*class="result__a"[^>]*href="([^"]*)"[^>]*>(.*?)</a>.*?<a[^>]*class="result__snippet"[^>]*>(.*?)</a>.*?</div>'
-            
-            matches = re.findall(result_pattern, html, re.DOTALL)
-            
-            for i, match in enumerate(matches[:num_results]):
-                url = match[0]
-                title = strip_tags(match[1])
-                snippet = strip_tags(match[2])
-                
+        # Parsed as it downloads; the rest of the page is skipped once
+        # num_results results are complete
+        with closing(http_stream(url, headers, timeout)) as chunks:
+            for result in extract_results(chunks, num_results):
                 results.append({
-                    'title': title.strip(),
-                    'url': url,
-                    'snippet': snippet.strip()
+                    'title': result['title'],
+                    'url': result['url'],
+                    'snippet': result['snippet']
                 })
                 
     except Exception as e:
@@ -81,21 +140,98 @@ def duckduckgo_search(query, num_results=5):
     
     return results
 
+def hedged(query, num_results=5, timeout=REQUEST_TIMEOUT, backend=None):
+    """Results from the registered backends (see search_backends.py)
+
+    Failures come back as a single error entry, like duckduckgo_search.
+    """
+    answer = hedged_search(query, num_results, timeout, [backend] if backend else None)
+    if answer['backend'] is None:
+        detail = '; '.join(f'{name}: {error}' for name, error in answer['errors'].items())
+        return {
+            'results': [{
+                'error': f'Search failed: {detail or "timed out"}',
+                'title': 'Error',
+                'url': '',
+                'snippet': ''
+            }],
+            'backend': None
+        }
+    return {'results': answer['results'], 'backend': answer['backend']}
+
+def failed(results):
+    """Failed searches come back as a single error entry"""
+    return any('error' in r for r in results)
+
+def search(query, num_results=5, use_cache=True, refresh=False, revalidate=None, timeout=REQUEST_TIMEOUT,
+           backend=None):
+    """Hedged search across the backends, through the shared result cache"""
+    answer, cache_info = cached(
+        cache_key('web-search', backend or DUCKDUCKGO_URL, query, '', num_results),
+        lambda: hedged(query, num_results, timeout, backend),
+        ok=lambda answer: not failed(answer['results']),
+        use_cache=use_cache,
+        refresh=refresh,
+        revalidate=revalidate
+    )
+    return {
+        'query': query,
+        'results': answer['results'],
+        'backend': answer['backend'],
+        'cache': cache_info
+    }
+
 def main():
-    if len(sys.argv) < 2:
+    args = sys.argv[1:]
+    use_cache = '--no-cache' not in args
+    refresh = '--refresh' in args
+    batch = '--batch' in args
+    args = [arg for arg in args if arg not in ('--no-cache', '--refresh', '--batch')]
+    timeout = REQUEST_TIMEOUT
+    if '--timeout' in args[:-1]:
+        i = args.index('--timeout')
+        timeout = float(args[i + 1])
+        del args[i:i + 2]
+    backend = None
+    if '--backend' in args[:-1]:
+        i = args.index('--backend')
+        backend = args[i + 1]
+        del args[i:i + 2]
+        if backend not in BACKENDS:
+            print(json.dumps({'error': f'Unknown backend: {backend} (choose from {", ".join(BACKENDS)})'}))
+            sys.exit(1)
+    
+    if '--backend-stats' in args:
+        print(json.dumps(backend_stats(), indent=2))
+        return
+    
+    if batch:
+        # Queries (strings or {"query", "num_results"} objects) as a JSON
+        # array or one per line on stdin; JSONL results in completion order
+        # A query failed when it raised (run_batch sets "success": false) or
+        # came back as an error entry
+        sys.exit(main_batch(args, lambda query, num_results=5, **_: search(
+            query, int(num_results), use_cache=use_cache, refresh=refresh, timeout=timeout, backend=backend
+        ), failed=lambda result: result.get('success') is False or failed(result['results'])))
+    
+    if not args:
         print(json.dumps({
-            'error': 'Usage: web_search.py <query>',
+            'error': 'Usage: web_search.py <query> [--no-cache] [--refresh] [--timeout S] [--backend NAME]\n'
+                     '       web_search.py --batch [JSON array] [--workers N] [--rate R] < queries\n'
+                     '       web_search.py --backend-stats',
             'results': []
         }))
         sys.exit(1)
     
-    query = ' '.join(sys.argv[1:])
-    results = duckduckgo_search(query)
-    
-    output = {
-        'query': query,
-        'results': results
-    }
+    query = ' '.join(args)
+    output = search(
+        query,
+        use_cache=use_cache,
+        refresh=refresh,
+        revalidate=lambda: spawn_refresh(__file__, [arg for arg in sys.argv[1:] if arg != '--refresh']),
+        timeout=timeout,
+        backend=backend
+    )
     
     print(json.dumps(output, indent=2, ensure_ascii=False))
 